@@ -1,9 +1,15 @@
 # WS Content Generator – generates images and product descriptions using AI
 import streamlit as st
-from image_generator import generate_image
-from text_generator import generate_caption
-from utils import log_event
-import pandas as pd
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # shared/
+from generation import get_generation, stats as generation_stats
+from asset_store import PREWARM_PRESETS, get_asset_store, prewarm
+from utils import log_event, get_recent_images, export_user_sessions
+from shared.admin_panel import render_admin_panel
+from shared.downloads import sidebar_download
+from shared.scheduler import schedule_as
+from shared.telemetry import request_trace
 
 # -----------------------------------
 # Setup and Session Initialization
@@ -67,6 +73,10 @@ popular_styles = [
     "Luxury Chef’s Kitchen"
 ]
 
+# Generate the presets in the background so picking one is served from the local asset store
+if PREWARM_PRESETS:
+    prewarm(popular_styles)
+
 selected_preset = st.selectbox("Pick a popular style (optional):", [""] + popular_styles)
 
 # Step 1: Prompt input for image generation
@@ -83,25 +93,44 @@ variant = st.radio("Choose a tone style:", [
 
 # Step 3: Generate content if prompt is entered
 if prompt.strip():
-    with st.spinner("Creating image..."):
-        image_url = generate_image(prompt.strip())
-        if image_url:
-            st.image(image_url, caption="AI-generated visual", use_container_width=True)
-        else:
-            st.error("⚠️ Could not generate image. Please try again.")
-
-    with st.spinner("Writing caption..."):
-        if variant.startswith("A"):
-            caption_prompt = f"Write a warm, cozy product description for a scene in {prompt} style. Use the Williams-Sonoma tone."
-        else:
-            caption_prompt = f"Write a sleek, modern luxury product description for a scene in {prompt} style. Use the Williams-Sonoma tone."
-
-        caption = generate_caption(caption_prompt)
+    if variant.startswith("A"):
+        caption_prompt = f"Write a warm, cozy product description for a scene in {prompt} style. Use the Williams-Sonoma tone."
+    else:
+        caption_prompt = f"Write a sleek, modern luxury product description for a scene in {prompt} style. Use the Williams-Sonoma tone."
+
+    def log_generation(generation, prompt=prompt.strip(), user=user.strip().lower(), variant=variant):
+        # Runs once per new job, so reruns and duplicate requests are never logged twice
+        log_event(prompt, generation.image_path, user, variant)
+
+    with request_trace("mvp1"), schedule_as(user, "interactive"):
+        # Image and caption are generated concurrently; each is rendered as soon as it arrives.
+        # Reruns (any widget click) reattach to the same job instead of calling the APIs again.
+        generation, is_new = get_generation(user, prompt.strip(), variant, caption_prompt,
+                                            on_complete=log_generation)
+        image_slot = st.empty()
+        image_slot.info("🎨 Creating image...")
         st.markdown("### 📝 Product Description")
-        st.write(caption)
-
-    # Step 4: Log session data for analysis
-    log_event(prompt.strip(), image_url, user.strip().lower(), variant)
+        caption_slot = st.empty()
+        caption_slot.caption("✍️ Writing caption...")
+        if not is_new:
+            st.caption("♻️ Same style and tone as before – showing the existing result, no new generation.")
+
+        caption = ""
+        for event, payload in generation.iter_events():
+            if event == "image":
+                if payload:
+                    image_slot.image(payload, caption="AI-generated visual", use_container_width=True)
+                else:
+                    image_slot.error("⚠️ Could not generate image. Please try again.")
+            elif event == "image_error":
+                image_slot.error(f"⚠️ Could not generate image. Please try again. ({payload})")
+            elif event == "caption":
+                caption += payload
+                caption_slot.markdown(caption + "▌")
+            elif event == "caption_done":
+                caption_slot.markdown(caption)
+            elif event == "caption_error":
+                caption_slot.error(f"⚠️ Could not write the product description. Please try again. ({payload})")
 else:
     st.warning("Please enter a valid style or choose one from the list.")
 
@@ -113,17 +142,11 @@ st.divider()
 
 if st.sidebar.button("📥 Download your session log"):
     try:
-        df_all = pd.read_csv("sessions.csv")
+        # Streamed from this user's archive partitions + the live log (see shared/downloads.py)
         current_user = st.session_state.get("user", "").strip().lower()
-        df_user = df_all[df_all["user"].str.strip().str.lower() == current_user]
-
-        if not df_user.empty:
-            st.sidebar.download_button(
-                label="Download CSV",
-                data=df_user.to_csv(index=False),
-                file_name=f"{current_user}_session_log.csv",
-                mime="text/csv"
-            )
+        if get_recent_images(current_user, limit=1):
+            sidebar_download(lambda out: export_user_sessions(current_user, out),
+                             f"{current_user}_session_log.csv")
         else:
             st.sidebar.info("No sessions found for current user.")
 
@@ -133,30 +156,36 @@ if st.sidebar.button("📥 Download your session log"):
 # -----------------------------------
 # 🖼️ Display Recent Images
 # -----------------------------------
-import csv
 st.markdown("### 🖼️ Your Recent Images")
 
 try:
     current_user = st.session_state.get("user", "").strip().lower()
-
-    with open("sessions.csv", newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        recent_rows = []
-
-        for row in reader:
-            row_user = row.get("user", "").strip().lower()
-            if row_user == current_user:
-                recent_rows.append(row)
-
-        if not recent_rows:
-            st.info("No previous images found for this user.")
-        else:
-            for row in recent_rows[-3:][::-1]:
-                st.image(row["image_url"], caption=row["prompt"], use_container_width=True)
+    recent_rows = get_recent_images(current_user)
+
+    if not recent_rows:
+        st.info("No previous images found for this user.")
+    else:
+        asset_store = get_asset_store()
+        for row in recent_rows:
+            image = asset_store.thumbnail_for(row["image_url"])
+            if image.startswith("http") or os.path.exists(image):
+                st.image(image, caption=row["prompt"], use_container_width=True)
+            else:
+                st.caption(f"🗑️ Image for “{row['prompt']}” was evicted from the local asset store.")
 
 except Exception as e:
     st.warning(f"Couldn't load previous images. {e}")
 
+st.sidebar.caption(
+    f"♻️ Generations – new: {generation_stats['generations']}, "
+    f"duplicates avoided: {generation_stats['duplicates_avoided']}"
+)
+
+# -----------------------------------
+# Performance Panel (ADMIN_PANEL=1)
+# -----------------------------------
+render_admin_panel()
+
 # -----------------------------------
 # Logout (Visible After Login)
 # -----------------------------------
@@ -0,0 +1,214 @@
+# asset_store.py – local, content-addressed store for generated images
+#
+# DALL·E returns short-lived URLs. Each image is downloaded once, stored under
+# its SHA-256 (assets/ab/abcd….png) with a thumbnail next to it, and indexed by
+# the normalized prompt + catalog style suffix, so identical prompts (e.g. the
+# popular style presets) are served from disk instead of being regenerated.
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from image_generator import IMAGE_MODEL, STYLE_SUFFIX, generate_image
+from shared.scheduler import schedule_as
+from shared.telemetry import stage
+from shared.transport import get_http_client
+
+ASSET_DIR = os.getenv("ASSET_DIR", "assets")
+ASSET_CACHE_MB = float(os.getenv("ASSET_CACHE_MB", "500"))
+PREWARM_PRESETS = os.getenv("PREWARM_PRESETS", "").lower() in ("1", "true", "yes", "on")
+THUMBNAIL_SIZE = (384, 384)
+
+
+def normalize_prompt(prompt):
+    """Case- and whitespace-insensitive form of a style prompt."""
+    return " ".join(prompt.lower().split()).strip(" .,!")
+
+
+def prompt_key(prompt, style_suffix=STYLE_SUFFIX, model=IMAGE_MODEL):
+    payload = json.dumps([model, normalize_prompt(prompt), style_suffix], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def download(url, timeout=60):
+    # Same keep-alive pool as the model clients: repeated downloads skip the TLS handshake
+    response = get_http_client().get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.content
+
+
+# -------------------------------
+# Store
+# -------------------------------
+class AssetStore:
+    """Image blobs on disk plus a SQLite index, evicted least-recently-used by total size."""
+
+    def __init__(self, root=ASSET_DIR, max_bytes=int(ASSET_CACHE_MB * 1024 * 1024)):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        os.makedirs(root, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " hash TEXT PRIMARY KEY, size INTEGER NOT NULL,"
+            " created REAL NOT NULL, last_access REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_blobs_access ON blobs(last_access);"
+            "CREATE TABLE IF NOT EXISTS prompts ("
+            " key TEXT PRIMARY KEY, hash TEXT NOT NULL, prompt TEXT, created REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_prompts_hash ON prompts(hash);"
+        )
+        self._conn.commit()
+
+    def blob_path(self, digest, thumbnail=False):
+        name = f"{digest}_thumb.png" if thumbnail else f"{digest}.png"
+        return os.path.join(self.root, digest[:2], name)
+
+    def lookup(self, prompt):
+        """Local image path for a previously generated prompt, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hash FROM prompts WHERE key = ?", (prompt_key(prompt),)
+            ).fetchone()
+            if row is not None and os.path.exists(self.blob_path(row[0])):
+                self._conn.execute("UPDATE blobs SET last_access = ? WHERE hash = ?", (time.time(), row[0]))
+                self._conn.commit()
+                self.stats["hits"] += 1
+                return self.blob_path(row[0])
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, prompt, data):
+        """Store image bytes for `prompt` and return the local path."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        size = len(data) + self._write_thumbnail(path, self.blob_path(digest, thumbnail=True))
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO blobs (hash, size, created, last_access) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(hash) DO UPDATE SET last_access = excluded.last_access",
+                (digest, size, now, now),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO prompts (key, hash, prompt, created) VALUES (?, ?, ?, ?)",
+                (prompt_key(prompt), digest, normalize_prompt(prompt), now),
+            )
+            self._evict(keep=digest)
+            self._conn.commit()
+        return path
+
+    def _write_thumbnail(self, path, thumb_path):
+        if os.path.exists(thumb_path):
+            return os.path.getsize(thumb_path)
+        try:
+            from PIL import Image  # ships with Streamlit; imported only when storing a new image
+            with Image.open(path) as image:
+                image.thumbnail(THUMBNAIL_SIZE)
+                image.save(thumb_path, format="PNG", optimize=True)
+            return os.path.getsize(thumb_path)
+        except Exception as e:
+            print(f"⚠️ Couldn't create thumbnail, serving the full image instead: {e}")
+            return 0
+
+    def _evict(self, keep=None):
+        (total,) = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        if total <= self.max_bytes:
+            return
+        for digest, size in self._conn.execute(
+            "SELECT hash, size FROM blobs ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            if digest == keep:
+                continue
+            for path in (self.blob_path(digest), self.blob_path(digest, thumbnail=True)):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._conn.execute("DELETE FROM blobs WHERE hash = ?", (digest,))
+            self._conn.execute("DELETE FROM prompts WHERE hash = ?", (digest,))
+            total -= size
+            self.stats["evictions"] += 1
+
+    def thumbnail_for(self, path):
+        """Thumbnail for a stored image; remote URLs and other paths are returned unchanged.
+
+        Viewing an image in the recent list counts as an access, so it isn't evicted first.
+        """
+        base, ext = os.path.splitext(path)
+        thumb_path = f"{base}_thumb{ext}"
+        digest = os.path.basename(base)
+        if path == self.blob_path(digest) and os.path.exists(path):
+            with self._lock:
+                self._conn.execute("UPDATE blobs SET last_access = ? WHERE hash = ?", (time.time(), digest))
+                self._conn.commit()
+        return thumb_path if os.path.exists(thumb_path) else path
+
+    def get_image(self, prompt):
+        """Local path of the catalog image for `prompt`, generating and downloading it on a miss."""
+        cached = self.lookup(prompt)
+        if cached is not None:
+            with stage("image", model=IMAGE_MODEL) as span:
+                span.cache_hit = True
+            return cached
+        url = generate_image(prompt)
+        if not url:
+            return None
+        return self.put(prompt, download(url))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_asset_store():
+    """Process-wide asset store shared by every session."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AssetStore()
+        return _store
+
+
+def get_image(prompt):
+    return get_asset_store().get_image(prompt)
+
+
+# -------------------------------
+# Preset Pre-warming
+# -------------------------------
+_prewarm_started = False
+
+
+def prewarm(prompts):
+    """Generate any missing preset images on a background thread (once per process)."""
+    global _prewarm_started
+    with _store_lock:
+        if _prewarm_started:
+            return
+        _prewarm_started = True
+
+    def run():
+        store = get_asset_store()
+        # Batch priority: warming presets must not spend the interactive image quota ahead of real users
+        with schedule_as("prewarm", "batch"):
+            for prompt in prompts:
+                try:
+                    if store.lookup(prompt) is None:
+                        store.get_image(prompt)
+                except Exception as e:
+                    print(f"⚠️ Couldn't pre-warm '{prompt}': {e}")
+
+    threading.Thread(target=run, name="asset-prewarm", daemon=True).start()
@@ -0,0 +1,168 @@
+# generation.py – image + caption generation jobs
+#
+# The caption prompt only depends on the user's prompt and tone variant, so
+# there is no reason to wait for DALL·E before asking GPT for the copy: both
+# run side by side on a shared thread pool.
+#
+# Streamlit re-runs the whole script on every widget interaction, so each
+# generation is a job keyed by (user, prompt, variant). A rerun, or a second
+# tab asking for the same thing while it is still running, attaches to the
+# existing job and replays its output instead of paying for a new one.
+import contextvars
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from asset_store import get_image, normalize_prompt
+from shared.telemetry import register_gauge
+from text_generator import stream_caption
+
+# Shared by every session; each generation occupies two workers
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("GENERATION_WORKERS", "8")),
+                               thread_name_prefix="mvp1-generation")
+# Completed jobs kept for reruns (oldest dropped first)
+MAX_JOBS = int(os.getenv("GENERATION_JOBS", "256"))
+
+
+class Generation:
+    """An image and a streamed caption requested at the same time.
+
+    Output is recorded as an event log, so any number of readers (reruns,
+    other sessions) can replay it from the start while it is still arriving.
+    """
+
+    def __init__(self, image_prompt, caption_prompt, on_complete=None):
+        self._events = []
+        self._cond = threading.Condition()
+        self._pending = 2
+        self._on_complete = on_complete
+        self.image_path = None
+        self.caption = None
+        self.failed = False
+        # copy_context keeps the caller's request trace on the worker threads
+        _executor.submit(contextvars.copy_context().run, self._run_image, image_prompt)
+        _executor.submit(contextvars.copy_context().run, self._run_caption, caption_prompt)
+
+    @property
+    def done(self):
+        return self._pending == 0
+
+    def _emit(self, event, payload):
+        with self._cond:
+            self._events.append((event, payload))
+            self._cond.notify_all()
+
+    def _finish(self):
+        with self._cond:
+            self._pending -= 1
+            finished = self._pending == 0
+            self._cond.notify_all()
+        if finished and self._on_complete is not None:
+            try:
+                self._on_complete(self)
+            except Exception as e:
+                print(f"⚠️ Generation completion hook failed: {e}")
+
+    def _run_image(self, image_prompt):
+        try:
+            self.image_path = get_image(image_prompt)
+            self._emit("image", self.image_path)
+        except Exception as e:
+            self.failed = True
+            self._emit("image_error", e)
+        finally:
+            self._finish()
+
+    def _run_caption(self, caption_prompt):
+        parts = []
+        try:
+            for token in stream_caption(caption_prompt):
+                parts.append(token)
+                self._emit("caption", token)
+            self.caption = "".join(parts)
+            self._emit("caption_done", self.caption)
+        except Exception as e:
+            self.failed = True
+            self._emit("caption_error", e)
+        finally:
+            self._finish()
+
+    def iter_events(self):
+        """Yield `(event, payload)` from the start, in arrival order, until both parts finish.
+
+        Events: `("image", local_path)` or `("image_error", exc)`; `("caption", text)`
+        as tokens stream in, then `("caption_done", text)` or `("caption_error", exc)`.
+        Caption tokens that are already available are merged into one event.
+        """
+        seen = 0
+        while True:
+            with self._cond:
+                while seen == len(self._events) and not self.done:
+                    self._cond.wait()
+                batch = self._events[seen:]
+                finished = self.done
+            seen += len(batch)
+
+            text = ""
+            for event, payload in batch:
+                if event == "caption":
+                    text += payload
+                    continue
+                if text:
+                    yield "caption", text
+                    text = ""
+                yield event, payload
+            if text:
+                yield "caption", text
+
+            if finished and seen == len(self._events):
+                return
+
+
+# -------------------------------
+# Single-flight Job Registry
+# -------------------------------
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+stats = {"generations": 0, "duplicates_avoided": 0}
+
+
+def job_key(user, prompt, variant):
+    return (user.strip().lower(), normalize_prompt(prompt), variant)
+
+
+def get_generation(user, prompt, variant, caption_prompt, on_complete=None):
+    """Return `(generation, is_new)`, reusing a running or finished job for the same key.
+
+    Failed jobs are not reused, so asking again retries. `on_complete(generation)`
+    runs once, on a worker thread, when a new job's image and caption have both finished.
+    """
+    key = job_key(user, prompt, variant)
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is not None and not (job.done and job.failed):
+            _jobs.move_to_end(key)
+            stats["duplicates_avoided"] += 1
+            return job, False
+
+        job = Generation(prompt, caption_prompt, on_complete)
+        _jobs[key] = job
+        stats["generations"] += 1
+        while len(_jobs) > MAX_JOBS:
+            _jobs.popitem(last=False)
+        return job, True
+
+
+def _render_metrics():
+    return [
+        "# HELP mvp1_generations_total Image + caption generations started",
+        "# TYPE mvp1_generations_total counter",
+        f"mvp1_generations_total {stats['generations']}",
+        "# HELP mvp1_duplicate_generations_avoided_total Reruns and repeat requests served from an existing job",
+        "# TYPE mvp1_duplicate_generations_avoided_total counter",
+        f"mvp1_duplicate_generations_avoided_total {stats['duplicates_avoided']}",
+    ]
+
+
+register_gauge(_render_metrics)
@@ -1,21 +1,26 @@
-import openai
-import os
-from dotenv import load_dotenv
+from shared.clients import get_openai_client
+from shared.scheduler import call_model
+from shared.telemetry import stage
 
-load_dotenv()
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+IMAGE_MODEL = "dall-e-3"
+# Appended to every prompt; part of the asset store's cache key
+STYLE_SUFFIX = (
+    ", styled for Williams-Sonoma catalog, high-quality lighting, "
+    "photo-realistic, elegant composition, no people, no words, no logos, no text overlay"
+)
 
 # Function to generate image using DALL-E 3
 def generate_image(prompt):
-    full_prompt = (
-        f"{prompt}, styled for Williams-Sonoma catalog, high-quality lighting, "
-        "photo-realistic, elegant composition, no people, no words, no logos, no text overlay" 
-    )
-    response = client.images.generate(
-        model="dall-e-3",
-        prompt=full_prompt,
-        size="1024x1024",
-        quality="standard",
-        n=1
-    )
+    full_prompt = f"{prompt}{STYLE_SUFFIX}"
+    with stage("image", model=IMAGE_MODEL) as span:
+        response = call_model(
+            IMAGE_MODEL,
+            get_openai_client().images.generate,
+            model=IMAGE_MODEL,
+            prompt=full_prompt,
+            size="1024x1024",
+            quality="standard",
+            n=1
+        )
+        span.images = 1
     return response.data[0].url # Return the URL of the generated image
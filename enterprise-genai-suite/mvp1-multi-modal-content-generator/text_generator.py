@@ -1,13 +1,45 @@
-from openai import OpenAI
-client = OpenAI()
+from shared.clients import get_openai_client
+from shared.scheduler import call_model, estimate_request_tokens, stream_model
+from shared.telemetry import stage, streamed
+
+def _caption_messages(prompt):
+    return [
+        {"role": "system", "content": "You're a product copywriter for interior designs."},
+        {"role": "user", "content": prompt}
+    ]
 
 # Function to generate text using OpenAI's API
 def generate_caption(prompt):
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": "You're a product copywriter for interior designs."},
-            {"role": "user", "content": prompt}
-        ]
-    )
+    with stage("caption", model="gpt-3.5-turbo") as span:
+        response = call_model(
+            "gpt-3.5-turbo",
+            get_openai_client().chat.completions.create,
+            model="gpt-3.5-turbo",
+            messages=_caption_messages(prompt),
+            est_tokens=estimate_request_tokens(prompt)
+        )
+        span.record_usage(response)
     return response.choices[0].message.content # Return the generated text
+
+# Streaming variant – yields the caption token by token as it is generated
+def stream_caption(prompt):
+    with stage("caption", model="gpt-3.5-turbo", current=False) as span:
+        stream = streamed(stream_model(
+            "gpt-3.5-turbo",
+            get_openai_client().chat.completions.create,
+            model="gpt-3.5-turbo",
+            messages=_caption_messages(prompt),
+            stream=True,
+            stream_options={"include_usage": True},  # final chunk carries token usage
+            est_tokens=estimate_request_tokens(prompt)
+        ), span=span)
+        parts, usage_reported = [], False
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage_reported = span.record_usage(chunk)
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        if not usage_reported:
+            span.estimate_usage(prompt, "".join(parts))
+
@@ -1,15 +1,24 @@
 import datetime
 import csv
-import os
 
-# Ensure sessions.csv exists with proper headers
-if not os.path.exists("sessions.csv"):
-    with open("sessions.csv", mode="w", newline="") as file:
-        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
-        writer.writerow(["timestamp", "user", "prompt", "variant", "image_url"])
+from shared.log_writer import get_csv_log
+
+LOG_FILE = "sessions.csv"
+HEADER = ["timestamp", "user", "prompt", "variant", "image_url"]
+
+
+# Rows are queued and written to sessions.csv by a background thread (header included)
+def _log():
+    return get_csv_log(LOG_FILE, HEADER, quoting=csv.QUOTE_ALL)
 
 # Log function with separate fields
 def log_event(prompt, image_url, user="anonymous", variant=""):
-    with open("sessions.csv", mode="a", newline="") as file:
-        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
-        writer.writerow([str(datetime.datetime.now()), user, prompt, variant, image_url])
+    _log().append([str(datetime.datetime.now()), user, prompt, variant, image_url])
+
+# Most recent sessions for a user, newest first (reads from the end of the log)
+def get_recent_images(user, limit=3):
+    return _log().recent(user, limit)
+
+# Write the user's full history (archive partitions + live log) as CSV to `out`; returns the row count
+def export_user_sessions(user, out):
+    return _log().export_user(user, out)
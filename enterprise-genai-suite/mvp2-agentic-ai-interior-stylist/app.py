@@ -1,9 +1,12 @@
 # app.py
 import streamlit as st
-from agents import run_agent_workflow
-from utils import log_event, get_recent_prompts
-import pandas as pd
+import sys
 import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # shared/
+from agents import run_agent_workflow
+from policy import get_policy
+from utils import log_event, get_recent_prompts, export_user_sessions
+from shared.downloads import sidebar_download
 
 st.set_page_config(page_title="AI Interior Stylist", layout="centered")
 
@@ -69,6 +72,20 @@ if prompt.strip():
         st.success("✅ Review complete!")
         st.markdown("### 📄 Agent Response")
         st.code(result)
+
+        # Show exactly which words tripped a check
+        flagged = sorted((m for matches in get_policy().find_all(prompt.strip()).values() for m in matches),
+                         key=lambda m: m.start)
+        if flagged:
+            highlighted, cursor = "", 0
+            for m in flagged:
+                if m.start < cursor:
+                    continue
+                highlighted += prompt.strip()[cursor:m.start] + f"**:red[{m.text}]**"
+                cursor = m.end
+            highlighted += prompt.strip()[cursor:]
+            st.markdown(f"🔍 **Flagged terms:** {highlighted}")
+
         log_event(prompt.strip(), user.strip().lower(), result)
 else:
     st.info("Please enter a prompt or select a preset above.")
@@ -80,25 +97,12 @@ st.divider()
 # -------------------------------
 if st.sidebar.button("📥 Download session log"):
     try:
-        # Check if file exists first
-        if not os.path.exists("session_log.csv"):
-            st.sidebar.info("No session log found.")
+        # Only this user's archive partitions + the live log are read, streamed (see shared/downloads.py)
+        user_id = st.session_state.get("user", "").strip().lower()
+        if get_recent_prompts(user_id, limit=1):
+            sidebar_download(lambda out: export_user_sessions(user_id, out), f"{user_id}_session_log.csv")
         else:
-            df_all = pd.read_csv("session_log.csv")
-            user_id = st.session_state.get("user", "").strip().lower()
-            
-            # Filter for current user
-            df_user = df_all[df_all["user"].str.strip().str.lower() == user_id]
-            
-            if not df_user.empty:
-                st.sidebar.download_button(
-                    label="Download CSV",
-                    data=df_user.to_csv(index=False),
-                    file_name=f"{user_id}_session_log.csv",
-                    mime="text/csv"
-                )
-            else:
-                st.sidebar.info("No sessions found for current user.")
+            st.sidebar.info("No sessions found for current user.")
 
     except Exception as e:
         st.sidebar.warning(f"Couldn't load session log. Error: {e}")
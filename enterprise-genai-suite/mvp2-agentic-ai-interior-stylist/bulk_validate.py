@@ -0,0 +1,149 @@
+# bulk_validate.py – run whole prompt catalogs through the Style QA / Compliance / Publishing workflow
+#
+# Usage:
+#   python bulk_validate.py catalog.csv --output results.jsonl --workers 8
+#
+# Input is a CSV (a `prompt` column, optional `id`), a JSONL file with the same
+# keys, or a plain text file with one prompt per line. Prompts are streamed,
+# validated across a process pool in chunks and written as JSONL in input
+# order, one record per prompt with the same keys `run_agent_workflow` returns.
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # shared/
+
+from agents import run_agent_workflow
+from policy import get_policy
+
+# Distinct prompts remembered per worker process
+MEMO_SIZE = 100_000
+
+
+# -------------------------------
+# Input
+# -------------------------------
+def read_prompts(path):
+    """Yield `(id, prompt)` pairs from a CSV, JSONL or plain text file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            rows = (json.loads(line) for line in f if line.strip())
+        elif path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = ({"prompt": line.rstrip("\n")} for line in f)
+
+        for n, row in enumerate(rows, start=1):
+            prompt = (row.get("prompt") or "").strip()
+            if prompt:
+                yield str(row.get("id") or f"row-{n}"), prompt
+
+
+# -------------------------------
+# Validation (runs in the worker processes)
+# -------------------------------
+_memo = {}
+_memo_policy = None
+
+
+def validate(prompt, short_circuit=False):
+    """Memoized `run_agent_workflow`; the memo is dropped whenever policy.json is reloaded."""
+    global _memo_policy
+    policy = get_policy()
+    if policy is not _memo_policy:
+        _memo.clear()
+        _memo_policy = policy
+
+    key = (prompt, short_circuit)
+    result = _memo.get(key)
+    if result is None:
+        if len(_memo) >= MEMO_SIZE:
+            _memo.clear()
+        result = _memo[key] = run_agent_workflow(prompt, short_circuit=short_circuit)
+    return result
+
+
+def _validate_chunk(args):
+    chunk, short_circuit = args
+    return [(row_id, prompt, validate(prompt, short_circuit)) for row_id, prompt in chunk]
+
+
+def _chunks(items, size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate_prompts(items, workers=None, chunk_size=1000, short_circuit=False):
+    """Yield `(id, prompt, result)` for every `(id, prompt)` in `items`, in input order.
+
+    `workers=0` validates in this process (no pool start-up cost for small inputs).
+    """
+    jobs = ((chunk, short_circuit) for chunk in _chunks(items, chunk_size))
+    if workers == 0:
+        for job in jobs:
+            yield from _validate_chunk(job)
+        return
+
+    with multiprocessing.Pool(processes=workers or os.cpu_count()) as pool:
+        # imap keeps memory flat: chunks are read, validated and written as a stream
+        for results in pool.imap(_validate_chunk, jobs):
+            yield from results
+
+
+# -------------------------------
+# CLI
+# -------------------------------
+def run_bulk(input_path, output_path, workers=None, chunk_size=1000, short_circuit=False, progress_every=100_000):
+    """Validate every prompt in `input_path` into `output_path`; return a summary dict."""
+    stats = {"processed": 0, "passed": 0, "failed": 0}
+    unique = set()
+    start = time.perf_counter()
+
+    with open(output_path, "w", encoding="utf-8") as out:
+        for row_id, prompt, result in validate_prompts(read_prompts(input_path), workers, chunk_size,
+                                                       short_circuit):
+            out.write(json.dumps({"id": row_id, "prompt": prompt, **result}, ensure_ascii=False) + "\n")
+            stats["processed"] += 1
+            stats["failed" if result["Publishing"].startswith("⛔") else "passed"] += 1
+            if len(unique) < MEMO_SIZE:
+                unique.add(prompt)
+            if progress_every and stats["processed"] % progress_every == 0:
+                rate = stats["processed"] / (time.perf_counter() - start)
+                print(f"[bulk] {stats['processed']} validated – {rate:,.0f} prompts/sec", flush=True)
+
+    elapsed = time.perf_counter() - start
+    stats["distinct_prompts"] = len(unique)
+    stats["elapsed"] = round(elapsed, 3)
+    stats["prompts_per_sec"] = round(stats["processed"] / elapsed, 1) if elapsed else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate a catalog of interior styling prompts.")
+    parser.add_argument("input", help="CSV/JSONL with prompt[,id] columns, or a text file with one prompt per line")
+    parser.add_argument("--output", "-o", default="bulk_results.jsonl", help="JSONL file to write results to")
+    parser.add_argument("--workers", "-w", type=int, default=None,
+                        help="Worker processes (default: CPU count; 0 = run in this process)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Prompts sent to a worker at a time")
+    parser.add_argument("--short-circuit", action="store_true",
+                        help="Skip the compliance check for prompts that already failed Style QA (faster, "
+                             "but their Compliance Check reads 'skipped' instead of the app's result)")
+    args = parser.parse_args(argv)
+
+    stats = run_bulk(args.input, args.output, args.workers, args.chunk_size,
+                     short_circuit=args.short_circuit)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
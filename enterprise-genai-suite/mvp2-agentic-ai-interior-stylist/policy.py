@@ -0,0 +1,146 @@
+# policy.py – banned-term policy compiled into one regex per check
+#
+# Terms live in policy.json (one list per check). Each list is folded into a
+# trie and emitted as a single regex with shared prefixes, so matching cost
+# grows with the prompt length rather than with the number of terms. Matches
+# respect word boundaries ("sale" does not fire inside "wholesale"), ignore
+# case, accept common inflections ("discounts", "stressed") and treat hyphens
+# and spaces alike ("low cost").
+# Editing policy.json takes effect on the next check, without a restart.
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+POLICY_FILE = os.getenv("POLICY_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "policy.json"))
+# How often (seconds) the policy file's mtime is checked for edits
+RELOAD_INTERVAL = float(os.getenv("POLICY_RELOAD_INTERVAL", "1"))
+
+INFLECTIONS = ("s", "es", "ed", "d", "ing", "er", "ers", "est", "ly", "ness", "ful")
+
+TermMatch = namedtuple("TermMatch", ["term", "start", "end", "text"])
+
+
+def _normalize(term):
+    return re.sub(r"[\s\-]+", " ", term.strip().casefold())
+
+
+def _trie_pattern(words):
+    """Regex source for `words` with common prefixes factored out (a compiled trie)."""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def emit(node):
+        ends_here = "" in node
+        branches = [_char_pattern(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends_here:
+            return f"(?:{body})?"
+        return body
+
+    return emit(trie)
+
+
+def _char_pattern(char):
+    return r"[\s\-]+" if char == " " else re.escape(char)
+
+
+class TermMatcher:
+    """Finds whole-word (optionally inflected) occurrences of a fixed term list."""
+
+    def __init__(self, terms):
+        self.terms = {}
+        for term in terms:
+            self.terms.setdefault(_normalize(term), term)
+        suffixes = "|".join(sorted(INFLECTIONS, key=len, reverse=True))
+        self.pattern = re.compile(
+            rf"(?<!\w)({_trie_pattern(self.terms)})(?:{suffixes})?(?!\w)", re.IGNORECASE
+        ) if self.terms else None
+
+    def _term_for(self, matched):
+        term = self.terms.get(matched.lower())
+        return term if term is not None else self.terms[_normalize(matched)]
+
+    def find(self, text):
+        """Every match in `text`, with its policy term and character span."""
+        if self.pattern is None:
+            return []
+        return [TermMatch(self._term_for(m.group(1)), m.start(), m.end(), m.group(0))
+                for m in self.pattern.finditer(text)]
+
+    def terms_in(self, text):
+        """Distinct policy terms found in `text`, in order of first appearance."""
+        if self.pattern is None:
+            return []
+        found = {}
+        for m in self.pattern.finditer(text):
+            found.setdefault(self._term_for(m.group(1)), None)
+        return list(found)
+
+
+class Policy:
+    def __init__(self, data):
+        self.matchers = {name: TermMatcher(section.get("terms", [])) for name, section in data.items()}
+
+    def __getitem__(self, name):
+        return self.matchers[name]
+
+    def find_all(self, text):
+        """`{check name: [TermMatch, ...]}` for every check with at least one match."""
+        found = {name: matcher.find(text) for name, matcher in self.matchers.items()}
+        return {name: matches for name, matches in found.items() if matches}
+
+
+# -------------------------------
+# Hot-reloading Loader
+# -------------------------------
+class PolicyLoader:
+    """Keeps the compiled policy in sync with the file, rechecking its mtime at most every `interval`."""
+
+    def __init__(self, path=POLICY_FILE, interval=RELOAD_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._policy = None
+        self._mtime = None
+        self._checked = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        if self._policy is not None and now - self._checked < self.interval:
+            return self._policy
+        with self._lock:
+            self._checked = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError as e:
+                if self._policy is None:
+                    raise
+                print(f"⚠️ Policy file unavailable, keeping the loaded policy: {e}")
+                return self._policy
+            if mtime != self._mtime:
+                try:
+                    with open(self.path, encoding="utf-8") as f:
+                        self._policy = Policy(json.load(f))
+                    self._mtime = mtime
+                except (OSError, ValueError) as e:
+                    if self._policy is None:
+                        raise
+                    print(f"⚠️ Couldn't reload {self.path}, keeping the previous policy: {e}")
+            return self._policy
+
+
+_loader = PolicyLoader()
+
+
+def get_policy():
+    """Current compiled policy (reloaded automatically when policy.json changes)."""
+    return _loader.get()
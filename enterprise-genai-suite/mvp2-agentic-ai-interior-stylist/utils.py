@@ -1,28 +1,22 @@
 import csv
 from datetime import datetime
-import os
+
+from shared.log_writer import get_csv_log
 
 LOG_FILE = "session_log.csv"
+HEADER = ["timestamp", "user", "prompt", "result"]
+
 
-# Ensure session_log.csv exists with proper headers
-if not os.path.exists(LOG_FILE):
-    with open(LOG_FILE, "w", newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(["timestamp", "user", "prompt", "result"])
+# Rows are queued and written to session_log.csv by a background thread (header included)
+def _log():
+    return get_csv_log(LOG_FILE, HEADER)
 
 # -------------------------------
 # Log Each Session
 # -------------------------------
 def log_event(prompt, user, result):
     """Append prompt + result + user + timestamp to CSV log file."""
-    row = [datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user, prompt, result]
-
-    try:
-        with open(LOG_FILE, "a", newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(row)
-    except Exception as e:
-        print(f"❌ Failed to log event: {e}")
+    _log().append([datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user, prompt, result])
 
 # -------------------------------
 # Load Recent Prompts for a User
@@ -31,20 +25,16 @@ def log_event(prompt, user, result):
 def get_recent_prompts(user, limit=3):
     """Return the most recent prompt+result pairs for the given user."""
     try:
-        with open(LOG_FILE, newline='') as f:
-            reader = csv.DictReader(f)
-            rows = [
-                row for row in reader 
-                if row.get("user", "").strip().lower() == user.lower()
-            ]
-
-        # Sort by timestamp (newest first), then take top N
-        rows.sort(
-            key=lambda x: datetime.strptime(x.get("timestamp", "1970-01-01 00:00:00"), "%Y-%m-%d %H:%M:%S"),
-            reverse=True
-        )
-
-        return rows[:limit] if rows else []
+        # The log is append-only, so the newest rows are at the end of the file (plus any still queued)
+        return _log().recent(user, limit)
     except Exception as e:
         print(f"⚠️ Couldn't read session log: {e}")
-        return []
\ No newline at end of file
+        return []
+
+# -------------------------------
+# Export a User's Sessions
+# -------------------------------
+
+def export_user_sessions(user, out):
+    """Write the user's full history (archive + live log) as CSV to `out`; returns the row count."""
+    return _log().export_user(user, out)
\ No newline at end of file
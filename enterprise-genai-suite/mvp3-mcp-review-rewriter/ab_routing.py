@@ -0,0 +1,144 @@
+# ab_routing.py – compare model routing policies on the same reviews
+#
+# Usage:
+#   python ab_routing.py reviews.csv --policies default fast --limit 50 --json ab.json
+#
+# Every review is run through the full pipeline once per policy (the LLM
+# response cache is bypassed, so latency and cost are real). Per policy it
+# reports latency percentiles, estimated cost, LLM calls, how often the editor
+# ran, and critique scores. A policy's own critique stage may be a cheaper, more
+# lenient model, so each final review is also re-scored by one fixed judge
+# (`--judge-model`, gpt-4 at temperature 0) to keep quality comparable.
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # shared/
+
+from batch import DEFAULT_TONE, read_reviews
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(q * (len(values) - 1))))]
+
+
+def _mean(values):
+    return round(sum(values) / len(values), 4) if values else None
+
+
+def run_policy(policy, reviews, judge=None, concurrency=4, score_threshold=None):
+    """Run `reviews` through the pipeline with routing `policy`; return per-review records."""
+    import pipeline
+    from agents.critique_agent import critique_review, parse_critique_scores, scores_pass
+    from llm_cache import bypass_cache
+    from shared.scheduler import schedule_as
+
+    threshold = pipeline.SCORE_THRESHOLD if score_threshold is None else score_threshold
+
+    def one(item):
+        start = time.perf_counter()
+        try:
+            with bypass_cache(), schedule_as("ab-routing", "batch"):
+                result = pipeline.run_review_pipeline(item["review"], item["tone"], threshold,
+                                                      routing=policy, request_id=f"{policy}:{item['id']}")
+                judge_scores = parse_critique_scores(critique_review(result["final"], judge)) if judge else None
+        except Exception as e:
+            return {"id": item["id"], "policy": policy, "error": str(e)}
+        return {
+            "id": item["id"],
+            "policy": policy,
+            "latency_s": round(time.perf_counter() - start, 3),
+            "cost_usd": result["trace"]["cost_usd"],
+            "llm_calls": result["llm_calls"],
+            "edit_rounds": result["edit_rounds"],
+            "scores": result["scores"],
+            "passed": scores_pass(result["scores"], threshold),
+            "judge_scores": judge_scores,
+            "judge_passed": scores_pass(judge_scores, threshold) if judge_scores is not None else None,
+        }
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(one, reviews))
+
+
+def summarize(records):
+    ok = [r for r in records if "error" not in r]
+    latencies = [r["latency_s"] for r in ok]
+    summary = {
+        "reviews": len(records),
+        "failed": len(records) - len(ok),
+        "latency_p50_s": _percentile(latencies, 0.5),
+        "latency_p95_s": _percentile(latencies, 0.95),
+        "cost_usd_total": round(sum(r["cost_usd"] for r in ok), 4),
+        "cost_usd_per_review": _mean([r["cost_usd"] for r in ok]),
+        "llm_calls_per_review": _mean([r["llm_calls"] for r in ok]),
+        "edit_rate": _mean([1.0 if r["edit_rounds"] else 0.0 for r in ok]),
+        "pass_rate": _mean([1.0 if r["passed"] else 0.0 for r in ok]),
+    }
+    for key in ("scores", "judge_scores"):
+        criteria = sorted({c for r in ok if r[key] for c in r[key]})
+        summary[key] = {c: _mean([r[key][c] for r in ok if r[key] and c in r[key]]) for c in criteria}
+    judged = [r for r in ok if r["judge_passed"] is not None]
+    summary["judge_pass_rate"] = _mean([1.0 if r["judge_passed"] else 0.0 for r in judged])
+    return summary
+
+
+def compare(input_path, policies, limit=None, judge_model="gpt-4", concurrency=4, default_tone=DEFAULT_TONE,
+            score_threshold=None):
+    """Run every policy over the same reviews; return `{"policies": {name: summary}, "records": [...]}`."""
+    from llm_cache import CachedLLM
+    from shared.clients import get_chat_model
+
+    reviews = list(islice(read_reviews(input_path, default_tone), limit))
+    judge = CachedLLM(get_chat_model(model=judge_model, temperature=0)) if judge_model else None
+    results = {"reviews": len(reviews), "judge_model": judge_model, "policies": {}, "records": []}
+    for policy in policies:
+        records = run_policy(policy, reviews, judge, concurrency, score_threshold)
+        results["policies"][policy] = summarize(records)
+        results["records"] += records
+    return results
+
+
+def print_table(results):
+    columns = [("latency_p50_s", "p50 s"), ("latency_p95_s", "p95 s"), ("cost_usd_per_review", "$/review"),
+               ("llm_calls_per_review", "calls"), ("edit_rate", "edited"), ("pass_rate", "self pass"),
+               ("judge_pass_rate", "judge pass")]
+    print(f"{'policy':<16}" + "".join(f"{label:>12}" for _, label in columns))
+    for policy, summary in results["policies"].items():
+        cells = "".join(f"{'–' if summary[key] is None else summary[key]:>12}" for key, _ in columns)
+        print(f"{policy:<16}{cells}")
+    for policy, summary in results["policies"].items():
+        print(f"{policy}: self {summary['scores']} | judge {summary['judge_scores']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="A/B test model routing policies on a file of reviews.")
+    parser.add_argument("input", help="CSV or JSONL file with review[,tone,id] columns")
+    parser.add_argument("--policies", nargs="+", default=["default", "fast"],
+                        help="Routing policies to compare (names in routing/ or JSON paths)")
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N reviews")
+    parser.add_argument("--judge-model", default="gpt-4",
+                        help="Model that re-scores every final review at temperature 0 ('' to skip)")
+    parser.add_argument("--concurrency", "-c", type=int, default=4)
+    parser.add_argument("--score-threshold", type=float, default=None)
+    parser.add_argument("--json", default=None, help="Write the summaries and per-review records here")
+    args = parser.parse_args(argv)
+
+    results = compare(args.input, args.policies, args.limit, args.judge_model or None, args.concurrency,
+                      score_threshold=args.score_threshold)
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
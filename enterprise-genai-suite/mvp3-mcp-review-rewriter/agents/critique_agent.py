@@ -1,15 +1,23 @@
 # agents/critique_agent.py
+import re
 
-def critique_review(rewritten_review: str, llm) -> str:
-    if llm is None:
-        raise RuntimeError("LLM was not initialized properly.")
+from shared.telemetry import stage, streamed
 
-    prompt = f"""
-    Evaluate the following customer review across four criteria:
-    - Clarity (1–5)
+# Canonical rubric names, matched against whatever label the model writes
+CRITERIA = ["Clarity", "Tone Fit", "Empathy", "Brand Voice Consistency"]
+
+_SCORE_LINE = re.compile(r"^[\s\-\*#>•]*(?P<label>[A-Za-z][A-Za-z \-]*?)[\s\*]*:[\s\*]*(?P<score>[0-5](?:\.\d+)?)(?:\s*/\s*5)?")
+
+CRITIQUE_CRITERIA_PROMPT = """    - Clarity (1–5)
     - Tone Fit to premium brand (1–5)
     - Empathy (1–5)
-    - Brand Voice Consistency (1–5)
+    - Brand Voice Consistency (1–5)"""
+
+
+def build_critique_prompt(rewritten_review: str) -> str:
+    return f"""
+    Evaluate the following customer review across four criteria:
+{CRITIQUE_CRITERIA_PROMPT}
 
     For each, rate it like: `Clarity: 4/5. Reason here...`
 
@@ -23,8 +31,75 @@ def critique_review(rewritten_review: str, llm) -> str:
     Brand Voice Consistency: <score>/5. <short reason>
     """
 
+
+def critique_review(rewritten_review: str, llm) -> str:
+    if llm is None:
+        raise RuntimeError("LLM was not initialized properly.")
+
+    prompt = build_critique_prompt(rewritten_review)
+
     #return llm.invoke(prompt)  # ✅ Use `invoke` if on langchain > 0.1.x
-    response = llm.invoke(prompt)
+    with stage("critique"):
+        response = llm.invoke(prompt)
     return response.content if hasattr(response, "content") else str(response)
 
-    
\ No newline at end of file
+
+def iter_complete_lines(chunks):
+    """Group streamed text chunks into complete, non-empty lines."""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk.content if hasattr(chunk, "content") else str(chunk)
+        while "\n" in buffer:
+            line, buffer = buffer.split("\n", 1)
+            if line.strip():
+                yield line.strip()
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def stream_critique_review(rewritten_review: str, llm):
+    """Yield each critique line (e.g. `Clarity: 4/5. ...`) as soon as it is complete."""
+    if llm is None:
+        raise RuntimeError("LLM was not initialized properly.")
+
+    with stage("critique", current=False) as span:
+        yield from iter_complete_lines(streamed(llm.stream(build_critique_prompt(rewritten_review)), span=span))
+
+
+def _criterion_for(label: str):
+    label = label.lower()
+    if "clarity" in label:
+        return "Clarity"
+    if "tone" in label:
+        return "Tone Fit"
+    if "empathy" in label:
+        return "Empathy"
+    if "brand" in label or "voice" in label:
+        return "Brand Voice Consistency"
+    return None
+
+
+def parse_critique_line(line: str):
+    """Return `(criterion, score)` for a line like `Clarity: 4/5. ...`, else None."""
+    match = _SCORE_LINE.match(line)
+    if not match:
+        return None
+    criterion = _criterion_for(match.group("label"))
+    if criterion is None:
+        return None
+    return criterion, float(match.group("score"))
+
+
+def parse_critique_scores(critique: str) -> dict:
+    """Parse critique text into `{criterion: score}` for the four rubric criteria."""
+    scores = {}
+    for line in (critique or "").split("\n"):
+        parsed = parse_critique_line(line)
+        if parsed and parsed[0] not in scores:
+            scores[parsed[0]] = parsed[1]
+    return scores
+
+
+def scores_pass(scores: dict, threshold: float) -> bool:
+    """True when every criterion was scored and meets the threshold."""
+    return all(scores.get(criterion, 0) >= threshold for criterion in CRITERIA)
@@ -1,8 +1,7 @@
-def improve_review_with_feedback(rewritten_review: str, critique_feedback: str, llm) -> str:
-  if not llm:
-      raise RuntimeError("LLM was not initialized properly.")
+from shared.telemetry import stage, streamed
 
-  prompt = f"""
+def build_editor_prompt(rewritten_review: str, critique_feedback: str) -> str:
+  return f"""
 You are an editor improving customer reviews.
 
 Given the following critique:
@@ -14,7 +13,22 @@ Revise the review below to address all feedback:
 
 Improved Review:
 """
+
+def improve_review_with_feedback(rewritten_review: str, critique_feedback: str, llm) -> str:
+  if not llm:
+      raise RuntimeError("LLM was not initialized properly.")
+
+  prompt = build_editor_prompt(rewritten_review, critique_feedback)
   #return llm.invoke(prompt)  # ✅ Use .invoke for consistency
-  response = llm.invoke(prompt)
+  with stage("edit"):
+      response = llm.invoke(prompt)
   return response.content if hasattr(response, "content") else str(response)
 
+def stream_improved_review(rewritten_review: str, critique_feedback: str, llm):
+  """Yield the edited review token by token."""
+  if not llm:
+      raise RuntimeError("LLM was not initialized properly.")
+
+  with stage("edit", current=False) as span:
+      for chunk in streamed(llm.stream(build_editor_prompt(rewritten_review, critique_feedback)), span=span):
+          yield chunk.content if hasattr(chunk, "content") else str(chunk)
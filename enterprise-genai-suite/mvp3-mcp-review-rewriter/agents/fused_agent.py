@@ -0,0 +1,88 @@
+# agents/fused_agent.py
+import json
+import re
+
+from agents.critique_agent import CRITIQUE_CRITERIA_PROMPT, CRITERIA
+from shared.telemetry import stage
+
+
+class FusedResponseError(ValueError):
+    """Raised when the fused JSON response is missing or fails validation."""
+
+
+def build_fused_prompt(original_review: str, tone_prompt: str) -> str:
+    criteria = ", ".join(f'"{c}"' for c in CRITERIA)
+    return f"""{tone_prompt}
+
+Rewrite the customer review below, then evaluate your rewrite across four criteria:
+{CRITIQUE_CRITERIA_PROMPT}
+
+Customer Review:
+"{original_review}"
+
+Respond with a single JSON object and nothing else, using exactly this shape:
+{{
+  "rewritten": "<the rewritten review>",
+  "evaluation": {{
+    "<criterion>": {{"score": <integer 1-5>, "reason": "<short reason>"}}
+  }}
+}}
+The "evaluation" object must contain exactly these keys: {criteria}.
+"""
+
+
+def _extract_json(text: str) -> str:
+    # Tolerate ```json fences or a sentence around the object
+    fenced = re.search(r"```(?:json)?\s*(\{.*\})\s*```", text, re.DOTALL)
+    if fenced:
+        return fenced.group(1)
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        raise FusedResponseError("No JSON object in fused response")
+    return text[start:end + 1]
+
+
+def parse_fused_response(text: str) -> dict:
+    """Validate the fused JSON and return `{"draft", "scores", "critique"}`.
+
+    `critique` is rendered in the same `Criterion: n/5. reason` line format the
+    critique agent produces, so logging and display stay unchanged.
+    """
+    try:
+        data = json.loads(_extract_json(text))
+    except json.JSONDecodeError as e:
+        raise FusedResponseError(f"Invalid JSON in fused response: {e}") from e
+
+    if not isinstance(data, dict):
+        raise FusedResponseError("Fused response is not a JSON object")
+    draft = data.get("rewritten")
+    evaluation = data.get("evaluation")
+    if not isinstance(draft, str) or not draft.strip():
+        raise FusedResponseError("Fused response has no 'rewritten' text")
+    if not isinstance(evaluation, dict):
+        raise FusedResponseError("Fused response has no 'evaluation' object")
+
+    scores, lines = {}, []
+    for criterion in CRITERIA:
+        entry = evaluation.get(criterion)
+        if not isinstance(entry, dict):
+            raise FusedResponseError(f"Missing evaluation for '{criterion}'")
+        score = entry.get("score")
+        if isinstance(score, bool) or not isinstance(score, (int, float)) or not 1 <= score <= 5:
+            raise FusedResponseError(f"Invalid score for '{criterion}': {score!r}")
+        reason = str(entry.get("reason", "")).strip()
+        scores[criterion] = float(score)
+        lines.append(f"{criterion}: {score:g}/5. {reason}".rstrip())
+
+    return {"draft": draft.strip(), "scores": scores, "critique": "\n".join(lines)}
+
+
+def rewrite_and_critique(original_review: str, tone_prompt: str, llm) -> dict:
+    """Produce the rewrite and its self-evaluation in a single LLM call."""
+    if llm is None:
+        raise RuntimeError("LLM was not initialized properly.")
+
+    with stage("fused"):
+        response = llm.invoke(build_fused_prompt(original_review, tone_prompt))
+    text = response.content if hasattr(response, "content") else str(response)
+    return parse_fused_response(text)
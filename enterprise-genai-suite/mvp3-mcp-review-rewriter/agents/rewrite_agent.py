@@ -1,25 +1,32 @@
 # agents/rewrite_agent.py
 
-import os
-from dotenv import load_dotenv
-#from langchain.chat_models import ChatOpenAI
-from langchain_openai import ChatOpenAI
+import functools
 
+from llm_cache import CachedLLM, chunk_text
+from shared.clients import get_chat_model
+from shared.telemetry import stage, streamed
 
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
 
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY is not set in the environment")
+# ✅ Shared LLM object (responses cached by model + temperature + prompt).
+# Built on first use so importing the agents stays cheap.
+@functools.lru_cache(maxsize=None)
+def get_llm():
+    return CachedLLM(get_chat_model(model="gpt-4", temperature=0.7))
 
-# ✅ Shared LLM object that can be imported
-llm = ChatOpenAI(
-    model="gpt-4",
-    temperature=0.7,
-    openai_api_key=openai_api_key
-)
+def build_rewrite_prompt(original_review: str, tone_prompt: str) -> str:
+    return f"""{tone_prompt}\n\nCustomer Review:\n"{original_review}"\n\nRewritten:"""
 
-def rewrite_review(original_review: str, tone_prompt: str) -> str:
-    prompt = f"""{tone_prompt}\n\nCustomer Review:\n"{original_review}"\n\nRewritten:"""
+def rewrite_review(original_review: str, tone_prompt: str, llm=None) -> str:
+    prompt = build_rewrite_prompt(original_review, tone_prompt)
     #return llm.predict(prompt)
-    return llm.invoke(prompt) # Try this if the above line doesn't work
+    with stage("rewrite"):
+        response = (llm or get_llm()).invoke(prompt)
+    return response.content if hasattr(response, "content") else str(response)
+
+def stream_rewrite_review(original_review: str, tone_prompt: str, llm=None):
+    """Yield the rewritten review token by token."""
+    prompt = build_rewrite_prompt(original_review, tone_prompt)
+    with stage("rewrite", current=False) as span:
+        for chunk in streamed((llm or get_llm()).stream(prompt), span=span):
+            yield chunk_text(chunk)
+
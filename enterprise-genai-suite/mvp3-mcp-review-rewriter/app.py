@@ -1,17 +1,24 @@
-import pandas as pd
-import json
+import contextlib
+from datetime import datetime, timedelta
 import streamlit as st
 import sys
 import os
-from agents.rewrite_agent import llm
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
-
-
-from agents.intent_parser import generate_tone_prompt
-from agents.rewrite_agent import rewrite_review, llm
-from agents.critique_agent import critique_review
-from agents.editor_agent import improve_review_with_feedback
-from utils import log_rewrite, get_recent_rewrites
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # shared/
+
+
+from pipeline import (
+    run_review_pipeline, stream_review_pipeline, find_reusable_rewrite,
+    SCORE_THRESHOLD, MAX_EDIT_ROUNDS, PIPELINE_MODES, PIPELINE_MODE, REUSE_SIMILARITY,
+)
+from llm_cache import bypass_cache, get_cache
+from router import ROUTING_POLICY, available_policies, get_routing_policy
+from utils import log_rewrite, get_recent_rewrites, flush_rewrites
+from review_store import get_store
+from tone_memory import get_tone_memory
+from shared.admin_panel import render_admin_panel
+from shared.downloads import sidebar_download
+from shared.scheduler import schedule_as
 
 st.set_page_config(page_title="🧠 MCP Review Rewriter (Agentic)", layout="centered")
 
@@ -42,79 +49,148 @@ user = st.session_state.user
 st.markdown(f"👤 Logged in as: `{user}`")
 use_memory = st.checkbox("🧠 Use Tone Memory", value=True)
 reset_memory = st.checkbox("🗑️ Reset Tone Memory for this session", value=False)
+use_cache = st.sidebar.checkbox("♻️ Reuse cached LLM responses", value=True,
+                                help="Turn off to force fresh (non-deterministic) generations.")
+pipeline_mode = st.sidebar.radio("🧩 Pipeline mode", PIPELINE_MODES, index=PIPELINE_MODES.index(PIPELINE_MODE),
+                                 help="Fused mode drafts and self-evaluates in one JSON call; "
+                                      "it falls back to three-stage if the JSON is invalid.")
+routing_policies = available_policies() or ["default"]
+routing = st.sidebar.selectbox("🧭 Model routing", routing_policies,
+                               index=routing_policies.index(ROUTING_POLICY) if ROUTING_POLICY in routing_policies else 0,
+                               help="Per-stage model, temperature and max_tokens (routing/*.json).")
+st.sidebar.caption(get_routing_policy(routing).description)
+stream_output = st.sidebar.checkbox("⚡ Stream output as it is generated", value=True)
+score_threshold = st.sidebar.slider("✅ Skip editor when every score is at least", 1, 5,
+                                    int(SCORE_THRESHOLD))
+max_edit_rounds = st.sidebar.number_input("🔁 Max editor passes", min_value=0, max_value=5,
+                                          value=MAX_EDIT_ROUNDS)
+reuse_similar = st.sidebar.checkbox("🧬 Reuse rewrites of near-identical reviews", value=True,
+                                    help="Return the logged rewrite of an earlier, similar review in the same "
+                                         "tone instead of calling the LLM.")
+reuse_similarity = st.sidebar.slider("🧬 Minimum similarity", 0.5, 1.0, REUSE_SIMILARITY, 0.05,
+                                     disabled=not reuse_similar)
 
 st.markdown("## ✍️ Rewrite and Evaluate Customer Review")
 
-import json
+TONES = ["Warm & Friendly", "Luxury & Premium", "Helpful & Technical"]
+DEGRADED_NOTICE = ("⚠️ The model provider is not responding, so this result is degraded "
+                   "(an earlier similar rewrite, or a draft without evaluation/editing). Try again shortly.")
+# Days shown in the quality dashboard's trend chart
+TREND_DAYS = 14
 
-# Load tone memory file
-if os.path.exists("tone_memory.json"):
-    with open("tone_memory.json", "r") as f:
-        tone_memory = json.load(f)
-else:
-    tone_memory = {}
+# Tone memory is loaded once per process and written behind only on change
+tone_memory = get_tone_memory()
 
 # Determine default tone
-if use_memory and user in tone_memory and not reset_memory:
-    default_tone = tone_memory[user]
-else:
+default_tone = "Warm & Friendly"
+if use_memory and not reset_memory:
+    default_tone = tone_memory.get(user, default_tone)
+if default_tone not in TONES:
     default_tone = "Warm & Friendly"
 
 # Show tone selector
-tone = st.selectbox("🎯 Choose tone preference:", [
-    "Warm & Friendly", "Luxury & Premium", "Helpful & Technical"
-], index=["Warm & Friendly", "Luxury & Premium", "Helpful & Technical"].index(default_tone))
+tone = st.selectbox("🎯 Choose tone preference:", TONES, index=TONES.index(default_tone))
 
 # Save selection if memory is ON
 if use_memory and not reset_memory:
-    tone_memory[user] = tone
-    with open("tone_memory.json", "w") as f:
-        json.dump(tone_memory, f)
+    tone_memory.set(user, tone)
 
 
 review = st.text_area("📝 Paste a customer review here:")
 
+# Offer an earlier rewrite when this review (nearly) repeats one already handled in this tone
+similar_match = find_reusable_rewrite(review, tone, reuse_similarity) if review.strip() else None
+if similar_match:
+    with st.expander(f"🧬 A {similar_match['similarity']:.0%} similar review was already rewritten in this tone"):
+        st.markdown(f"🕒 {similar_match['timestamp']} – 📝 {similar_match['original'][:150]}")
+        st.code(similar_match["rewritten"])
+
 if st.button("🔁 Rewrite + Evaluate"):
     if not review.strip():
         st.warning("Review text is required.")
     else:
-        with st.spinner("Processing..."):
-            print("LLM object:", llm)
-
-            # Agent 1: Intent Parser
-            tone_prompt = generate_tone_prompt(tone)
-            print("1 LLM object:", llm)
-
-            # Agent 2: Rewrite
-            draft_review = rewrite_review(review, tone_prompt)
-            print("2 LLM object:", llm)
-
-            # Agent 3: Critique
-            critique = critique_review(draft_review, llm)
-            print("3 LLM object:", llm)
-
-            # Agent 4: Edit Final Version
-            final_review = improve_review_with_feedback(draft_review, critique, llm=llm)
-            st.success("✅ Done")
-            print("4 LLM object:", llm)
-
-        # Output: Rewritten Review
-        st.markdown("### ✍️ Rewritten Review")
-        st.code(final_review)
-
-        # Output: MCP Evaluation
-        st.markdown("### 📊 MCP Evaluation")
-        for line in critique.split("\n"):
-            if ":" in line:
-                key, val = line.split(":", 1)
-                #key = key.strip().lstrip("-").strip()  
-                #st.markdown(f"**{key.strip()}:** {val.strip()}")
-                
-                st.markdown(f"**{key}:** {val.strip()}")
-
-
-        # Log
-        log_rewrite(review, final_review, user, tone, critique)
+        cache_ctx = contextlib.nullcontext() if use_cache else bypass_cache()
+
+        if stream_output:
+            # Render tokens and critique lines as they arrive
+            with cache_ctx, schedule_as(user, "interactive"):
+                st.markdown("### 📝 Draft")
+                draft_box = st.empty()
+                st.markdown("### 📊 MCP Evaluation")
+                critique_box = st.container()
+                st.markdown("### ✍️ Rewritten Review")
+                final_box = st.empty()
+
+                draft_text, final_text = "", ""
+                for event, payload in stream_review_pipeline(review, tone, score_threshold, max_edit_rounds,
+                                                             mode=pipeline_mode,
+                                                             reuse_similarity=reuse_similarity if reuse_similar else None,
+                                                             routing=routing):
+                    if event == "reused":
+                        st.info(f"🧬 Reused the rewrite of a {payload['similarity']:.0%} similar review "
+                                f"from {payload['timestamp']} – no LLM calls.")
+                    elif event == "draft":
+                        draft_text += payload
+                        draft_box.markdown(draft_text + "▌")
+                    elif event == "critique":
+                        draft_box.markdown(draft_text)
+                        if ":" in payload:
+                            key, val = payload.split(":", 1)
+                            critique_box.markdown(f"**{key}:** {val.strip()}")
+                    elif event == "edit":
+                        final_text = ""
+                        if payload > 1:
+                            critique_box.markdown(f"_Re-evaluation after edit {payload - 1}:_")
+                    elif event == "final":
+                        final_text += payload
+                        final_box.markdown(final_text + "▌")
+                    elif event == "done":
+                        result = payload
+
+            critique = result["critique"]
+            final_review = result["final"]
+            final_box.code(final_review)
+            st.success(f"✅ Done – {result['mode']} mode, {result['llm_calls']} LLM calls, {result['elapsed']}s, "
+                       f"~${result['trace']['cost_usd']:.4f}")
+            if result["degraded"]:
+                st.warning(DEGRADED_NOTICE)
+        else:
+            with st.spinner("Processing..."), cache_ctx, schedule_as(user, "interactive"):
+                # Agents 1–4: Intent Parser → Rewrite → Critique → Edit
+                result = run_review_pipeline(review, tone, score_threshold, max_edit_rounds,
+                                             mode=pipeline_mode,
+                                             reuse_similarity=reuse_similarity if reuse_similar else None,
+                                             routing=routing)
+                critique = result["critique"]
+                if result["reused"]:
+                    st.info(f"🧬 Reused the rewrite of a {result['reused']['similarity']:.0%} similar review "
+                            f"from {result['reused']['timestamp']} – no LLM calls.")
+                final_review = result["final"]
+                st.success(f"✅ Done – {result['mode']} mode, {result['llm_calls']} LLM calls, {result['elapsed']}s, "
+                           f"~${result['trace']['cost_usd']:.4f}")
+                if result["degraded"]:
+                    st.warning(DEGRADED_NOTICE)
+
+            # Output: Rewritten Review
+            st.markdown("### ✍️ Rewritten Review")
+            st.code(final_review)
+
+            # Output: MCP Evaluation
+            st.markdown("### 📊 MCP Evaluation")
+            for line in critique.split("\n"):
+                if ":" in line:
+                    key, val = line.split(":", 1)
+                    #key = key.strip().lstrip("-").strip()  
+                    #st.markdown(f"**{key.strip()}:** {val.strip()}")
+                    
+                    st.markdown(f"**{key}:** {val.strip()}")
+
+
+        # Log (a reused rewrite is already in the store; a copy would skew the score aggregates
+        # and point later near-duplicate matches at itself)
+        if not result["reused"]:
+            log_rewrite(review, final_review, user, tone, critique, llm_calls=result["llm_calls"],
+                        scores=result["scores"])
 
 # -----------------------------------
 #  Log Download (User Tool)
@@ -122,17 +198,13 @@ if st.button("🔁 Rewrite + Evaluate"):
 
 if st.sidebar.button("📥 Download your session log"):
     try:
-        df_all = pd.read_csv("review_log.csv")
         current_user = st.session_state.get("user", "").strip().lower()
-        df_user = df_all[df_all["user"].str.strip().str.lower() == current_user]
-
-        if not df_user.empty:
-            st.sidebar.download_button(
-                label="Download CSV",
-                data=df_user.to_csv(index=False),
-                file_name=f"{current_user}_session_log.csv",
-                mime="text/csv"
-            )
+
+        if get_recent_rewrites(current_user, limit=1):
+            flush_rewrites()  # include rewrites still queued for the store
+            # Streamed from the store's per-user index, not built in memory (see shared/downloads.py)
+            sidebar_download(lambda out: get_store().export_csv(out, user=current_user),
+                             f"{current_user}_session_log.csv")
         else:
             st.sidebar.info("No sessions found for current user.")
 
@@ -154,12 +226,48 @@ else:
         st.markdown(f"📝 **Original:** {row.get('original')[:150]}...")
         st.markdown(f"✍️ **Rewritten:** {row.get('rewritten')[:150]}...")
 
-        st.markdown("**📊 Evaluation:**")
-        eval_lines = row.get('evaluation').split("\n")
-        for line in eval_lines:
-            if ":" in line:
-                k, v = line.split(":", 1)
-                st.markdown(f"- **{k.strip()}**: {v.strip()}")
+        # Scores were parsed once when the rewrite was logged
+        if row.get("scores"):
+            st.markdown("**📊 Evaluation:** " + " · ".join(f"{k} **{v:g}/5**" for k, v in row["scores"].items()))
+        else:
+            st.markdown(f"**📊 Evaluation:** {row.get('evaluation') or '–'}")
+
+# ---------------- Quality Dashboard ----------------
+# Running aggregates kept by the store as rewrites are logged: no log scan, no re-parsing
+with st.expander("📈 Quality dashboard"):
+    store = get_store()
+    overall, mine = store.score_summary("all"), store.score_summary("user", user)
+    if not overall:
+        st.caption("No scored rewrites yet.")
+    else:
+        st.table([{
+            "criterion": criterion,
+            "mean (all)": summary["mean"],
+            "mean (you)": mine[criterion]["mean"] if criterion in mine else "–",
+            "reviews": summary["count"],
+            "1–5 distribution": " / ".join(map(str, summary["histogram"])),
+        } for criterion, summary in overall.items()])
+        st.markdown("**By tone**")
+        st.table([{"tone": tone_name, "reviews": s["count"], "mean score": s["mean"]}
+                  for tone_name, s in store.score_breakdown("tone").items()])
+        since = (datetime.now() - timedelta(days=TREND_DAYS)).strftime("%Y-%m-%d")
+        trend = store.score_trend("all", since=since)
+        if len(trend) > 1:
+            st.markdown(f"**Mean score per day (last {TREND_DAYS} days)**")
+            st.line_chart({"mean": {day: mean for day, _, mean in trend}})
+
+# ---------------- Cache Stats ----------------
+llm_cache = get_cache()
+if llm_cache is not None:
+    stats = llm_cache.stats
+    st.sidebar.caption(
+        f"♻️ LLM cache – hits: {stats['memory_hits'] + stats['disk_hits']} "
+        f"(memory {stats['memory_hits']}, disk {stats['disk_hits']}), "
+        f"misses: {stats['misses']}, hit rate: {llm_cache.hit_rate():.0%}"
+    )
+
+# ---------------- Performance Panel ----------------
+render_admin_panel()
 
 # ---------------- Logout ----------------
 if st.sidebar.button("🚪 Logout"):
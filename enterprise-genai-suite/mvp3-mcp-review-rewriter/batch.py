@@ -0,0 +1,197 @@
+# batch.py – run many reviews through the rewrite pipeline concurrently
+#
+# Usage:
+#   python batch.py reviews.csv --output results.jsonl --concurrency 8
+#
+# Input is a CSV or JSONL file with a `review` column (or `original`) and an
+# optional `tone` and `id`. Results are appended to the output JSONL as soon as
+# each review finishes, so re-running the same command resumes after a crash.
+import argparse
+import asyncio
+import csv
+import functools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # shared/
+
+DEFAULT_TONE = "Warm & Friendly"
+TONES = ["Warm & Friendly", "Luxury & Premium", "Helpful & Technical"]
+
+
+# -------------------------------
+# Input / Resume Helpers
+# -------------------------------
+def read_reviews(path, default_tone=DEFAULT_TONE):
+    """Yield {"id", "review", "tone"} dicts from a CSV or JSONL file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+
+        for n, row in enumerate(rows, start=1):
+            review = (row.get("review") or row.get("original") or "").strip()
+            if not review:
+                continue
+            yield {
+                "id": str(row.get("id") or f"row-{n}"),
+                "review": review,
+                "tone": (row.get("tone") or default_tone).strip(),
+            }
+
+
+def load_completed_ids(output_path):
+    """Return ids already written successfully to a previous run's output."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Last line of a crashed run may be partially written
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+            else:
+                done.discard(record.get("id"))
+    return done
+
+
+# -------------------------------
+# Batch Engine
+# -------------------------------
+async def run_batch(input_path, output_path, concurrency=8, default_tone=DEFAULT_TONE,
+                    progress_every=25, score_threshold=None, max_edit_rounds=None, mode=None,
+                    reuse_similarity=None, routing=None):
+    """Process every review in `input_path` and stream results to `output_path`.
+
+    Returns a summary dict with processed/skipped/failed counts, throughput,
+    the total number of LLM calls made and the estimated cost. With
+    `reuse_similarity` set, reviews that nearly repeat one already in the
+    rewrite history (same tone) reuse its rewrite instead of calling the LLM.
+    """
+    import pipeline
+    from shared.scheduler import schedule_as
+
+    run_review = functools.partial(
+        pipeline.run_review_pipeline,
+        score_threshold=pipeline.SCORE_THRESHOLD if score_threshold is None else score_threshold,
+        max_edit_rounds=pipeline.MAX_EDIT_ROUNDS if max_edit_rounds is None else max_edit_rounds,
+        mode=mode or pipeline.PIPELINE_MODE,
+        reuse_similarity=reuse_similarity,
+        routing=routing,
+    )
+
+    completed = load_completed_ids(output_path)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    loop = asyncio.get_running_loop()
+    stats = {"processed": 0, "skipped": 0, "failed": 0, "reused": 0, "llm_calls": 0, "cost_usd": 0.0}
+    start = time.perf_counter()
+
+    out = open(output_path, "a", encoding="utf-8")
+
+    def write_record(record):
+        # Only the event loop thread writes, so lines never interleave
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+
+    def report():
+        elapsed = time.perf_counter() - start
+        done = stats["processed"] + stats["failed"]
+        rate = done / elapsed if elapsed else 0.0
+        print(f"[batch] {done} done ({stats['failed']} failed, {stats['skipped']} skipped) "
+              f"– {rate:.2f} reviews/sec", flush=True)
+
+    def process(item):
+        # Time spent waiting for a free worker thread, reported on the review's trace
+        queue_s = time.perf_counter() - item["enqueued"]
+        # Batch calls yield to interactive users in the shared rate-limit scheduler
+        with schedule_as("batch", "batch"):
+            return run_review(item["review"], item["tone"], request_id=item["id"], queue_s=queue_s)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            try:
+                result = await loop.run_in_executor(executor, process, item)
+                write_record({"id": item["id"], "status": "ok", **result})
+                stats["processed"] += 1
+                stats["reused"] += bool(result["reused"])
+                stats["llm_calls"] += result["llm_calls"]
+                stats["cost_usd"] += result["trace"]["cost_usd"]
+            except Exception as e:
+                write_record({"id": item["id"], "status": "error", "tone": item["tone"],
+                              "original": item["review"], "error": str(e)})
+                stats["failed"] += 1
+            finally:
+                queue.task_done()
+
+            if progress_every and (stats["processed"] + stats["failed"]) % progress_every == 0:
+                report()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        for item in read_reviews(input_path, default_tone):
+            if item["id"] in completed:
+                stats["skipped"] += 1
+                continue
+            item["enqueued"] = time.perf_counter()
+            await queue.put(item)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        out.close()
+        executor.shutdown(wait=False)
+
+    elapsed = time.perf_counter() - start
+    stats["elapsed"] = round(elapsed, 3)
+    stats["cost_usd"] = round(stats["cost_usd"], 4)
+    stats["reviews_per_sec"] = round(stats["processed"] / elapsed, 3) if elapsed else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-rewrite customer reviews.")
+    parser.add_argument("input", help="CSV or JSONL file with review[,tone,id] columns")
+    parser.add_argument("--output", "-o", default="batch_results.jsonl",
+                        help="JSONL file results are appended to (also used for resume)")
+    parser.add_argument("--concurrency", "-c", type=int, default=8,
+                        help="Maximum number of reviews in flight at once")
+    parser.add_argument("--tone", default=DEFAULT_TONE, choices=TONES,
+                        help="Tone used when a row does not specify one")
+    parser.add_argument("--score-threshold", type=float, default=None,
+                        help="Skip the editor once every critique score reaches this value")
+    parser.add_argument("--max-edit-rounds", type=int, default=None,
+                        help="Maximum editor passes per review while scores are below threshold")
+    parser.add_argument("--mode", choices=["three-stage", "fused"], default=None,
+                        help="Pipeline mode (default: PIPELINE_MODE env var or three-stage)")
+    parser.add_argument("--routing", default=None,
+                        help="Model routing policy: a name in routing/ or a JSON path (default: ROUTING_POLICY env var)")
+    parser.add_argument("--reuse-similar", type=float, nargs="?", const=float(os.getenv("REUSE_SIMILARITY", "0.85")),
+                        default=None, metavar="SIMILARITY",
+                        help="Reuse logged rewrites of near-identical reviews in the same tone "
+                             "(minimum similarity 0–1; default REUSE_SIMILARITY env var or 0.85)")
+    args = parser.parse_args(argv)
+
+    stats = asyncio.run(run_batch(args.input, args.output, args.concurrency, args.tone,
+                                  score_threshold=args.score_threshold,
+                                  max_edit_rounds=args.max_edit_rounds, mode=args.mode,
+                                  reuse_similarity=args.reuse_similar, routing=args.routing))
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+# llm_cache.py – content-addressed response cache around the shared `llm`
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from shared.resilience import provider_unhealthy
+from shared.scheduler import call_model, estimate_request_tokens, stream_model
+from shared.telemetry import current_span, stage, streamed
+
+CACHE_FILE = os.getenv("LLM_CACHE_FILE", "llm_cache.sqlite")
+CACHE_ENABLED = os.getenv("LLM_CACHE", "on").lower() not in ("0", "off", "false", "no")
+
+_bypass = contextvars.ContextVar("llm_cache_bypass", default=False)
+
+
+@contextlib.contextmanager
+def bypass_cache():
+    """Skip the cache for every call made inside this block (non-deterministic runs)."""
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def make_key(model, temperature, prompt, max_tokens=None):
+    """Hash model + temperature (+ max_tokens when set) + prompt into a stable cache key."""
+    parts = [model, temperature, prompt] if max_tokens is None else [model, temperature, prompt, max_tokens]
+    payload = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# -------------------------------
+# Two-tier Store (memory LRU → SQLite)
+# -------------------------------
+class LLMCache:
+    """In-process LRU in front of an on-disk SQLite table, both with TTL."""
+
+    def __init__(self, path=CACHE_FILE, max_memory_entries=256, max_disk_entries=20000,
+                 ttl_seconds=7 * 24 * 3600):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "stale_hits": 0}
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+        self._conn.commit()
+
+    def _expired(self, created, now):
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, created FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                value, created = row
+                if not self._expired(created, now):
+                    self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    self._remember(key, value, created)
+                    self.stats["disk_hits"] += 1
+                    return value
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+
+            self.stats["misses"] += 1
+            return None
+
+    def get_stale(self, key):
+        """Any stored value for `key`, even past its TTL (used while the provider is down)."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value = entry[0]
+            else:
+                row = self._conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                value = row[0]
+            self.stats["stale_hits"] += 1
+            return value
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._writes += 1
+            # Size-based eviction is amortised over writes to keep `set` cheap
+            if self._writes % 50 == 0:
+                self._evict_disk(now)
+            self._conn.commit()
+
+    def _remember(self, key, value, created):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _evict_disk(self, now):
+        if self.ttl_seconds is not None:
+            self._conn.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl_seconds,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.stats["evictions"] += overflow
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+
+def chunk_text(chunk):
+    """Return the text of a streamed LangChain chunk (or a plain string)."""
+    return chunk.content if hasattr(chunk, "content") else str(chunk)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache shared by every CachedLLM (None when disabled)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None and CACHE_ENABLED:
+            _cache = LLMCache()
+        return _cache
+
+
+# -------------------------------
+# LLM Wrapper
+# -------------------------------
+class CachedLLM:
+    """Drop-in wrapper for a LangChain chat model that caches `invoke` results.
+
+    `invoke` always returns the response text, whether it came from the cache,
+    a stale fallback or the model. Misses go through the shared rate-limit
+    scheduler, and each call reports its model, token usage and cache hits to
+    the current telemetry stage. Every other attribute is forwarded to the
+    wrapped model.
+    """
+
+    def __init__(self, llm, cache=None, enabled=CACHE_ENABLED):
+        self.llm = llm
+        self.cache = cache if cache is not None else (get_cache() if enabled else None)
+        self.enabled = enabled
+
+    @property
+    def model_name(self):
+        return getattr(self.llm, "model_name", None) or getattr(self.llm, "model", "unknown")
+
+    @property
+    def temperature(self):
+        return getattr(self.llm, "temperature", None)
+
+    @property
+    def max_tokens(self):
+        return getattr(self.llm, "max_tokens", None)
+
+    def cache_key(self, prompt):
+        return make_key(self.model_name, self.temperature, prompt, self.max_tokens)
+
+    def _use_cache(self, use_cache):
+        if use_cache is None:
+            use_cache = not _bypass.get()
+        return self.enabled and self.cache is not None and use_cache
+
+    def _span(self):
+        """Reuse the caller's telemetry stage (e.g. "critique"), or open a generic one."""
+        span = current_span()
+        if span is None:
+            return stage("llm", model=self.model_name)
+        span.model = span.model or self.model_name
+        return contextlib.nullcontext(span)
+
+    def _stale(self, prompt, error):
+        """A previously cached answer to serve while the provider is failing, or None."""
+        if self.cache is None or not provider_unhealthy(error):
+            return None
+        return self.cache.get_stale(self.cache_key(prompt))
+
+    def invoke(self, prompt, use_cache=None, **kwargs):
+        """Response text for `prompt`, from the cache when possible."""
+        with self._span() as span:
+            key = self.cache_key(prompt) if self._use_cache(use_cache) and not kwargs else None
+            if key is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    span.cache_hit = True
+                    return cached
+
+            try:
+                response = call_model(self.model_name, self.llm.invoke, prompt,
+                                      est_tokens=estimate_request_tokens(prompt, self.max_tokens), **kwargs)
+            except Exception as e:
+                stale = self._stale(prompt, e)
+                if stale is None:
+                    raise
+                print(f"⚠️ {self.model_name} unavailable, serving a cached response: {e}")
+                span.cache_hit = True
+                return stale
+            text = response.content if hasattr(response, "content") else str(response)
+            if not span.record_usage(response):
+                span.estimate_usage(prompt, text)
+            if key is not None:
+                self.cache.set(key, text)
+            return text
+
+    def stream(self, prompt, use_cache=None):
+        """Yield response text chunks; a cache hit is yielded as a single chunk."""
+        span = current_span()
+        if span is not None:
+            span.model = span.model or self.model_name
+            yield from self._stream(prompt, use_cache, span)
+            return
+        with stage("llm", model=self.model_name, current=False) as span:
+            yield from streamed(self._stream(prompt, use_cache, span), span=span)
+
+    def _stream(self, prompt, use_cache, span):
+        key = self.cache_key(prompt) if self._use_cache(use_cache) else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                span.cache_hit = True
+                yield cached
+                return
+
+        parts, usage_reported = [], False
+        try:
+            for chunk in stream_model(self.model_name, self.llm.stream, prompt,
+                                      est_tokens=estimate_request_tokens(prompt, self.max_tokens)):
+                if getattr(chunk, "usage_metadata", None):
+                    usage_reported = span.record_usage(chunk)
+                text = chunk_text(chunk)
+                parts.append(text)
+                yield text
+        except Exception as e:
+            stale = None if parts else self._stale(prompt, e)
+            if stale is None:
+                raise
+            print(f"⚠️ {self.model_name} unavailable, serving a cached response: {e}")
+            span.cache_hit = True
+            yield stale
+            return
+
+        if not usage_reported:
+            span.estimate_usage(prompt, "".join(parts))
+        # Only completed streams are cached; an abandoned generator stores nothing
+        if key is not None:
+            self.cache.set(key, "".join(parts))
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def __repr__(self):
+        return f"CachedLLM({self.model_name!r}, enabled={self.enabled})"
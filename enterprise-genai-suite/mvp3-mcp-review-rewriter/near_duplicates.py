@@ -0,0 +1,59 @@
+# near_duplicates.py – MinHash/LSH keys for finding earlier rewrites of near-identical reviews
+#
+# A review is reduced to its set of character 4-gram shingles (lowercased,
+# punctuation dropped), so "Want a refund!!" and "want a refund" are identical
+# and small edits only change a few shingles. A 64-value MinHash signature of
+# that set is cut into 16 bands of 4 values; each band, hashed together with
+# the tone, is one LSH bucket. Reviews whose Jaccard similarity is above ~0.5
+# share at least one bucket with high probability (≥ 0.999 at 0.8), so a lookup
+# only compares against the few rows in its buckets, and the exact shingle
+# similarity decides. Everything is local: no embedding service involved.
+import hashlib
+import random
+import re
+import zlib
+
+SHINGLE_SIZE = 4
+NUM_HASHES = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_HASHES // BANDS
+
+_PRIME = (1 << 61) - 1
+# Fixed seed: bucket keys are stored in review_log.db and must be stable across runs
+_rng = random.Random(20240611)
+_HASHES = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+
+
+def normalize(text):
+    return " ".join(re.findall(r"\w+", (text or "").lower()))
+
+
+def shingles(text):
+    """Set of hashed character shingles of the normalized text."""
+    text = normalize(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {zlib.crc32(text.encode("utf-8"))}
+    return {zlib.crc32(text[i:i + SHINGLE_SIZE].encode("utf-8")) for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def signature(shingle_set):
+    return [min((a * x + b) % _PRIME for x in shingle_set) for a, b in _HASHES]
+
+
+def lsh_buckets(text, tone):
+    """The review's LSH bucket keys (signed 64-bit ints, one per band) within `tone`."""
+    sig = signature(shingles(text))
+    buckets = []
+    for band in range(BANDS):
+        values = sig[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        key = f"{tone}|{band}|" + ",".join(map(str, values))
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
+
+
+def similarity(a, b):
+    """Jaccard similarity of two shingle sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
@@ -0,0 +1,345 @@
+# pipeline.py
+import os
+import time
+
+from agents.intent_parser import generate_tone_prompt
+from agents.rewrite_agent import rewrite_review, stream_rewrite_review
+from agents.critique_agent import (
+    critique_review, stream_critique_review, parse_critique_line, parse_critique_scores, scores_pass,
+)
+from agents.editor_agent import improve_review_with_feedback, stream_improved_review
+from agents.fused_agent import FusedResponseError, rewrite_and_critique
+from review_store import get_store
+from router import get_routing_policy
+from shared.resilience import provider_unhealthy
+from shared.telemetry import activate, request_trace, stage, streamed
+
+# Skip the editor once every rubric score reaches this value (1–5)
+SCORE_THRESHOLD = float(os.getenv("EDIT_SCORE_THRESHOLD", "4"))
+# Maximum number of editor passes while scores stay below the threshold
+MAX_EDIT_ROUNDS = int(os.getenv("MAX_EDIT_ROUNDS", "1"))
+
+# "three-stage": rewrite, critique and edit are separate calls
+# "fused": one call returns the rewrite plus its JSON self-evaluation
+PIPELINE_MODES = ("three-stage", "fused")
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "three-stage")
+
+# Default minimum similarity (0–1) for reusing an earlier rewrite of a near-identical review
+REUSE_SIMILARITY = float(os.getenv("REUSE_SIMILARITY", "0.85"))
+# While the model provider is failing, a rewrite of a review at least this similar is served instead
+DEGRADED_REUSE_SIMILARITY = float(os.getenv("DEGRADED_REUSE_SIMILARITY", "0.6"))
+CRITIQUE_UNAVAILABLE = "⚠️ Evaluation unavailable – the model provider is not responding."
+
+
+# -------------------------------
+# Near-duplicate Reuse
+# -------------------------------
+def find_reusable_rewrite(review, tone, min_similarity=REUSE_SIMILARITY):
+    """The logged rewrite of the most similar earlier review in the same tone, or None."""
+    try:
+        matches = get_store().similar(review, tone, min_similarity, limit=1)
+    except Exception as e:
+        print(f"⚠️ Near-duplicate lookup failed: {e}")
+        return None
+    return matches[0] if matches else None
+
+
+def _reused_result(review, tone, match, start, degraded=False):
+    with stage("reuse") as span:
+        span.cache_hit = True
+    evaluation = match["evaluation"] or ""
+    return {
+        "original": review,
+        "tone": tone,
+        "mode": "reused",
+        "routing": None,
+        "draft": match["rewritten"],
+        "critique": evaluation,
+        "scores": parse_critique_scores(evaluation),
+        "final": match["rewritten"],
+        "edit_rounds": 0,
+        "llm_calls": 0,
+        "reused": _reuse_info(match),
+        "degraded": degraded,
+        "elapsed": round(time.perf_counter() - start, 3),
+    }
+
+
+def _reuse_info(match):
+    return {"similarity": match["similarity"], "timestamp": match["timestamp"], "original": match["original"]}
+
+
+def _degraded_match(review, tone, error):
+    """A close-enough earlier rewrite to serve when the provider failed, or None."""
+    if not provider_unhealthy(error):
+        return None
+    match = find_reusable_rewrite(review, tone, DEGRADED_REUSE_SIMILARITY)
+    if match is not None:
+        print(f"⚠️ Model provider unavailable, serving an earlier rewrite ({match['similarity']:.0%} similar): {error}")
+    return match
+
+
+# -------------------------------
+# Degraded Stages
+# -------------------------------
+def _critique_or_unavailable(review_text, llm):
+    """Critique text, or CRITIQUE_UNAVAILABLE while the provider is failing."""
+    try:
+        return critique_review(review_text, llm)
+    except Exception as e:
+        if not provider_unhealthy(e):
+            raise
+        print(f"⚠️ Critique unavailable, keeping the draft as is: {e}")
+        return CRITIQUE_UNAVAILABLE
+
+
+def _draft_and_critique(review, tone_prompt, mode, routes):
+    """Return `(draft, critique, scores, llm_calls, mode_used)` for the first pass."""
+    if mode == "fused":
+        try:
+            fused = rewrite_and_critique(review, tone_prompt, routes.llm("fused"))
+            return fused["draft"], fused["critique"], fused["scores"], 1, "fused"
+        except FusedResponseError as e:
+            print(f"⚠️ Fused response rejected, falling back to three-stage: {e}")
+            calls, mode_used = 1, "three-stage (fallback)"
+    else:
+        calls, mode_used = 0, "three-stage"
+
+    # Agent 2: Rewrite
+    draft_review = rewrite_review(review, tone_prompt, routes.llm("rewrite"))
+    # Agent 3: Critique
+    critique = _critique_or_unavailable(draft_review, routes.llm("critique"))
+    return draft_review, critique, parse_critique_scores(critique), calls + 2, mode_used
+
+
+def run_review_pipeline(review: str, tone: str, score_threshold: float = SCORE_THRESHOLD,
+                        max_edit_rounds: int = MAX_EDIT_ROUNDS, mode: str = PIPELINE_MODE,
+                        request_id: str = None, queue_s: float = 0.0, reuse_similarity: float = None,
+                        routing: str = None) -> dict:
+    """Run the intent → rewrite → critique → edit chain for a single review.
+
+    The editor only runs while the critique scores are below `score_threshold`,
+    at most `max_edit_rounds` times. Edited drafts are re-critiqued only if
+    another round is still allowed, so one round costs the same three calls as
+    the original fixed chain and a passing draft costs two (one in fused mode).
+    The result's `trace` holds per-stage latency, tokens and estimated cost.
+
+    With `reuse_similarity` set, a logged rewrite of an earlier review in the
+    same tone that is at least that similar (0–1) is returned instead, with no
+    LLM calls; `result["reused"]` then describes the match.
+
+    `routing` names the model routing policy (see router.py) that picks each
+    stage's model, temperature and max_tokens; the default is ROUTING_POLICY.
+
+    While the model provider is failing (see shared/resilience.py) the result
+    is degraded rather than an error: the draft is kept without critique or
+    edit, or, if even the rewrite failed, a similar earlier rewrite is served.
+    `result["degraded"]` is True in both cases.
+    """
+    with request_trace("mvp3", request_id, queue_s) as trace:
+        match = find_reusable_rewrite(review, tone, reuse_similarity) if reuse_similarity else None
+        if match is not None:
+            result = _reused_result(review, tone, match, time.perf_counter())
+        else:
+            try:
+                result = _run_review_pipeline(review, tone, score_threshold, max_edit_rounds, mode,
+                                              get_routing_policy(routing))
+            except Exception as e:
+                match = _degraded_match(review, tone, e)
+                if match is None:
+                    raise
+                result = _reused_result(review, tone, match, time.perf_counter(), degraded=True)
+    result["trace"] = trace.to_dict()
+    return result
+
+
+def _run_review_pipeline(review, tone, score_threshold, max_edit_rounds, mode, routes):
+    start = time.perf_counter()
+
+    # Agent 1: Intent Parser
+    tone_prompt = generate_tone_prompt(tone)
+
+    # Agents 2–3: Rewrite + Critique (one call in fused mode)
+    draft_review, critique, scores, llm_calls, mode_used = _draft_and_critique(review, tone_prompt, mode, routes)
+
+    # Agent 4: Edit – only while the draft is below threshold
+    final_review = draft_review
+    edit_rounds = 0
+    degraded = critique == CRITIQUE_UNAVAILABLE
+    while not degraded and not scores_pass(scores, score_threshold) and edit_rounds < max_edit_rounds:
+        try:
+            final_review = improve_review_with_feedback(final_review, critique, llm=routes.llm("edit"))
+        except Exception as e:
+            if not provider_unhealthy(e):
+                raise
+            print(f"⚠️ Editor unavailable, keeping the current draft: {e}")
+            degraded = True
+            break
+        llm_calls += 1
+        edit_rounds += 1
+        if edit_rounds < max_edit_rounds:
+            critique = _critique_or_unavailable(final_review, routes.llm("critique"))
+            scores = parse_critique_scores(critique)
+            degraded = critique == CRITIQUE_UNAVAILABLE
+            llm_calls += 1
+
+    return {
+        "original": review,
+        "tone": tone,
+        "mode": mode_used,
+        "routing": routes.name,
+        "draft": draft_review,
+        "critique": critique,
+        "scores": scores,
+        "final": final_review,
+        "edit_rounds": edit_rounds,
+        "llm_calls": llm_calls,
+        "reused": None,
+        "degraded": degraded,
+        "elapsed": round(time.perf_counter() - start, 3),
+    }
+
+
+def _stream_critique(review_text, llm):
+    """Yield critique lines and collect them with their parsed scores."""
+    lines, scores = [], {}
+    try:
+        for line in stream_critique_review(review_text, llm):
+            lines.append(line)
+            parsed = parse_critique_line(line)
+            if parsed and parsed[0] not in scores:
+                scores[parsed[0]] = parsed[1]
+            yield "critique", line
+    except Exception as e:
+        if not provider_unhealthy(e):
+            raise
+        print(f"⚠️ Critique unavailable, keeping the draft as is: {e}")
+        lines, scores = [CRITIQUE_UNAVAILABLE], {}
+        yield "critique", CRITIQUE_UNAVAILABLE
+    yield "scores", scores
+    return "\n".join(lines), scores
+
+
+def stream_review_pipeline(review: str, tone: str, score_threshold: float = SCORE_THRESHOLD,
+                           max_edit_rounds: int = MAX_EDIT_ROUNDS, mode: str = PIPELINE_MODE,
+                           request_id: str = None, reuse_similarity: float = None, routing: str = None):
+    """Streaming variant of `run_review_pipeline`.
+
+    Yields `(event, payload)` tuples as output arrives:
+    `("draft", token)`, `("critique", line)`, `("scores", dict)`,
+    `("edit", round_number)` before each editor pass, `("final", token)` and
+    finally `("done", result)` with the same dict `run_review_pipeline` returns.
+    In fused mode the draft and critique arrive together once the JSON parses.
+    A reused rewrite (see `reuse_similarity`) starts with `("reused", info)`.
+    Degraded output follows the same rules as `run_review_pipeline`.
+    """
+    result = None
+    # The trace is current only while this generator runs, never in the caller between events
+    with request_trace("mvp3", request_id, current=False) as trace:
+        with activate(trace=trace):
+            match = find_reusable_rewrite(review, tone, reuse_similarity) if reuse_similarity else None
+        events = (_stream_reused(review, tone, match) if match is not None
+                  else _stream_review_pipeline(review, tone, score_threshold, max_edit_rounds, mode,
+                                               get_routing_policy(routing)))
+        started = False
+        try:
+            for event, payload in streamed(events, trace=trace):
+                if event == "done":
+                    result = payload
+                    break
+                started = True
+                yield event, payload
+        except Exception as e:
+            # Only before anything was shown: switch to an earlier rewrite
+            with activate(trace=trace):
+                match = None if started else _degraded_match(review, tone, e)
+            if match is None:
+                raise
+            for event, payload in _stream_reused(review, tone, match, degraded=True):
+                if event == "done":
+                    result = payload
+                    break
+                yield event, payload
+    result["trace"] = trace.to_dict()
+    yield "done", result
+
+
+def _stream_reused(review, tone, match, degraded=False):
+    result = _reused_result(review, tone, match, time.perf_counter(), degraded)
+    yield "reused", result["reused"]
+    yield "draft", result["draft"]
+    for line in result["critique"].split("\n"):
+        yield "critique", line
+    yield "scores", result["scores"]
+    yield "done", result
+
+
+def _stream_review_pipeline(review, tone, score_threshold, max_edit_rounds, mode, routes):
+    start = time.perf_counter()
+    tone_prompt = generate_tone_prompt(tone)
+    llm_calls, mode_used = 0, "three-stage"
+
+    fused = None
+    if mode == "fused":
+        llm_calls, mode_used = 1, "fused"
+        try:
+            fused = rewrite_and_critique(review, tone_prompt, routes.llm("fused"))
+        except FusedResponseError as e:
+            print(f"⚠️ Fused response rejected, falling back to three-stage: {e}")
+            mode_used = "three-stage (fallback)"
+
+    if fused is not None:
+        draft_review, critique, scores = fused["draft"], fused["critique"], fused["scores"]
+        yield "draft", draft_review
+        for line in critique.split("\n"):
+            yield "critique", line
+        yield "scores", scores
+    else:
+        draft_parts = []
+        for token in stream_rewrite_review(review, tone_prompt, routes.llm("rewrite")):
+            draft_parts.append(token)
+            yield "draft", token
+        draft_review = "".join(draft_parts)
+
+        critique, scores = yield from _stream_critique(draft_review, routes.llm("critique"))
+        llm_calls += 2
+
+    final_review = draft_review
+    edit_rounds = 0
+    degraded = critique == CRITIQUE_UNAVAILABLE
+    while not degraded and not scores_pass(scores, score_threshold) and edit_rounds < max_edit_rounds:
+        yield "edit", edit_rounds + 1
+        final_parts = []
+        try:
+            for token in stream_improved_review(final_review, critique, routes.llm("edit")):
+                final_parts.append(token)
+                yield "final", token
+        except Exception as e:
+            if not provider_unhealthy(e):
+                raise
+            print(f"⚠️ Editor unavailable, keeping the current draft: {e}")
+            degraded = True
+            break
+        final_review = "".join(final_parts)
+        llm_calls += 1
+        edit_rounds += 1
+        if edit_rounds < max_edit_rounds:
+            critique, scores = yield from _stream_critique(final_review, routes.llm("critique"))
+            degraded = critique == CRITIQUE_UNAVAILABLE
+            llm_calls += 1
+
+    yield "done", {
+        "original": review,
+        "tone": tone,
+        "mode": mode_used,
+        "routing": routes.name,
+        "draft": draft_review,
+        "critique": critique,
+        "scores": scores,
+        "final": final_review,
+        "edit_rounds": edit_rounds,
+        "llm_calls": llm_calls,
+        "reused": None,
+        "degraded": degraded,
+        "elapsed": round(time.perf_counter() - start, 3),
+    }
@@ -0,0 +1,430 @@
+# review_store.py – indexed SQLite event store for rewrite history
+#
+# Replaces the append-only review_log.csv behind `log_rewrite` and
+# `get_recent_rewrites`. Critique scores are stored as numbers next to the raw
+# evaluation text, and running per-tone / per-user / per-day aggregates (count,
+# mean, 1–5 histogram) are updated as rows arrive, so quality summaries are a
+# primary-key lookup instead of a scan of the log. Usage from the shell:
+#   python review_store.py migrate review_log.csv
+#   python review_store.py export out.csv [--user NAME]
+#   python review_store.py scores [--tone TONE | --user NAME]
+import argparse
+import csv
+import io
+import itertools
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+if __name__ == "__main__":
+    sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))  # shared/
+
+from agents.critique_agent import parse_critique_scores
+from near_duplicates import lsh_buckets, shingles, similarity
+
+DB_FILE = os.getenv("REVIEW_DB_FILE", "review_log.db")
+LEGACY_CSV = "review_log.csv"
+COLUMNS = ["timestamp", "user", "tone", "original", "rewritten", "evaluation", "llm_calls"]
+# Numeric critique scores, parsed once when a rewrite is logged
+SCORE_COLUMNS = {"Clarity": "score_clarity", "Tone Fit": "score_tone_fit", "Empathy": "score_empathy",
+                 "Brand Voice Consistency": "score_brand_voice"}
+OVERALL = "Overall"  # mean of a review's rubric scores
+SCOPES = ("all", "tone", "user")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rewrites (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    user TEXT NOT NULL,
+    user_key TEXT NOT NULL,
+    tone TEXT,
+    original TEXT,
+    rewritten TEXT,
+    evaluation TEXT,
+    llm_calls INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_rewrites_user_ts ON rewrites (user_key, timestamp);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS rewrite_lsh (
+    bucket INTEGER NOT NULL,
+    rewrite_id INTEGER NOT NULL,
+    PRIMARY KEY (bucket, rewrite_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS score_aggregates (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    day TEXT NOT NULL,
+    criterion TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    total REAL NOT NULL DEFAULT 0,
+    hist_1 INTEGER NOT NULL DEFAULT 0,
+    hist_2 INTEGER NOT NULL DEFAULT 0,
+    hist_3 INTEGER NOT NULL DEFAULT 0,
+    hist_4 INTEGER NOT NULL DEFAULT 0,
+    hist_5 INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, key, day, criterion)
+) WITHOUT ROWID;
+"""
+# scope: "all" (key ''), "tone" (tone name) or "user" (user key); day: YYYY-MM-DD, or '' for all time
+# Rows indexed per transaction when adding LSH buckets (keeps the write lock short)
+LSH_BATCH = 200
+# Most recent rows compared exactly for one lookup
+MAX_CANDIDATES = 200
+# Rows folded into the score aggregates per transaction
+AGGREGATE_BATCH = 500
+# Legacy CSV rows parsed and inserted per batch (the whole import is still one transaction)
+IMPORT_BATCH = 1000
+
+
+def user_key(user):
+    """Normalise a user name the way history lookups always have (strip + lower)."""
+    return (user or "").strip().lower()
+
+
+def score_values(scores):
+    """`{criterion: score}` → the score column values plus their mean (None when unscored)."""
+    values = [scores.get(criterion) for criterion in SCORE_COLUMNS]
+    present = [v for v in values if v is not None]
+    return values + [round(sum(present) / len(present), 4) if present else None]
+
+
+def _bucket(score):
+    return min(5, max(1, int(score + 0.5)))
+
+
+def _aggregate_updates(row):
+    """Upsert parameters adding one scored row to every scope × day × criterion it belongs to."""
+    scores = {criterion: row[column] for criterion, column in SCORE_COLUMNS.items() if row[column] is not None}
+    if not scores:
+        return []
+    scores[OVERALL] = row["score_mean"]
+    day = str(row["timestamp"])[:10]
+    updates = []
+    for scope, key in (("all", ""), ("tone", row["tone"] or ""), ("user", row["user_key"])):
+        for period in (day, ""):
+            for criterion, score in scores.items():
+                hist = [1 if _bucket(score) == b else 0 for b in range(1, 6)]
+                updates.append((scope, key, period, criterion, score, *hist))
+    return updates
+
+
+class ReviewStore:
+    """SQLite-backed rewrite log with one WAL-mode connection per thread."""
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        self._add_score_columns(conn)
+        conn.commit()
+
+    @staticmethod
+    def _add_score_columns(conn):
+        # Stores created before scores were parsed at write time get the columns added in place
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(rewrites)")}
+        for column in [*SCORE_COLUMNS.values(), "score_mean"]:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE rewrites ADD COLUMN {column} REAL")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # -------------------------------
+    # Writes
+    # -------------------------------
+    def add(self, user, tone, original, rewritten, evaluation, llm_calls=None, timestamp=None):
+        self.add_many([{"timestamp": timestamp, "user": user, "tone": tone, "original": original,
+                        "rewritten": rewritten, "evaluation": evaluation, "llm_calls": llm_calls}])
+
+    def add_many(self, rows):
+        """Insert rows (dicts keyed by COLUMNS, plus optional parsed `scores`) in one transaction.
+
+        Scores missing from a row are parsed from its evaluation text here, once.
+        """
+        conn = self._conn()
+        with conn:
+            self._insert(conn, rows)
+
+    @staticmethod
+    def _insert(conn, rows):
+        conn.executemany(
+            "INSERT INTO rewrites (timestamp, user, user_key, tone, original, rewritten, evaluation, llm_calls, "
+            + ", ".join(SCORE_COLUMNS.values()) + ", score_mean) VALUES (" + ", ".join("?" * 13) + ")",
+            [(str(datetime.now() if row.get("timestamp") is None else row["timestamp"]), row["user"],
+              user_key(row["user"]), row.get("tone"), row.get("original"), row.get("rewritten"),
+              row.get("evaluation"), row.get("llm_calls"),
+              *score_values(row.get("scores") or parse_critique_scores(row.get("evaluation"))))
+             for row in rows],
+        )
+
+    def index_new_rows(self):
+        """Add LSH buckets for rows not indexed yet (new or imported); returns the number indexed."""
+        conn = self._conn()
+        total = 0
+        while True:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT value FROM meta WHERE key = 'lsh_indexed_to'").fetchone()
+                rows = conn.execute(
+                    "SELECT id, tone, original FROM rewrites WHERE id > ? ORDER BY id LIMIT ?",
+                    (int(row[0]) if row else 0, LSH_BATCH),
+                ).fetchall()
+                if not rows:
+                    return total
+                conn.executemany(
+                    "INSERT OR IGNORE INTO rewrite_lsh (bucket, rewrite_id) VALUES (?, ?)",
+                    [(bucket, r["id"]) for r in rows for bucket in lsh_buckets(r["original"], r["tone"])],
+                )
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('lsh_indexed_to', ?)",
+                             (str(rows[-1]["id"]),))
+            total += len(rows)
+
+    def aggregate_new_rows(self):
+        """Fold rows not counted yet into `score_aggregates`; returns the number of rows processed.
+
+        Each row is counted exactly once, also with several processes writing: the
+        high-water mark and the aggregates move together in one IMMEDIATE transaction.
+        Rows imported by older versions without numeric scores are parsed here first.
+        """
+        conn = self._conn()
+        total = 0
+        while True:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT value FROM meta WHERE key = 'scores_aggregated_to'").fetchone()
+                rows = conn.execute(
+                    "SELECT id, timestamp, tone, user_key, evaluation, " + ", ".join(SCORE_COLUMNS.values())
+                    + ", score_mean FROM rewrites WHERE id > ? ORDER BY id LIMIT ?",
+                    (int(row[0]) if row else 0, AGGREGATE_BATCH),
+                ).fetchall()
+                if not rows:
+                    return total
+                rows = [self._with_scores(conn, r) for r in rows]
+                conn.executemany(
+                    "INSERT INTO score_aggregates (scope, key, day, criterion, count, total,"
+                    " hist_1, hist_2, hist_3, hist_4, hist_5) VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (scope, key, day, criterion) DO UPDATE SET"
+                    " count = count + 1, total = total + excluded.total,"
+                    " hist_1 = hist_1 + excluded.hist_1, hist_2 = hist_2 + excluded.hist_2,"
+                    " hist_3 = hist_3 + excluded.hist_3, hist_4 = hist_4 + excluded.hist_4,"
+                    " hist_5 = hist_5 + excluded.hist_5",
+                    [update for r in rows for update in _aggregate_updates(r)],
+                )
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('scores_aggregated_to', ?)",
+                             (str(rows[-1]["id"]),))
+            total += len(rows)
+
+    @staticmethod
+    def _with_scores(conn, row):
+        if row["score_mean"] is not None or not row["evaluation"]:
+            return row
+        values = score_values(parse_critique_scores(row["evaluation"]))
+        if values[-1] is None:
+            return row
+        conn.execute("UPDATE rewrites SET " + ", ".join(f"{c} = ?" for c in SCORE_COLUMNS.values())
+                     + ", score_mean = ? WHERE id = ?", (*values, row["id"]))
+        return {**dict(row), **dict(zip([*SCORE_COLUMNS.values(), "score_mean"], values))}
+
+    # -------------------------------
+    # Reads
+    # -------------------------------
+    def similar(self, original, tone, min_similarity, limit=1):
+        """Earlier rewrites in `tone` whose original is at least `min_similarity` similar, best first.
+
+        Each row carries its `similarity` (Jaccard over character shingles, 0–1).
+        """
+        buckets = lsh_buckets(original, tone)
+        conn = self._conn()
+        ids = [row[0] for row in conn.execute(
+            "SELECT DISTINCT rewrite_id FROM rewrite_lsh WHERE bucket IN (" + ",".join("?" * len(buckets)) + ")"
+            " ORDER BY rewrite_id DESC LIMIT ?",
+            (*buckets, MAX_CANDIDATES),
+        )]
+        if not ids:
+            return []
+
+        target = shingles(original)
+        matches = []
+        for row in conn.execute(
+            "SELECT id, " + ", ".join(COLUMNS) + " FROM rewrites WHERE id IN (" + ",".join("?" * len(ids)) + ")",
+            ids,
+        ):
+            score = similarity(target, shingles(row["original"]))
+            if row["tone"] == tone and score >= min_similarity:
+                matches.append({**{c: row[c] for c in COLUMNS}, "id": row["id"], "similarity": round(score, 3)})
+        matches.sort(key=lambda m: (m["similarity"], m["id"]), reverse=True)
+        return matches[:limit]
+
+    def recent(self, user, limit=3):
+        """Return the newest `limit` rows for `user`, oldest first (index range scan).
+
+        Each row carries its parsed `scores` (`{criterion: score}`, empty if unscored).
+        """
+        rows = self._conn().execute(
+            "SELECT " + ", ".join(COLUMNS + list(SCORE_COLUMNS.values())) + " FROM rewrites"
+            " WHERE user_key = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (user_key(user), limit),
+        ).fetchall()
+        return [{**{c: row[c] for c in COLUMNS},
+                 "scores": {criterion: row[column] for criterion, column in SCORE_COLUMNS.items()
+                            if row[column] is not None}}
+                for row in reversed(rows)]
+
+    def score_summary(self, scope="all", key="", day=""):
+        """Precomputed `{criterion: {"count", "mean", "histogram"}}` for one scope/key (all time, or one day).
+
+        `histogram` counts reviews per rounded score 1–5. Criteria without scores are absent.
+        """
+        if scope == "user":
+            key = user_key(key)
+        rows = self._conn().execute(
+            "SELECT criterion, count, total, hist_1, hist_2, hist_3, hist_4, hist_5 FROM score_aggregates"
+            " WHERE scope = ? AND key = ? AND day = ?",
+            (scope, key or "", day or ""),
+        ).fetchall()
+        order = [*SCORE_COLUMNS, OVERALL]
+        return {row["criterion"]: {"count": row["count"], "mean": round(row["total"] / row["count"], 3),
+                                   "histogram": [row[f"hist_{b}"] for b in range(1, 6)]}
+                for row in sorted(rows, key=lambda r: order.index(r["criterion"])) if row["count"]}
+
+    def score_breakdown(self, scope="tone", criterion=OVERALL):
+        """`{key: {"count", "mean"}}` over all time for every tone (or user) seen."""
+        rows = self._conn().execute(
+            "SELECT key, count, total FROM score_aggregates WHERE scope = ? AND day = '' AND criterion = ?"
+            " ORDER BY key",
+            (scope, criterion),
+        ).fetchall()
+        return {row["key"]: {"count": row["count"], "mean": round(row["total"] / row["count"], 3)}
+                for row in rows if row["count"]}
+
+    def score_trend(self, scope="all", key="", since=None, criterion=OVERALL):
+        """Daily `[(day, count, mean)]` from `since` (YYYY-MM-DD) on, oldest first."""
+        if scope == "user":
+            key = user_key(key)
+        rows = self._conn().execute(
+            "SELECT day, count, total FROM score_aggregates"
+            " WHERE scope = ? AND key = ? AND criterion = ? AND day > '' AND day >= ? ORDER BY day",
+            (scope, key or "", criterion, since or ""),
+        ).fetchall()
+        return [(row["day"], row["count"], round(row["total"] / row["count"], 3)) for row in rows if row["count"]]
+
+    def iter_rows(self, user=None):
+        query = "SELECT " + ", ".join(COLUMNS) + " FROM rewrites"
+        params = ()
+        if user is not None:
+            query += " WHERE user_key = ?"
+            params = (user_key(user),)
+        yield from self._conn().execute(query + " ORDER BY timestamp, id", params)
+
+    def export_csv(self, out=None, user=None):
+        """Write the log (optionally one user's rows) as CSV; returns the text if `out` is None."""
+        buffer = out if out is not None else io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(COLUMNS)
+        for row in self.iter_rows(user):
+            writer.writerow([row[c] if row[c] is not None else "" for c in COLUMNS])
+        return buffer.getvalue() if out is None else None
+
+    # -------------------------------
+    # One-shot CSV Migration
+    # -------------------------------
+    def import_csv(self, csv_path=LEGACY_CSV):
+        """Import a legacy review_log.csv once; returns the number of rows imported.
+
+        Safe to run from several processes at once: the import and its marker
+        commit in one IMMEDIATE transaction that re-checks the marker first.
+        """
+        marker = "migrated:" + os.path.abspath(csv_path)
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+            return 0
+        if not os.path.exists(csv_path):
+            return 0
+
+        total = 0
+        with conn, open(csv_path, newline="", encoding="utf-8") as f:
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+                return 0  # another process imported it while we waited for the lock
+            # Logs written before the editor gate have no llm_calls column; those rows import as NULL.
+            # Scores are parsed here like any other write, so imported rows never sit unscored.
+            rows = (
+                {**r, "timestamp": r.get("timestamp") or "", "user": r.get("user") or "",
+                 "llm_calls": int(r["llm_calls"]) if (r.get("llm_calls") or "").isdigit() else None}
+                for r in csv.DictReader(f)
+            )
+            while True:
+                batch = list(itertools.islice(rows, IMPORT_BATCH))
+                if not batch:
+                    break
+                self._insert(conn, batch)
+                total += len(batch)
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (marker, str(datetime.now())))
+        return total
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _backfill(store):
+    try:
+        store.import_csv(LEGACY_CSV)
+        store.index_new_rows()
+        store.aggregate_new_rows()
+    except Exception as e:
+        print(f"⚠️ Couldn't finish the review store backfill, retrying on the next start: {e}")
+
+
+def get_store():
+    """Process-wide store; the legacy CSV is imported in the background the first time it is opened."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ReviewStore()
+            # The legacy CSV import, and rows logged before the similarity index and score
+            # aggregates existed, are processed once, off the request path
+            threading.Thread(target=_backfill, args=(_store,), name="review-store-backfill", daemon=True).start()
+        return _store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the rewrite history store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="Import a legacy review_log.csv (runs once per file)")
+    migrate.add_argument("csv_path", nargs="?", default=LEGACY_CSV)
+    export = sub.add_parser("export", help="Export the history as CSV")
+    export.add_argument("out_path")
+    export.add_argument("--user", default=None)
+    scores = sub.add_parser("scores", help="Print the precomputed critique score summary")
+    scores.add_argument("--tone", default=None)
+    scores.add_argument("--user", default=None)
+    args = parser.parse_args(argv)
+
+    store = ReviewStore()
+    if args.command == "migrate":
+        print(f"Imported {store.import_csv(args.csv_path)} rows into {store.path}")
+        print(f"Aggregated scores for {store.aggregate_new_rows()} rows")
+    elif args.command == "scores":
+        store.aggregate_new_rows()
+        scope, key = ("tone", args.tone) if args.tone else ("user", args.user) if args.user else ("all", "")
+        for criterion, summary in store.score_summary(scope, key).items():
+            print(f"{criterion:<24} n={summary['count']:<6} mean={summary['mean']:<6} 1–5: {summary['histogram']}")
+    else:
+        with open(args.out_path, "w", newline="", encoding="utf-8") as f:
+            store.export_csv(f, user=args.user)
+        print(f"Exported to {args.out_path}")
+
+
+if __name__ == "__main__":
+    main()
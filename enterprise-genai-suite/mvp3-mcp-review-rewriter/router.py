@@ -0,0 +1,83 @@
+# router.py – per-stage model routing for the rewrite → critique → edit chain
+#
+# A routing policy gives each LLM stage its own model, temperature and
+# max_tokens. Policies are JSON files in routing/ (select one by name, or pass
+# a path):
+#   {"description": "...",
+#    "stages": {"critique": {"model": "gpt-4o-mini", "temperature": 0, "max_tokens": 200}}}
+# Stages a policy leaves out use DEFAULT_ROUTE, the original shared gpt-4 at
+# 0.7. The tone prompt (agents/intent_parser.py) is a fixed template, not an
+# LLM call, so it has no route.
+import functools
+import json
+import os
+from collections import namedtuple
+
+from llm_cache import CachedLLM
+from shared.clients import get_chat_model
+
+ROUTING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "routing")
+ROUTING_POLICY = os.getenv("ROUTING_POLICY", "default")
+
+STAGES = ("rewrite", "critique", "edit", "fused")
+
+Route = namedtuple("Route", ["model", "temperature", "max_tokens"])
+DEFAULT_ROUTE = Route("gpt-4", 0.7, None)
+
+
+@functools.lru_cache(maxsize=None)
+def _llm_for(route):
+    # One cached wrapper per distinct route, shared by every policy that uses it
+    return CachedLLM(get_chat_model(model=route.model, temperature=route.temperature, max_tokens=route.max_tokens))
+
+
+class RoutingPolicy:
+    def __init__(self, name, stages=None, description=""):
+        self.name = name
+        self.description = description
+        self.routes = {}
+        for stage_name, route in (stages or {}).items():
+            if stage_name not in STAGES:
+                raise ValueError(f"Routing policy '{name}': unknown stage '{stage_name}', expected one of {STAGES}")
+            self.routes[stage_name] = Route(route.get("model", DEFAULT_ROUTE.model),
+                                            float(route.get("temperature", DEFAULT_ROUTE.temperature)),
+                                            route.get("max_tokens"))
+
+    def route(self, stage_name):
+        return self.routes.get(stage_name, DEFAULT_ROUTE)
+
+    def llm(self, stage_name):
+        """Cached LLM for one stage of this policy."""
+        return _llm_for(self.route(stage_name))
+
+    def to_dict(self):
+        return {"name": self.name, "description": self.description,
+                "stages": {s: self.route(s)._asdict() for s in STAGES}}
+
+
+def available_policies():
+    """Names of the policies in routing/."""
+    if not os.path.isdir(ROUTING_DIR):
+        return []
+    return sorted(name[:-len(".json")] for name in os.listdir(ROUTING_DIR) if name.endswith(".json"))
+
+
+@functools.lru_cache(maxsize=None)
+def load_policy(name_or_path):
+    """Load a policy by name (routing/<name>.json) or from a JSON file path."""
+    path = name_or_path if name_or_path.endswith(".json") else os.path.join(ROUTING_DIR, f"{name_or_path}.json")
+    name = os.path.splitext(os.path.basename(path))[0]
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return RoutingPolicy(name, data.get("stages"), data.get("description", ""))
+
+
+def get_routing_policy(name=None):
+    """The named policy, or the one selected by ROUTING_POLICY (gpt-4 everywhere if it is missing)."""
+    if name is None:
+        try:
+            return load_policy(ROUTING_POLICY)
+        except FileNotFoundError:
+            print(f"⚠️ Routing policy '{ROUTING_POLICY}' not found, using {DEFAULT_ROUTE.model} for every stage")
+            return RoutingPolicy("default")
+    return load_policy(name)
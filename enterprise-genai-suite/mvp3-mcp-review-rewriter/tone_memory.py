@@ -0,0 +1,155 @@
+# tone_memory.py – write-behind store for per-user tone preferences
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+
+MEMORY_DB = os.getenv("TONE_MEMORY_DB", "tone_memory.db")
+LEGACY_FILE = "tone_memory.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tone_memory (
+    user TEXT PRIMARY KEY,
+    tone TEXT NOT NULL,
+    seq INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_tone_memory_seq ON tone_memory (seq);
+"""
+# seq: bumped on every write, so a process re-reads only the users changed since it last looked
+
+UPSERT = """
+INSERT INTO tone_memory (user, tone, seq)
+VALUES (?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM tone_memory))
+ON CONFLICT (user) DO UPDATE SET tone = excluded.tone, seq = excluded.seq
+"""
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class ToneMemoryStore:
+    """SQLite table of user → tone, served from memory and written behind.
+
+    `set` only marks a user dirty when the tone actually changes. A background
+    thread coalesces dirty users for `flush_interval` seconds, then upserts
+    just those rows in one transaction, so a flush costs the same however many
+    users are remembered. Reads check `PRAGMA data_version` and, when another
+    process has committed, fetch only the rows it changed.
+    """
+
+    def __init__(self, path=MEMORY_DB, flush_interval=2.0, legacy_path=LEGACY_FILE):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.stats = {"changes": 0, "unchanged": 0, "flushes": 0}
+
+        self._lock = threading.Lock()  # guards the cache, the dirty set and the reader connection
+        self._flush_lock = threading.Lock()  # guards the writer connection
+        self._dirty = {}
+        self._wake = threading.Event()
+        self._memory = {}
+        self._seq = 0
+        self._version = None
+
+        self._reader = _connect(path)
+        self._reader.executescript(SCHEMA)
+        self._writer = _connect(path)
+        self._import_json(legacy_path)
+        with self._lock:
+            self._refresh_if_changed()
+
+        self._thread = threading.Thread(target=self._run, name="tone-memory-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _import_json(self, legacy_path):
+        # Seed an empty table from the old tone_memory.json (once, whichever process gets there first)
+        if not legacy_path or not os.path.exists(legacy_path):
+            return
+        if self._reader.execute("SELECT 1 FROM tone_memory LIMIT 1").fetchone():
+            return
+        try:
+            with open(legacy_path, encoding="utf-8") as f:
+                legacy = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Couldn't import {legacy_path}: {e}")
+            return
+        conn = self._writer
+        with self._flush_lock, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if not conn.execute("SELECT 1 FROM tone_memory LIMIT 1").fetchone():
+                conn.executemany("INSERT INTO tone_memory (user, tone, seq) VALUES (?, ?, ?)",
+                                 [(user, tone, seq) for seq, (user, tone) in enumerate(legacy.items(), start=1)])
+
+    def _refresh_if_changed(self):
+        # Pick up tones written by other processes without re-reading every rerun
+        (version,) = self._reader.execute("PRAGMA data_version").fetchone()
+        if version == self._version:
+            return
+        self._version = version
+        rows = self._reader.execute(
+            "SELECT user, tone, seq FROM tone_memory WHERE seq > ? ORDER BY seq", (self._seq,)
+        ).fetchall()
+        for user, tone, seq in rows:
+            if user not in self._dirty:
+                self._memory[user] = tone
+            self._seq = seq
+
+    def get(self, user, default=None):
+        with self._lock:
+            self._refresh_if_changed()
+            return self._memory.get(user, default)
+
+    def set(self, user, tone):
+        """Remember `tone` for `user`; returns True if a write was scheduled."""
+        with self._lock:
+            if self._memory.get(user) == tone:
+                self.stats["unchanged"] += 1
+                return False
+            self._memory[user] = tone
+            self._dirty[user] = tone
+            self.stats["changes"] += 1
+        self._wake.set()
+        return True
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            # Let further changes arrive so they share one write
+            time.sleep(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, {}
+
+        try:
+            with self._flush_lock, self._writer:
+                self._writer.executemany(UPSERT, dirty.items())
+            with self._lock:
+                self.stats["flushes"] += 1
+        except sqlite3.Error as e:
+            print(f"⚠️ Couldn't save tone memory: {e}")
+            with self._lock:
+                self._dirty = {**dirty, **self._dirty}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_tone_memory():
+    """Process-wide tone memory store (loaded once, shared by every session)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ToneMemoryStore()
+        return _store
@@ -1,36 +1,40 @@
 # utils.py
-import os
-from dotenv import load_dotenv
-from langchain.chat_models import ChatOpenAI
-import csv
 from datetime import datetime
 
-load_dotenv()
+from agents.critique_agent import parse_critique_scores
+from review_store import get_store, user_key
+from shared.log_writer import get_log_writer
 
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY environment variable not set")
 
-print(f"openai_api_key: {openai_api_key}") # Debugging linellm = ChatOpenAI(
-model="gpt-4",
-temperature=0.7,
-openai_api_key=openai_api_key
+def _persist(rows):
+    store = get_store()
+    store.add_many(rows)
+    store.index_new_rows()  # keep the near-duplicate index current
+    store.aggregate_new_rows()  # and the score aggregates
 
 
+def _writer():
+    # Rewrites are queued and inserted by a background thread in batches
+    return get_log_writer("review_log", _persist)
 
-LOG_FILE = "review_log.csv"
 
-def log_rewrite(original, rewritten, user, tone, evaluation):
-    with open(LOG_FILE, "a", newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow([datetime.now(), user, tone, original, rewritten, evaluation])
+def log_rewrite(original, rewritten, user, tone, evaluation, llm_calls=None, scores=None):
+    """Queue a rewrite for the store; `scores` (already parsed by the pipeline) are parsed here if omitted."""
+    if scores is None:
+        scores = parse_critique_scores(evaluation)
+    _writer().write({"timestamp": str(datetime.now()), "user": user, "tone": tone, "original": original,
+                     "rewritten": rewritten, "evaluation": evaluation, "llm_calls": llm_calls,
+                     "scores": dict(scores)})
+
+def flush_rewrites(timeout=5.0):
+    """Wait until queued rewrites are in the store (before exporting it)."""
+    return _writer().flush(timeout)
 
 def get_recent_rewrites(user, limit=3):
     try:
-        with open(LOG_FILE, newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = [row for row in reader if row['user'].strip().lower() == user.lower()]
-            return rows[-limit:]
-    except (FileNotFoundError, IOError) as e:
-        print(f"Error reading log file: {e}")
-    return []
\ No newline at end of file
+        stored, pending = _writer().read_with_pending(lambda: get_store().recent(user, limit))
+        queued = [row for row in pending if user_key(row["user"]) == user_key(user)]
+        return (stored + queued)[-limit:]
+    except Exception as e:
+        print(f"Error reading rewrite history: {e}")
+    return []
@@ -0,0 +1,282 @@
+# perf/bench_hot_paths.py – offline microbenchmarks for per-rerun hot paths
+#
+# Usage (from enterprise-genai-suite/):
+#   python perf/bench_hot_paths.py                         # 10k + 100k rows
+#   python perf/bench_hot_paths.py --rows 10000,1000000,10000000
+#   python perf/bench_hot_paths.py --json results.json --baseline perf/baseline.json
+#   python perf/bench_hot_paths.py --save-baseline perf/baseline.json
+#
+# Synthetic logs and prompt corpora are generated into a scratch directory and
+# the real app functions are timed against them. No network, no API key.
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SUITE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+MVP1 = os.path.join(SUITE_DIR, "mvp1-multi-modal-content-generator")
+MVP2 = os.path.join(SUITE_DIR, "mvp2-agentic-ai-interior-stylist")
+MVP3 = os.path.join(SUITE_DIR, "mvp3-mcp-review-rewriter")
+
+TARGET_USER = "bench@example.com"
+ACTIVE_USER = "user7@example.com"  # one of the random synthetic users (~1 row in 2000)
+STYLE_WORDS = ["cozy", "rustic", "modern", "scandinavian", "kitchen", "living", "room", "oak", "linen",
+               "warm", "lighting", "brunch", "patio", "coastal", "minimalist", "japandi", "marble",
+               "farmhouse", "wholesale", "sunlit", "velvet", "brass", "ceramic", "holiday", "table"]
+BANNED_SAMPLE = ["dark", "cheap", "replica", "sale", "panic", "discount", "gothic", "budget"]
+
+
+# -------------------------------
+# Module Loading
+# -------------------------------
+def load_module(app_dir, filename, alias):
+    """Import an app module under a unique name (every app has its own `utils.py`)."""
+    sys.path.insert(0, app_dir)
+    try:
+        spec = importlib.util.spec_from_file_location(alias, os.path.join(app_dir, filename))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        sys.path.remove(app_dir)
+
+
+# -------------------------------
+# Synthetic Data
+# -------------------------------
+def _users(n_users):
+    return [f"user{i}@example.com" for i in range(n_users)]
+
+
+def _timestamps(rows):
+    start = datetime(2025, 1, 1)
+    for i in range(rows):
+        yield start + timedelta(seconds=i * 7)
+
+
+def _prompt(rng, banned_rate=0.2):
+    words = rng.sample(STYLE_WORDS, rng.randint(3, 8))
+    if rng.random() < banned_rate:
+        words.insert(rng.randrange(len(words)), rng.choice(BANNED_SAMPLE))
+    return " ".join(words).capitalize()
+
+
+def _critique(rng):
+    fmt = rng.choice(["{k}: {s}/5. {r}", "- **{k}**: {s}/5 – {r}", "{k}: {s} - {r}"])
+    names = ["Clarity", "Tone Fit to premium brand", "Empathy", "Brand Voice Consistency"]
+    return "\n\n".join(fmt.format(k=k, s=rng.randint(2, 5), r="The review reads well overall.")
+                       for k in names)
+
+
+def target_row(i, rows):
+    # The benchmark user appears a handful of times, spread through the log
+    return i % max(rows // 8, 1) == 0
+
+
+def make_mvp1_log(path, rows, rng, n_users=2000):
+    users = _users(n_users)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(["timestamp", "user", "prompt", "variant", "image_url"])
+        for i, ts in enumerate(_timestamps(rows)):
+            user = TARGET_USER if target_row(i, rows) else rng.choice(users)
+            writer.writerow([str(ts), user, _prompt(rng), "A – Warm & Cozy (emotional)",
+                             f"https://example.invalid/img-{i}.png"])
+
+
+def make_mvp2_log(path, rows, rng, n_users=2000):
+    users = _users(n_users)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp", "user", "prompt", "result"])
+        for i, ts in enumerate(_timestamps(rows)):
+            user = TARGET_USER if target_row(i, rows) else rng.choice(users)
+            prompt = _prompt(rng)
+            result = {"Style QA": "✅ Style QA Passed", "Compliance Check": "✅ Compliance Passed",
+                      "Publishing": f"📦 Content Published: '{prompt}'"}
+            writer.writerow([ts.strftime("%Y-%m-%d %H:%M:%S"), user, prompt, str(result)])
+
+
+def make_mvp3_store(store_module, path, rows, rng, n_users=2000):
+    users = _users(n_users)
+    store = store_module.ReviewStore(path)
+    conn = store._conn()
+    batch = []
+    for i, ts in enumerate(_timestamps(rows)):
+        user = TARGET_USER if target_row(i, rows) else rng.choice(users)
+        batch.append((str(ts), user, store_module.user_key(user), "Warm & Friendly",
+                      "Want a refund.", "We are sorry to hear that.", _critique(rng), 2))
+        if len(batch) >= 50000:
+            _insert(conn, batch)
+            batch = []
+    _insert(conn, batch)
+    return store
+
+
+def _insert(conn, batch):
+    with conn:
+        conn.executemany(
+            "INSERT INTO rewrites (timestamp, user, user_key, tone, original, rewritten, evaluation, llm_calls)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+
+
+# -------------------------------
+# Timing
+# -------------------------------
+def time_call(fn, min_time=0.2, max_iterations=1000):
+    """Call `fn` repeatedly (at least once, ~`min_time` seconds) and return per-call stats."""
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while not samples or (time.perf_counter() < deadline and len(samples) < max_iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return {"median_s": statistics.median(samples), "min_s": min(samples), "iterations": len(samples)}
+
+
+def run_benchmarks(row_counts, n_prompts, seed=7, min_time=0.2):
+    rng = random.Random(seed)
+    scratch = tempfile.mkdtemp(prefix="genai-bench-")
+    cwd = os.getcwd()
+    results = []
+
+    def record(name, size, stats):
+        results.append({"name": name, "size": size, **{k: round(v, 9) if isinstance(v, float) else v
+                                                        for k, v in stats.items()}})
+        print(f"  {name:<38} n={size:<10} median {stats['median_s'] * 1000:10.3f} ms "
+              f"({stats['iterations']} runs)", flush=True)
+
+    try:
+        # App utils create their log files in the working directory on import
+        os.chdir(scratch)
+        sys.path.insert(0, SUITE_DIR)
+        history = importlib.import_module("shared.history")
+        mvp1_utils = load_module(MVP1, "utils.py", "bench_mvp1_utils")
+        mvp2_utils = load_module(MVP2, "utils.py", "bench_mvp2_utils")
+        mvp2_agents = load_module(MVP2, "agents.py", "bench_mvp2_agents")
+        sys.path.insert(0, MVP3)
+        review_store = importlib.import_module("review_store")
+        mvp3_utils = load_module(MVP3, "utils.py", "bench_mvp3_utils")
+        critique_agent = importlib.import_module("agents.critique_agent")
+
+        for rows in row_counts:
+            print(f"\n[{rows:,} log rows]", flush=True)
+            mvp1_utils.LOG_FILE = os.path.join(scratch, f"sessions_{rows}.csv")
+            make_mvp1_log(mvp1_utils.LOG_FILE, rows, rng)
+            # Repeated reads are served from the per-user index after the first call
+            record("mvp1.get_recent_images", rows,
+                   time_call(lambda: mvp1_utils.get_recent_images(TARGET_USER), min_time))
+            # A fresh index per call: the backward block scan of a first read (e.g. after a restart),
+            # which stops once it has the user's newest INDEX_DEPTH rows or reaches the header
+            record("history.recent_cold", rows,
+                   time_call(lambda: history.HistoryIndex(mvp1_utils.LOG_FILE).recent(ACTIVE_USER), min_time))
+            record("history.recent_cold_unknown_user", rows,
+                   time_call(lambda: history.HistoryIndex(mvp1_utils.LOG_FILE).recent("nobody@example.com"),
+                             min_time))
+
+            mvp2_utils.LOG_FILE = os.path.join(scratch, f"session_log_{rows}.csv")
+            make_mvp2_log(mvp2_utils.LOG_FILE, rows, rng)
+            record("mvp2.get_recent_prompts", rows,
+                   time_call(lambda: mvp2_utils.get_recent_prompts(TARGET_USER), min_time))
+
+            review_store._store = make_mvp3_store(review_store, os.path.join(scratch, f"review_{rows}.db"),
+                                                  rows, rng)
+            record("mvp3.get_recent_rewrites", rows,
+                   time_call(lambda: mvp3_utils.get_recent_rewrites(TARGET_USER), min_time))
+
+        print(f"\n[{n_prompts:,} prompts]", flush=True)
+        prompts = [_prompt(rng) for _ in range(n_prompts)]
+        record("mvp2.check_style", n_prompts,
+               time_call(lambda: [mvp2_agents.check_style(p) for p in prompts], min_time))
+        record("mvp2.check_compliance", n_prompts,
+               time_call(lambda: [mvp2_agents.check_compliance(p) for p in prompts], min_time))
+        # A policy the size a real merchandising team would maintain
+        mvp2_policy = load_module(MVP2, "policy.py", "bench_mvp2_policy")
+        large_terms = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 12)))
+                       for _ in range(5000)] + BANNED_SAMPLE
+        large_matcher = mvp2_policy.TermMatcher(large_terms)
+        record("mvp2.policy_5k_terms", n_prompts,
+               time_call(lambda: [large_matcher.terms_in(p) for p in prompts], min_time))
+        record("mvp2.run_agent_workflow", n_prompts,
+               time_call(lambda: [mvp2_agents.run_agent_workflow(p) for p in prompts], min_time))
+
+        critiques = [_critique(rng) for _ in range(n_prompts)]
+        record("mvp3.parse_critique_scores", n_prompts,
+               time_call(lambda: [critique_agent.parse_critique_scores(c) for c in critiques], min_time))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "rows": row_counts,
+            "prompts": n_prompts,
+        },
+        "results": results,
+    }
+
+
+# -------------------------------
+# Baseline Comparison
+# -------------------------------
+def compare(report, baseline, tolerance):
+    """Print current vs baseline medians; return the names that regressed beyond `tolerance`."""
+    base = {(r["name"], r["size"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'benchmark':<38} {'size':>10} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}")
+    for r in report["results"]:
+        old = base.get((r["name"], r["size"]))
+        if old is None:
+            continue
+        ratio = r["median_s"] / old["median_s"] if old["median_s"] else float("inf")
+        flag = "  ⚠️ regression" if ratio > tolerance else ""
+        print(f"{r['name']:<38} {r['size']:>10} {old['median_s'] * 1000:12.3f} "
+              f"{r['median_s'] * 1000:12.3f} {ratio:7.2f}{flag}")
+        if flag:
+            regressions.append(f"{r['name']}@{r['size']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline microbenchmarks for the suite's hot paths.")
+    parser.add_argument("--rows", default="10000,100000",
+                        help="Comma-separated synthetic log sizes (e.g. 10000,1000000,10000000)")
+    parser.add_argument("--prompts", type=int, default=10000, help="Synthetic prompts/critiques per corpus")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds to spend per benchmark")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", dest="json_path", help="Write machine-readable results here")
+    parser.add_argument("--baseline", help="Compare against this stored results file")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="Flag benchmarks slower than baseline by more than this ratio")
+    parser.add_argument("--save-baseline", help="Store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    row_counts = [int(n) for n in args.rows.split(",") if n.strip()]
+    report = run_benchmarks(row_counts, args.prompts, args.seed, args.min_time)
+
+    for path in filter(None, [args.json_path, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
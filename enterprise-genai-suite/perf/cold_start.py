@@ -0,0 +1,138 @@
+# perf/cold_start.py – cold-start and import-time report for mvp1–mvp3
+#
+# Usage (from enterprise-genai-suite/):
+#   python perf/cold_start.py [--repeat 3] [--top 8] [--json cold_start.json]
+#
+# Every measurement runs in a fresh interpreter inside a scratch directory, so
+# nothing is cached between runs and the apps' CSV/JSON files are untouched.
+# No network calls are made: client construction only builds objects.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SUITE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# app -> (folder, modules app.py imports, first-use client factory)
+APPS = {
+    "mvp1": ("mvp1-multi-modal-content-generator",
+             ["generation", "utils"],
+             "shared.clients:get_openai_client"),
+    "mvp2": ("mvp2-agentic-ai-interior-stylist",
+             ["agents", "utils"],
+             "agents:get_llm"),
+    "mvp3": ("mvp3-mcp-review-rewriter",
+             ["pipeline", "utils", "review_store", "tone_memory", "llm_cache"],
+             "agents.rewrite_agent:get_llm"),
+}
+
+CHILD = r"""
+import importlib, json, sys, time
+modules, factory = json.loads(sys.argv[1]), sys.argv[2]
+t0 = time.perf_counter()
+for name in modules:
+    importlib.import_module(name)
+t1 = time.perf_counter()
+result = {"import_s": t1 - t0}
+try:
+    module_name, func = factory.split(":")
+    getattr(importlib.import_module(module_name), func)()
+    result["first_client_s"] = time.perf_counter() - t1
+except Exception as e:  # e.g. openai/langchain not installed in this environment
+    result["client_error"] = f"{type(e).__name__}: {e}"
+print(json.dumps(result))
+"""
+
+
+def _run_child(app_dir, args, importtime=False):
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-cold-start-report")
+    env["PYTHONPATH"] = os.pathsep.join([app_dir, SUITE_DIR, env.get("PYTHONPATH", "")])
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + args
+    with tempfile.TemporaryDirectory() as scratch:
+        return subprocess.run(cmd, cwd=scratch, env=env, capture_output=True, text=True)
+
+
+# Loaded by the interpreter or the measuring harness itself, not by the apps
+BASELINE_MODULES = {"site", "encodings", "json", "importlib", "time", "sys"}
+
+
+def heaviest_imports(stderr, top):
+    """Parse `-X importtime` output into the top-level imports with the largest cumulative time."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        if name.startswith("  "):
+            continue  # nested import (indented), already counted in its parent
+        if name.strip() in BASELINE_MODULES:
+            continue
+        rows.append((name.strip(), int(cumulative_us) / 1e6))
+    return sorted(rows, key=lambda r: r[1], reverse=True)[:top]
+
+
+def measure_app(name, repeat=3, top=8):
+    folder, modules, factory = APPS[name]
+    app_dir = os.path.join(SUITE_DIR, folder)
+    report = {"app": name, "folder": folder}
+
+    samples = []
+    for _ in range(repeat):
+        proc = _run_child(app_dir, ["-c", CHILD, json.dumps(modules), factory])
+        if proc.returncode != 0:
+            report["error"] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+            return report
+        samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    report["import_s"] = round(statistics.median(s["import_s"] for s in samples), 4)
+    if "client_error" in samples[0]:
+        report["client_error"] = samples[0]["client_error"]
+    else:
+        report["first_client_s"] = round(statistics.median(s["first_client_s"] for s in samples), 4)
+
+    streamlit = [_run_child(app_dir, ["-c", "import time; t=time.perf_counter(); import streamlit; "
+                                           "print(time.perf_counter()-t)"]) for _ in range(repeat)]
+    if all(p.returncode == 0 for p in streamlit):
+        report["streamlit_import_s"] = round(statistics.median(float(p.stdout) for p in streamlit), 4)
+
+    traced = _run_child(app_dir, ["-c", CHILD, json.dumps(modules), factory], importtime=True)
+    report["heaviest_imports"] = [{"module": m, "cumulative_s": round(t, 4)}
+                                  for m, t in heaviest_imports(traced.stderr, top)]
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app import and first-client times.")
+    parser.add_argument("--apps", nargs="*", default=list(APPS), choices=list(APPS))
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per measurement (median)")
+    parser.add_argument("--top", type=int, default=8, help="Heaviest imports to list per app")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    reports = [measure_app(name, args.repeat, args.top) for name in args.apps]
+    for r in reports:
+        print(f"\n=== {r['app']} ({r['folder']})")
+        if "error" in r:
+            print(f"  ⚠️ could not import: {r['error']}")
+            continue
+        print(f"  app module import : {r['import_s'] * 1000:8.1f} ms")
+        if "client_error" in r:
+            print(f"  first client build:   failed ({r['client_error']})")
+        else:
+            print(f"  first client build: {r['first_client_s'] * 1000:8.1f} ms")
+        if "streamlit_import_s" in r:
+            print(f"  streamlit import  : {r['streamlit_import_s'] * 1000:8.1f} ms")
+        for item in r["heaviest_imports"]:
+            print(f"    {item['cumulative_s'] * 1000:8.1f} ms  {item['module']}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+# perf/load_test.py – offline concurrent load test for the mvp1–mvp3 flows
+#
+# Usage (from enterprise-genai-suite/):
+#   python perf/load_test.py --users 20 --iterations 5
+#   python perf/load_test.py --flows mvp3 --users 50 --duration 60 --rate-429 0.02 --rate-5xx 0.01
+#   python perf/load_test.py --together --json load.json        # all flows at once, mixed load
+#   python perf/load_test.py --base-url http://127.0.0.1:8900/v1 # against an already running stub
+#
+# Starts perf/stub_openai.py in-process (no network, no API key, no cost) and
+# runs each flow in its own interpreter and scratch directory, with N simulated
+# users calling the same functions the Streamlit pages call:
+#   mvp1 – get_generation (DALL·E image + streamed caption, downloaded into the
+#          asset store) then get_recent_images
+#   mvp2 – run_agent_workflow + flagged-term highlighting, log_event, get_recent_prompts
+#          (policy checks only: this flow makes no model calls)
+#   mvp3 – stream_review_pipeline (rewrite → critique → edit), log_rewrite, get_recent_rewrites
+# Every prompt/review is unique, and the mvp3 LLM cache is off, so each
+# operation pays for its model calls. The stub has no quota, so the
+# scheduler's client-side RPM/TPM limits are lifted unless --keep-rate-limits
+# is given (use --rate-429 to see how the apps react to provider throttling).
+# Reports throughput and p50/p95/p99 of the whole operation and of its first
+# visible output, per flow, plus the stub's request and injected-error counts
+# and the apps' per-stage telemetry.
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+SUITE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, SUITE_DIR)  # shared/
+
+from stub_openai import add_stub_arguments, make_server, stub_config_from_args
+from shared.scheduler import DEFAULT_LIMITS
+
+FLOWS = {
+    "mvp1": "mvp1-multi-modal-content-generator",
+    "mvp2": "mvp2-agentic-ai-interior-stylist",
+    "mvp3": "mvp3-mcp-review-rewriter",
+}
+STYLES = ["Rustic Fall Kitchen", "Coastal Summer Brunch", "Modern Farmhouse Dining Room", "Tuscan Outdoor Patio",
+          "Scandinavian Living Room", "Art Deco Home Office", "Minimalist Zen Spa Bathroom"]
+MVP2_EXTRAS = ["with oak accents", "with cheap replica chairs", "in a dark gothic palette", "with linen and brass"]
+REVIEWS = ["The blender arrived with a cracked lid and support took a week to answer.",
+           "Love the cookware set, but the handles get hot and the box was damaged.",
+           "Delivery was late twice and nobody told me why. The sofa itself is beautiful.",
+           "The knife set is sharp and elegant, though one knife had a scratch on the blade."]
+TONES = ["Warm & Friendly", "Luxury & Premium", "Helpful & Technical"]
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, max(0, round(q * (len(values) - 1))))], 4)
+
+
+# -------------------------------
+# Flows (run inside the child interpreter)
+# -------------------------------
+def _mvp1_flow():
+    from generation import get_generation
+    from utils import get_recent_images, log_event
+
+    def run(user, i, mark_first):
+        prompt = f"{random.choice(STYLES)} {user}-{i}"
+        variant = random.choice(["A – Warm & Cozy (emotional)", "B – Modern & Sleek (luxury tone)"])
+        caption_prompt = f"Write a warm, cozy product description for a scene in {prompt} style."
+
+        def log_generation(generation):
+            log_event(prompt, generation.image_path, user, variant)
+
+        generation, _ = get_generation(user, prompt, variant, caption_prompt, on_complete=log_generation)
+        for event, payload in generation.iter_events():
+            if event.endswith("_error"):
+                raise payload
+            mark_first()
+        get_recent_images(user)
+
+    return run
+
+
+def _mvp2_flow():
+    from agents import run_agent_workflow
+    from policy import get_policy
+    from utils import get_recent_prompts, log_event
+
+    def run(user, i, mark_first):
+        prompt = f"{random.choice(STYLES)} {random.choice(MVP2_EXTRAS)} #{i}"
+        result = run_agent_workflow(prompt)
+        mark_first()
+        get_policy().find_all(prompt)
+        log_event(prompt, user, result)
+        get_recent_prompts(user)
+
+    return run
+
+
+def _mvp3_flow(mode=None):
+    from pipeline import PIPELINE_MODE, stream_review_pipeline
+    from utils import get_recent_rewrites, log_rewrite
+
+    def run(user, i, mark_first):
+        review = f"{random.choice(REVIEWS)} Order {user}-{i}."
+        tone = random.choice(TONES)
+        result = None
+        for event, payload in stream_review_pipeline(review, tone, mode=mode or PIPELINE_MODE):
+            if event == "done":
+                result = payload
+            else:
+                mark_first()
+        log_rewrite(review, result["final"], user, tone, result["critique"], llm_calls=result["llm_calls"])
+        get_recent_rewrites(user)
+
+    return run
+
+
+def run_child(flow, users, iterations, duration, think_time, mode, out_path):
+    """Drive `users` concurrent sessions through `flow` and write the records to `out_path`."""
+    from shared.scheduler import schedule_as
+    from shared.telemetry import get_registry, request_trace
+
+    operation = {"mvp1": _mvp1_flow, "mvp2": _mvp2_flow, "mvp3": lambda: _mvp3_flow(mode)}[flow]()
+    records, lock = [], threading.Lock()
+    deadline = [None]
+    # Every session starts at once; the duration is counted from that moment
+    start_gate = threading.Barrier(users, action=lambda: deadline.__setitem__(0, time.perf_counter() + duration))
+
+    def session(n):
+        user = f"load-{n}@example.com"
+        start_gate.wait()
+        i = 0
+        while (i < iterations) if not duration else (time.perf_counter() < deadline[0]):
+            if think_time:
+                time.sleep(random.uniform(0, 2 * think_time))
+            started = time.perf_counter()
+            first = []
+
+            def mark_first():
+                if not first:
+                    first.append(time.perf_counter() - started)
+
+            record = {"user": n}
+            try:
+                with request_trace(flow), schedule_as(user, "interactive"):
+                    operation(user, i, mark_first)
+                record["ok"] = True
+            except Exception as e:
+                record.update(ok=False, error=f"{type(e).__name__}: {e}")
+            record["latency_s"] = time.perf_counter() - started
+            record["first_output_s"] = first[0] if first else None
+            with lock:
+                records.append(record)
+            i += 1
+
+    wall_start = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(n,), name=f"user-{n}") for n in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_s = time.perf_counter() - wall_start
+
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump({"flow": flow, "users": users, "wall_s": wall_s, "records": records,
+                   "stages": get_registry().summary()}, f)
+
+
+# -------------------------------
+# Driver
+# -------------------------------
+def stub_stats(base_url):
+    with urllib.request.urlopen(base_url.rstrip("/").rsplit("/v1", 1)[0] + "/stats", timeout=10) as response:
+        return json.loads(response.read())
+
+
+def _start_flow(flow, args, base_url, scratch):
+    workdir = os.path.join(scratch, flow)
+    os.makedirs(workdir, exist_ok=True)
+    out_path = os.path.join(workdir, "load_result.json")
+    env = dict(os.environ)
+    env.update({"OPENAI_API_KEY": "sk-load-test", "OPENAI_BASE_URL": base_url, "OPENAI_API_BASE": base_url,
+                "LLM_CACHE": "off"})
+    if not args.keep_rate_limits:
+        env["MODEL_RATE_LIMITS"] = json.dumps({model: {"rpm": None, "tpm": None} for model in DEFAULT_LIMITS})
+    env["PYTHONPATH"] = os.pathsep.join([os.path.join(SUITE_DIR, FLOWS[flow]), SUITE_DIR, env.get("PYTHONPATH", "")])
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", flow, "--users", str(args.users),
+           "--iterations", str(args.iterations), "--duration", str(args.duration),
+           "--think-time", str(args.think_time), "--out", out_path]
+    if args.mvp3_mode:
+        cmd += ["--mvp3-mode", args.mvp3_mode]
+    log = open(os.path.join(workdir, "output.log"), "w", encoding="utf-8")
+    return subprocess.Popen(cmd, cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT), out_path, log
+
+
+def summarize(result):
+    records = result["records"]
+    ok = [r for r in records if r["ok"]]
+    latencies = [r["latency_s"] for r in ok]
+    firsts = [r["first_output_s"] for r in ok if r["first_output_s"] is not None]
+    errors = {}
+    for r in records:
+        if not r["ok"]:
+            kind = r["error"].split(":", 1)[0]
+            errors[kind] = errors.get(kind, 0) + 1
+    return {
+        "users": result["users"],
+        "operations": len(records),
+        "failed": len(records) - len(ok),
+        "errors": errors,
+        "wall_s": round(result["wall_s"], 3),
+        "throughput_ops_s": round(len(ok) / result["wall_s"], 3) if result["wall_s"] else 0.0,
+        "latency_s": {f"p{int(q * 100)}": _percentile(latencies, q) for q in (0.5, 0.95, 0.99)},
+        "first_output_s": {f"p{int(q * 100)}": _percentile(firsts, q) for q in (0.5, 0.95, 0.99)},
+        "stages": [{k: s[k] for k in ("stage", "calls", "errors", "retries", "p50_s", "p95_s", "p99_s", "queue_p95_s")
+                    if k in s} for s in result["stages"]],
+    }
+
+
+def run_flows(args, base_url, scratch):
+    """Run the flows (one after another, or all at once with --together); `{flow: summary}`."""
+    reports = {}
+    batches = [args.flows] if args.together else [[flow] for flow in args.flows]
+    for batch in batches:
+        before = stub_stats(base_url)
+        running = {flow: _start_flow(flow, args, base_url, scratch) for flow in batch}
+        for flow, (proc, out_path, log) in running.items():
+            proc.wait()
+            log.close()
+            if proc.returncode != 0 or not os.path.exists(out_path):
+                with open(log.name, encoding="utf-8") as f:
+                    tail = f.read().strip().splitlines()[-1:] or ["failed"]
+                reports[flow] = {"error": tail[0], "log": log.name}
+                continue
+            with open(out_path, encoding="utf-8") as f:
+                reports[flow] = summarize(json.load(f))
+        after = stub_stats(base_url)
+        stub = {key: after[key] - before.get(key, 0) for key in after}
+        for flow in batch:
+            reports[flow]["stub"] = stub  # shared by every flow in a --together batch
+    return reports
+
+
+def _stub_line(stub):
+    return (f"{stub['chat']} chat ({stub['chat_streamed']} streamed), {stub['images']} image calls; "
+            f"injected {stub['injected_429']}× 429, {stub['injected_5xx']}× 5xx")
+
+
+def print_report(reports, together=False):
+    print(f"{'flow':<6}{'users':>6}{'ops':>7}{'failed':>8}{'ops/s':>10}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}"
+          f"{'first p50':>10}{'first p95':>10}")
+    for flow, r in reports.items():
+        if "error" in r:
+            print(f"{flow:<6} ⚠️ {r['error']} (see {r['log']})")
+            continue
+        lat, first = r["latency_s"], r["first_output_s"]
+        cells = [lat["p50"], lat["p95"], lat["p99"]]
+        print(f"{flow:<6}{r['users']:>6}{r['operations']:>7}{r['failed']:>8}{r['throughput_ops_s']:>10}"
+              + "".join(f"{'–' if v is None else v:>8}" for v in cells)
+              + "".join(f"{'–' if v is None else v:>10}" for v in (first["p50"], first["p95"])))
+    if together:
+        stub = next(iter(reports.values()))["stub"]
+        print(f"all flows: stub served {_stub_line(stub)}")
+    for flow, r in reports.items():
+        if "error" in r:
+            continue
+        notes = ([] if together else [f"stub served {_stub_line(r['stub'])}"]) + \
+                ([f"errors {r['errors']}"] if r["errors"] else [])
+        print(f"{flow}:" + (" " + "; ".join(notes) if notes else ""))
+        for s in r["stages"]:
+            print(f"    {s['stage']:<10} {s['calls']:>5} calls  p50 {s['p50_s']}s  p95 {s['p95_s']}s  "
+                  f"p99 {s['p99_s']}s  queue p95 {s['queue_p95_s']}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test of the mvp1–mvp3 flows against a local "
+                                                 "OpenAI-compatible stub.")
+    parser.add_argument("--flows", nargs="+", default=list(FLOWS), choices=list(FLOWS))
+    parser.add_argument("--users", "-u", type=int, default=10, help="Concurrent simulated users per flow")
+    parser.add_argument("--iterations", "-n", type=int, default=5, help="Operations per user")
+    parser.add_argument("--duration", type=float, default=0,
+                        help="Run each flow for this many seconds instead of a fixed number of iterations")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="Mean pause between a user's operations (uniform 0–2×)")
+    parser.add_argument("--together", action="store_true", help="Run all flows at the same time")
+    parser.add_argument("--mvp3-mode", choices=["three-stage", "fused"], default=None)
+    parser.add_argument("--keep-rate-limits", action="store_true",
+                        help="Keep the scheduler's real per-model RPM/TPM limits (lifted by default)")
+    parser.add_argument("--base-url", default=None, help="Use an already running stub instead of starting one")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory (logs, CSVs, DBs)")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this JSON file")
+    parser.add_argument("--child", choices=list(FLOWS), help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.child, args.users, args.iterations, args.duration, args.think_time, args.mvp3_mode, args.out)
+        return
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = make_server(stub_config_from_args(args), port=0)
+        threading.Thread(target=server.serve_forever, name="stub-openai", daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    scratch = tempfile.mkdtemp(prefix="genai-load-")
+    try:
+        reports = run_flows(args, base_url, scratch)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    print_report(reports, args.together)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"base_url": base_url, "flows": reports}, f, indent=2, ensure_ascii=False)
+    if args.keep:
+        print(f"Scratch files kept in {scratch}")
+    else:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+# perf/stub_openai.py – local OpenAI-compatible stub server for offline load tests
+#
+# Usage (from enterprise-genai-suite/):
+#   python perf/stub_openai.py --port 8900 --chat-latency lognormal:0.8,0.5 --rate-429 0.02 --rate-5xx 0.01
+#   OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=stub streamlit run mvp3-mcp-review-rewriter/app.py
+#
+# Speaks just enough of the API for mvp1–mvp3:
+#   POST /v1/chat/completions   – JSON or SSE streaming (stream=true, with a usage chunk)
+#   POST /v1/images/generations – returns a URL served by GET /files/<id>.png
+#   GET  /stats                 – request counts, injected errors and tokens, as JSON
+# Latencies are drawn per request from a distribution: "fixed:S", "uniform:LO,HI",
+# "normal:MEAN,SD" or "lognormal:MEDIAN,SIGMA" (seconds). Chat responses take the
+# first-token latency plus `--token-interval` per completion token, streamed or
+# not. A `--rate-429` / `--rate-5xx` fraction of model calls fail the way the
+# real API does (429 with Retry-After; 500 or 503), before any latency.
+#
+# Replies are canned but shaped for the apps' parsers: mvp3 critique prompts get
+# "Clarity: 4/5. ..." lines, fused prompts get the JSON object, and `--pass-rate`
+# sets how often every score reaches 4 (otherwise the editor runs).
+import argparse
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("our team crafted this piece with care and we appreciate your thoughtful feedback about the "
+         "finish texture delivery and overall experience we would love to make it right for you").split()
+CRITERIA = ["Clarity", "Tone Fit to premium brand", "Empathy", "Brand Voice Consistency"]
+FUSED_KEYS = ["Clarity", "Tone Fit", "Empathy", "Brand Voice Consistency"]
+
+
+# -------------------------------
+# Latency Distributions
+# -------------------------------
+def parse_latency(spec):
+    """Sampler for a latency spec like "lognormal:0.8,0.5" (seconds, never negative)."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()] if params else []
+    try:
+        if kind == "fixed":
+            (seconds,) = values
+            return lambda rng: seconds
+        if kind == "uniform":
+            low, high = values
+            return lambda rng: rng.uniform(low, high)
+        if kind == "normal":
+            mean, sd = values
+            return lambda rng: max(0.0, rng.gauss(mean, sd))
+        if kind == "lognormal":
+            median, sigma = values
+            return lambda rng: rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"invalid latency spec {spec!r} (fixed:S, uniform:LO,HI, normal:MEAN,SD, "
+                                     f"lognormal:MEDIAN,SIGMA)")
+
+
+# -------------------------------
+# Canned Replies
+# -------------------------------
+def _prompt_text(body):
+    return "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+
+
+def _sentence(rng, tokens):
+    return " ".join(rng.choice(WORDS) for _ in range(max(1, tokens))).capitalize() + "."
+
+
+def reply_for(prompt, rng, tokens, pass_rate):
+    """Reply text shaped like what the apps expect for `prompt`."""
+    passed = rng.random() < pass_rate
+    scores = [rng.choice((4, 5)) if passed else rng.choice((2, 3, 4)) for _ in CRITERIA]
+    if "Respond with a single JSON object" in prompt:
+        evaluation = {key: {"score": score, "reason": _sentence(rng, 6)} for key, score in zip(FUSED_KEYS, scores)}
+        return json.dumps({"rewritten": _sentence(rng, tokens), "evaluation": evaluation})
+    if "Evaluate the following customer review" in prompt:
+        return "\n".join(f"{name}: {score}/5. {_sentence(rng, 8)}" for name, score in zip(CRITERIA, scores))
+    return _sentence(rng, tokens)
+
+
+def _chunks(text):
+    # Roughly one token per word, keeping the whitespace so the stream reassembles exactly
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+def _png(seed_text, size=64):
+    """A small solid-colour PNG, different per image id."""
+    r, g, b = zlib.crc32(seed_text.encode()).to_bytes(4, "big")[:3]
+    raw = b"".join(b"\x00" + bytes((r, g, b)) * size for _ in range(size))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+# -------------------------------
+# Server
+# -------------------------------
+class StubConfig:
+    def __init__(self, chat_latency="lognormal:0.8,0.4", token_interval=0.01, image_latency="lognormal:4,0.3",
+                 completion_tokens=60, rate_429=0.0, rate_5xx=0.0, retry_after=1.0, pass_rate=0.7, seed=None):
+        self.chat_latency = parse_latency(chat_latency)
+        self.image_latency = parse_latency(image_latency)
+        self.token_interval = token_interval
+        self.completion_tokens = completion_tokens
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after
+        self.pass_rate = pass_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"chat": 0, "chat_streamed": 0, "images": 0, "files": 0,
+                      "injected_429": 0, "injected_5xx": 0, "completion_tokens": 0}
+
+    def sample(self, fn):
+        with self.lock:  # random.Random is not meant to be shared across threads unguarded
+            return fn(self.rng)
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _inject_error(self):
+        """Send an injected 429/5xx and return True for a `--rate-*` fraction of model calls."""
+        config = self.config
+        roll = config.sample(lambda rng: rng.random())
+        if roll < config.rate_429:
+            config.count("injected_429")
+            self._send(429, {"error": {"message": "Rate limit reached (stub)", "type": "requests",
+                                       "code": "rate_limit_exceeded"}},
+                       headers={"Retry-After": f"{config.retry_after:g}"})
+            return True
+        if roll < config.rate_429 + config.rate_5xx:
+            config.count("injected_5xx")
+            status = config.sample(lambda rng: rng.choice((500, 503)))
+            self._send(status, {"error": {"message": "The server had an error (stub)", "type": "server_error"}})
+            return True
+        return False
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.config.lock:
+                self._send(200, dict(self.config.stats))
+        elif self.path.startswith("/files/"):
+            self.config.count("files")
+            self._send(200, _png(self.path), content_type="image/png")
+        else:
+            self._send(404, {"error": {"message": f"no route {self.path}"}})
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        body = self._read_json()
+        if path.endswith("/chat/completions"):
+            if not self._inject_error():
+                self._chat(body)
+        elif path.endswith("/images/generations"):
+            if not self._inject_error():
+                self._image(body)
+        else:
+            self._send(404, {"error": {"message": f"no route {self.path}"}})
+
+    def _chat(self, body):
+        config = self.config
+        prompt = _prompt_text(body)
+        tokens = min(config.completion_tokens, body.get("max_tokens") or config.completion_tokens)
+        text = config.sample(lambda rng: reply_for(prompt, rng, tokens, config.pass_rate))
+        pieces = _chunks(text)
+        usage = {"prompt_tokens": max(1, len(prompt) // 4), "completion_tokens": len(pieces)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        common = {"id": completion_id, "created": int(time.time()), "model": body.get("model", "stub")}
+        config.count("chat")
+        config.count("completion_tokens", len(pieces))
+
+        time.sleep(config.sample(config.chat_latency))
+        if not body.get("stream"):
+            time.sleep(config.token_interval * len(pieces))
+            self._send(200, {**common, "object": "chat.completion", "usage": usage, "choices": [{
+                "index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}]})
+            return
+
+        config.count("chat_streamed")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        events = [{"role": "assistant", "content": ""}] + [{"content": piece} for piece in pieces]
+        for i, delta in enumerate(events):
+            if i > 1:
+                time.sleep(config.token_interval)
+            self._event({**common, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        self._event({**common, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self._event({**common, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _event(self, payload):
+        self._write_chunk(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _image(self, body):
+        config = self.config
+        config.count("images")
+        time.sleep(config.sample(config.image_latency))
+        host = self.headers.get("Host") or f"127.0.0.1:{self.server.server_address[1]}"
+        data = [{"url": f"http://{host}/files/{uuid.uuid4().hex}.png", "revised_prompt": body.get("prompt", "")}
+                for _ in range(int(body.get("n") or 1))]
+        self._send(200, {"created": int(time.time()), "data": data})
+
+
+def make_server(config, host="127.0.0.1", port=8900):
+    """A ready-to-serve stub bound to (host, port); port 0 picks a free one."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def _latency_spec(spec):
+    parse_latency(spec)
+    return spec
+
+
+def add_stub_arguments(parser):
+    parser.add_argument("--chat-latency", default="lognormal:0.8,0.4", type=_latency_spec,
+                        help="First-token latency of chat calls (default lognormal:0.8,0.4)")
+    parser.add_argument("--token-interval", type=float, default=0.01, help="Seconds per completion token")
+    parser.add_argument("--image-latency", default="lognormal:4,0.3", type=_latency_spec, help="Latency of image generations")
+    parser.add_argument("--completion-tokens", type=int, default=60, help="Tokens per chat reply")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of model calls answered with 429")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Fraction of model calls answered with 500/503")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--pass-rate", type=float, default=0.7,
+                        help="Fraction of critiques where every score is 4 or 5")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def stub_config_from_args(args):
+    return StubConfig(args.chat_latency, args.token_interval, args.image_latency, args.completion_tokens,
+                      args.rate_429, args.rate_5xx, args.retry_after, args.pass_rate, args.seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server for load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = make_server(stub_config_from_args(args), args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"Stub OpenAI API on http://{host}:{port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+# Shared infrastructure for the Enterprise GenAI Suite apps (mvp1–mvp3).
+#
+# Each app's entry point puts the suite directory on sys.path so modules can
+# `from shared.clients import ...` regardless of which app folder runs.
@@ -0,0 +1,63 @@
+# shared/admin_panel.py – optional sidebar panel with per-stage model-call metrics
+#
+# Hidden unless the app runs with ADMIN_PANEL=1.
+import os
+
+import streamlit as st
+
+from shared.resilience import breaker_snapshot
+from shared.scheduler import get_scheduler
+from shared.telemetry import get_registry
+from shared.transport import pool_snapshot
+
+ADMIN_PANEL = os.getenv("ADMIN_PANEL", "").lower() in ("1", "true", "yes", "on")
+
+
+def render_admin_panel():
+    if not ADMIN_PANEL:
+        return
+    if not st.sidebar.checkbox("🛠️ Show performance panel", value=False):
+        return
+
+    registry = get_registry()
+    with st.sidebar.expander("📈 Model calls by stage", expanded=True):
+        rows = registry.summary()
+        if not rows:
+            st.caption("No model calls recorded yet.")
+            return
+        st.table([{
+            "stage": f"{r['app']}/{r['stage']}",
+            "calls": r["calls"],
+            "p50 s": r["p50_s"],
+            "p95 s": r["p95_s"],
+            "p99 s": r["p99_s"],
+            "cache hits": r["cache_hits"],
+            "retries": r["retries"],
+            "hedges": r["hedges"],
+            "tokens": r["prompt_tokens"] + r["completion_tokens"],
+            "cost $": round(r["cost_usd"], 4),
+        } for r in rows])
+
+        for model, state in get_scheduler().snapshot().items():
+            queued = ", ".join(f"{p} {n}" for p, n in state["queued"].items())
+            paused = f", paused {state['paused_s']}s" if state["paused_s"] else ""
+            st.caption(f"🚦 {model}: queued {queued}; rate {state['scale']:.0%} of limit, "
+                       f"{state['rate_limited']}× 429{paused}")
+        for model, breaker in breaker_snapshot().items():
+            if breaker["state"] != "closed":
+                st.caption(f"🔌 {model}: circuit {breaker['state'].replace('_', '-')} "
+                           f"after {breaker['failures']} failures")
+        pool = pool_snapshot()
+        if pool["requests"]:
+            st.caption(f"🔗 HTTP pool: {pool['active_connections']}/{pool['max_connections']} active, "
+                       f"{pool['idle_connections']} idle, {pool['connections_opened']} opened for "
+                       f"{pool['requests']} requests{' (HTTP/2)' if pool['http2'] else ''}")
+
+        if registry.traces:
+            last = registry.traces[-1]
+            st.markdown(f"**Last request** `{last['request_id']}` – {last['wall_s']}s, ${last['cost_usd']:.4f}, "
+                        f"{last['retries']} retries, {last['hedges']} hedges")
+            for span in last["spans"]:
+                cached = " (cache)" if span["cache_hit"] else ""
+                st.caption(f"{span['stage']}{cached}: {span['wall_s']}s, "
+                           f"{span['prompt_tokens']}+{span['completion_tokens']} tokens")
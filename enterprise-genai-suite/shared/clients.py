@@ -0,0 +1,55 @@
+# shared/clients.py – lazily built, process-wide model clients
+#
+# Nothing heavy (openai, langchain) is imported until a client is first
+# requested, and each client is built once per process and reused by every
+# Streamlit session, batch worker and agent. All of them send their requests
+# through the one pooled keep-alive httpx client in shared/transport.py.
+import functools
+import os
+import threading
+
+from shared.transport import get_http_client
+
+# Retries and per-stage deadlines are handled by shared/resilience.py; the SDKs
+# only get a hard socket-level timeout so abandoned attempts eventually free their thread
+CLIENT_TIMEOUT = float(os.getenv("MODEL_CLIENT_TIMEOUT", "180"))
+
+_env_lock = threading.Lock()
+_env_loaded = False
+
+
+def _load_env():
+    global _env_loaded
+    with _env_lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _env_loaded = True
+
+
+def get_api_key():
+    _load_env()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("OPENAI_API_KEY is not set in the environment")
+    return api_key
+
+
+@functools.lru_cache(maxsize=None)
+def get_openai_client():
+    """Shared `openai.OpenAI` client (images + chat completions)."""
+    from openai import OpenAI
+    return OpenAI(api_key=get_api_key(), max_retries=0, timeout=CLIENT_TIMEOUT,
+                  http_client=get_http_client())
+
+
+@functools.lru_cache(maxsize=None)
+def get_chat_model(model="gpt-4", temperature=0.7, max_tokens=None):
+    """Shared LangChain `ChatOpenAI`, one instance per (model, temperature, max_tokens)."""
+    from langchain_openai import ChatOpenAI
+    kwargs = {"model": model, "temperature": temperature, "openai_api_key": get_api_key(),
+              "max_retries": 0, "timeout": CLIENT_TIMEOUT, "http_client": get_http_client(),
+              "stream_usage": True}  # streamed calls end with a usage chunk (scheduler + telemetry)
+    if max_tokens:
+        kwargs["max_tokens"] = max_tokens
+    return ChatOpenAI(**kwargs)
@@ -0,0 +1,156 @@
+# shared/downloads.py – streamed CSV downloads for the "Download session log" buttons
+#
+#   sidebar_download(lambda out: log.export_user(user, out), f"{user}_session_log.csv")
+#
+# `st.download_button` needs the whole file as bytes, so it keeps every export
+# in memory and sends it in one piece. With EXPORT_PORT set, the apps hand out
+# a one-time link instead: a small HTTP endpoint in the app process runs the
+# export when the link is opened and writes the CSV to the socket chunk by
+# chunk as it is read from the user's archive partitions and the live log.
+# Set EXPORT_URL when browsers reach that port through a proxy. Without
+# EXPORT_PORT the export is spooled to a temp file and offered through
+# `download_button`, but only up to EXPORT_MAX_MB.
+import io
+import os
+import secrets
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+EXPORT_PORT = os.getenv("EXPORT_PORT")
+EXPORT_URL = os.getenv("EXPORT_URL")  # public base URL of the endpoint, default http://localhost:$EXPORT_PORT
+EXPORT_LINK_TTL = float(os.getenv("EXPORT_LINK_TTL", "300"))
+EXPORT_MAX_MB = float(os.getenv("EXPORT_MAX_MB", "25"))
+
+
+class ExportTooLarge(Exception):
+    """A spooled export passed EXPORT_MAX_MB."""
+
+
+# -------------------------------
+# One-time Links + Endpoint
+# -------------------------------
+_links = {}  # token -> (expires, file name, write)
+_links_lock = threading.Lock()
+
+
+def offer_download(write, file_name, ttl=EXPORT_LINK_TTL):
+    """Register `write(out)` (CSV text to a file-like `out`) and return a one-time URL that streams it."""
+    token = secrets.token_urlsafe(24)
+    now = time.monotonic()
+    with _links_lock:
+        for expired in [t for t, link in _links.items() if link[0] < now]:
+            del _links[expired]
+        _links[token] = (now + ttl, file_name, write)
+    base = EXPORT_URL or f"http://localhost:{EXPORT_PORT}"
+    return f"{base.rstrip('/')}/download/{token}"
+
+
+def _take(token):
+    with _links_lock:
+        link = _links.pop(token, None)
+    if link is None or link[0] < time.monotonic():
+        return None
+    return link
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        prefix = "/download/"
+        link = _take(self.path[len(prefix):]) if self.path.startswith(prefix) else None
+        if link is None:
+            self.send_error(404)
+            return
+        _, file_name, write = link
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv; charset=utf-8")
+        self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(file_name)}")
+        # No Content-Length: the response is HTTP/1.0 and ends when the connection closes
+        self.end_headers()
+        out = io.TextIOWrapper(self.wfile, encoding="utf-8", newline="", write_through=True)
+        try:
+            write(out)
+        except Exception as e:
+            print(f"⚠️ Export download '{file_name}' stopped early: {e}")
+        finally:
+            out.detach()
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_download_server(port):
+    """Serve registered downloads at /download/<token> from a daemon thread (once per process)."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+            except OSError as e:
+                # Another Streamlit process already owns the port
+                print(f"⚠️ Download endpoint not started on :{port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="download-server", daemon=True).start()
+        return _server
+
+
+def streaming_available():
+    return bool(EXPORT_PORT) and start_download_server(int(EXPORT_PORT)) is not None
+
+
+# -------------------------------
+# Capped Spool (no endpoint)
+# -------------------------------
+class _CappedWriter:
+    def __init__(self, out, max_bytes):
+        self.out = out
+        self.max_bytes = max_bytes
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text.encode("utf-8"))
+        if self.size > self.max_bytes:
+            raise ExportTooLarge(f"export is larger than {self.max_bytes / 1024 / 1024:g} MB")
+        return self.out.write(text)
+
+
+def spool(write, max_bytes=int(EXPORT_MAX_MB * 1024 * 1024)):
+    """Run `write(out)` into a temp file of at most `max_bytes`; returns its path (the caller deletes it)."""
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as out:
+            write(_CappedWriter(out, max_bytes))
+        return path
+    except BaseException:
+        os.remove(path)
+        raise
+
+
+# -------------------------------
+# Sidebar Button (Streamlit apps only)
+# -------------------------------
+def sidebar_download(write, file_name, label="Download CSV"):
+    """Offer `write(out)` in the sidebar: a streamed one-time link, or a size-capped download button."""
+    import streamlit as st
+
+    if streaming_available():
+        st.sidebar.link_button(label, offer_download(write, file_name))
+        st.sidebar.caption(f"The link works once, for {EXPORT_LINK_TTL / 60:g} minutes.")
+        return
+    try:
+        path = spool(write)
+    except ExportTooLarge as e:
+        st.sidebar.warning(f"Your log is too large to download here ({e}). "
+                           "Ask an admin to enable streamed downloads (EXPORT_PORT).")
+        return
+    try:
+        with open(path, "rb") as export_file:
+            st.sidebar.download_button(label=label, data=export_file, file_name=file_name, mime="text/csv")
+    finally:
+        os.remove(path)
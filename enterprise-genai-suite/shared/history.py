@@ -0,0 +1,212 @@
+# shared/history.py – "recent rows for this user" reads over append-only CSV logs
+#
+#   get_history("sessions.csv").recent("alice@example.com", limit=3)
+#
+# The first read for a user scans the file backwards in blocks and stops after
+# enough of that user's rows, so it never parses the whole log. The byte
+# offsets of those rows are kept in a small per-user index. Rows appended
+# afterwards (by this process or another) are picked up by scanning only the
+# new bytes, so later reads cost O(limit) regardless of the log size.
+import csv
+import io
+import os
+import threading
+from collections import deque
+
+BLOCK_SIZE = 64 * 1024
+# Row offsets remembered per user
+INDEX_DEPTH = 20
+
+
+def _parse(line):
+    """Parse one CSV record; None if it is not a complete record on its own."""
+    if line.count(b'"') % 2:
+        return None  # quoted field continues on another line
+    try:
+        return next(csv.reader(io.StringIO(line.decode("utf-8"))), None)
+    except (UnicodeDecodeError, csv.Error):
+        return None
+
+
+class HistoryIndex:
+    """Per-user offsets of the most recent rows in one CSV log."""
+
+    def __init__(self, path, user_field="user", depth=INDEX_DEPTH):
+        self.path = path
+        self.user_field = user_field
+        self.depth = depth
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.header = None
+        self.covered_to = 0     # every row before this byte offset has been indexed for primed users
+        self._identity = None
+        self._offsets = {}      # user -> deque of row offsets, newest last
+        self._primed = set()    # users whose offsets are complete up to covered_to
+
+    @staticmethod
+    def _key(user):
+        return (user or "").strip().lower()
+
+    # ---------- file access ----------
+    def _read_header(self, f):
+        f.seek(0)
+        first = f.readline()
+        self._header_end = f.tell()
+        return _parse(first.rstrip(b"\r\n"))
+
+    def _row_at(self, f, offset):
+        f.seek(offset)
+        line = f.readline()
+        while line.count(b'"') % 2:  # multi-line quoted field
+            more = f.readline()
+            if not more:
+                break
+            line += more
+        fields = next(csv.reader(io.StringIO(line.decode("utf-8", errors="replace"))), [])
+        return dict(zip(self.header, fields))
+
+    def _refresh(self, f):
+        """Validate the cached state against the file and index any appended rows."""
+        stat = os.fstat(f.fileno())
+        identity = (stat.st_ino, stat.st_dev)
+        if identity != self._identity or stat.st_size < self.covered_to:
+            # New, replaced or truncated (e.g. rotated) file
+            self._reset()
+            self._identity = identity
+            self.header = self._read_header(f)
+            self.covered_to = stat.st_size
+            return
+        if stat.st_size > self.covered_to:
+            self._scan_forward(f, self.covered_to, stat.st_size)
+
+    def _scan_forward(self, f, start, end):
+        user_col = self.header.index(self.user_field)
+        f.seek(start)
+        offset = start
+        while offset < end:
+            line = f.readline()
+            if not line:
+                break
+            while line.count(b'"') % 2:
+                more = f.readline()
+                if not more:
+                    break
+                line += more
+            if not line.endswith(b"\n"):
+                break  # partially written row; pick it up next time
+            fields = _parse(line.rstrip(b"\r\n").replace(b"\n", b" ").replace(b"\r", b" "))
+            if fields and len(fields) > user_col:
+                self._remember(self._key(fields[user_col]), offset, primed_only=True)
+            offset += len(line)
+        self.covered_to = offset
+
+    def _remember(self, user, offset, primed_only=False):
+        if primed_only and user not in self._primed:
+            return
+        self._offsets.setdefault(user, deque(maxlen=self.depth)).append(offset)
+
+    def _scan_backward(self, f, user, limit):
+        """Offsets of the newest `limit` rows for `user`, newest first; None if the file can't be read backwards."""
+        user_col = self.header.index(self.user_field)
+        needle = user.encode("utf-8")
+        found = []
+        position = self.covered_to
+        carry = b""
+        while position > self._header_end and len(found) < limit:
+            size = min(BLOCK_SIZE, position - self._header_end)
+            position -= size
+            f.seek(position)
+            block = f.read(size) + carry
+            lines = block.split(b"\n")
+            # The first piece may be the end of a line that starts in an earlier block
+            carry = lines.pop(0) if position > self._header_end else b""
+            line_end = position + len(block)
+            for line in reversed(lines):
+                line_start = line_end - len(line)
+                line_end = line_start - 1
+                if line.count(b'"') % 2:
+                    return None  # a quoted field spans lines
+                if needle not in line.lower():
+                    continue  # cheap pre-filter before CSV parsing
+                fields = _parse(line.rstrip(b"\r"))
+                if fields is None or len(fields) != len(self.header):
+                    return None
+                if self._key(fields[user_col]) == user:
+                    found.append(line_start)
+                    if len(found) >= limit:
+                        break
+        return found
+
+    def _scan_all(self, f, user):
+        """Fallback for logs with embedded newlines: one forward pass for this user."""
+        user_col = self.header.index(self.user_field)
+        f.seek(self._header_end)
+        offsets = []
+        offset = self._header_end
+        while offset < self.covered_to:
+            line = f.readline()
+            if not line:
+                break
+            while line.count(b'"') % 2:
+                more = f.readline()
+                if not more:
+                    break
+                line += more
+            fields = next(csv.reader(io.StringIO(line.decode("utf-8", errors="replace"))), [])
+            if len(fields) > user_col and self._key(fields[user_col]) == user:
+                offsets.append(offset)
+            offset += len(line)
+        return offsets[::-1]
+
+    # ---------- public API ----------
+    def recent(self, user, limit=3):
+        """The user's newest `limit` rows as dicts, newest first."""
+        if not os.path.exists(self.path):
+            return []
+        user = self._key(user)
+        with self._lock, open(self.path, "rb") as f:
+            self._refresh(f)
+            if not self.header or self.user_field not in self.header:
+                return []
+
+            if limit > self.depth:
+                # Deeper than the index keeps; scan without caching
+                return [self._row_at(f, o) for o in self._find(f, user, limit)[:limit]]
+
+            if user not in self._primed:
+                # First read for this user: the index then holds their newest `depth`
+                # rows (or all of them) and appended rows keep it current
+                offsets = self._find(f, user, self.depth)
+                self._offsets[user] = deque(reversed(offsets[:self.depth]), maxlen=self.depth)
+                self._primed.add(user)
+
+            newest_first = list(reversed(self._offsets[user]))[:limit]
+            return [self._row_at(f, o) for o in newest_first]
+
+    def _find(self, f, user, limit):
+        offsets = self._scan_backward(f, user, limit)
+        return offsets if offsets is not None else self._scan_all(f, user)
+
+    def note_append(self, user, offset, end):
+        """Record a row another component just appended at `offset` (ending at `end`)."""
+        with self._lock:
+            if self._identity is None or offset != self.covered_to:
+                return  # not in sync; the next read will scan the new bytes itself
+            self._remember(self._key(user), offset, primed_only=True)
+            self.covered_to = end
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_history(path, user_field="user"):
+    """Process-wide index for the log at `path`."""
+    key = (os.path.abspath(path), user_field)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = HistoryIndex(path, user_field)
+        return index
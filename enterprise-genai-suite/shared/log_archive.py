@@ -0,0 +1,320 @@
+# shared/log_archive.py – rotation of the live CSV logs into a per-user, per-day archive
+#
+#   log_archive/sessions/user=alice%40example.com/date=2025-07-04/part-….parquet
+#
+# `CsvLog` (log_writer.py) rotates its live CSV once it reaches LOG_ROTATE_MB.
+# Age-based rotation (LOG_ROTATE_HOURS) is opt-in, so existing logs stay in
+# place until they grow. The file is renamed into `<archive>/<log>/_rotated/`
+# under the same lock appenders take, so no row is lost or written twice, and
+# a background thread splits it into compressed partitions by user and date.
+# Partitions are gzip CSV by default and Parquet (zstd) when the optional
+# pyarrow package is installed. Exporting or reading one user's history opens
+# only that user's partitions plus the small live file.
+import contextlib
+import csv
+import gzip
+import importlib.util
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows: only one process should archive at a time
+    fcntl = None
+
+ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "log_archive")
+ROTATE_BYTES = int(float(os.getenv("LOG_ROTATE_MB", "64")) * 1024 * 1024)
+# Age-based rotation is opt-in (0 = off)
+ROTATE_SECONDS = float(os.getenv("LOG_ROTATE_HOURS", "0")) * 3600
+# Rows read from a rotated file per partition write (bounds memory while archiving)
+ARCHIVE_CHUNK_ROWS = 50000
+# Users whose newest archived rows are kept in memory for the "recent" panels
+RECENT_CACHE_USERS = 4096
+
+
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _partition_key(user):
+    return quote((user or "").strip().lower(), safe="") or "_"
+
+
+def _day(timestamp):
+    day = (timestamp or "")[:10]
+    try:
+        datetime.strptime(day, "%Y-%m-%d")
+        return day
+    except ValueError:
+        return "unknown"
+
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value.strip()).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+class LogArchive:
+    """Rotated, partitioned history of one CSV log."""
+
+    def __init__(self, path, header, user_field="user", timestamp_field="timestamp", root=ARCHIVE_DIR,
+                 rotate_bytes=ROTATE_BYTES, rotate_seconds=ROTATE_SECONDS):
+        self.path = path
+        self.header = list(header)
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self.dir = os.path.join(root, self.name)
+        self.rotated_dir = os.path.join(self.dir, "_rotated")
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self._user_col = self.header.index(user_field)
+        self._ts_col = self.header.index(timestamp_field) if timestamp_field in self.header else None
+        self._oldest = (None, None)  # (inode, timestamp of the live file's first row)
+        self._archiving = threading.Lock()
+        # user key -> (archive generation, rows requested, newest rows); see recent()
+        self._recent = OrderedDict()
+        self._recent_lock = threading.Lock()
+        self.stats = {"rotations": 0, "archived_rows": 0, "errors": 0}
+        if os.path.isdir(self.dir) and self.generation() is None:
+            self._bump_generation()
+
+    # -------------------------------
+    # Rotation (called by CsvLog with the live file locked)
+    # -------------------------------
+    def due(self, f, size):
+        """True when the open, locked live file `f` of `size` bytes should be rotated."""
+        if size >= self.rotate_bytes:
+            return True
+        if self._ts_col is None or not self.rotate_seconds:
+            return False
+        inode = os.fstat(f.fileno()).st_ino
+        if self._oldest[0] != inode:
+            self._oldest = (inode, self._first_timestamp(f))
+        oldest = self._oldest[1]
+        return oldest is not None and time.time() - oldest >= self.rotate_seconds
+
+    def _first_timestamp(self, f):
+        f.seek(0)
+        f.readline()  # header
+        row = next(csv.reader([f.readline().decode("utf-8", errors="replace")]), None)
+        f.seek(0, os.SEEK_END)
+        return _parse_timestamp(row[self._ts_col]) if row and len(row) > self._ts_col else None
+
+    def rotate(self):
+        """Move the live file aside; the caller must hold its lock. Returns the rotated path."""
+        os.makedirs(self.rotated_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        target = os.path.join(self.rotated_dir, f"{self.name}-{stamp}-{os.getpid()}.csv")
+        os.replace(self.path, target)
+        self._bump_generation()
+        self.stats["rotations"] += 1
+        return target
+
+    def _bump_generation(self):
+        # Only a rotation adds rows to the archive; a fresh inode tells every process to drop cached reads
+        path = os.path.join(self.dir, ".generation")
+        with open(f"{path}.{os.getpid()}.tmp", "w") as f:
+            f.write(str(time.time_ns()))
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+    def generation(self):
+        """Changes whenever any process rotates this log; None while nothing has been archived."""
+        try:
+            st = os.stat(os.path.join(self.dir, ".generation"))
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def archive_in_background(self):
+        threading.Thread(target=self.archive_rotated, name=f"log-archive-{self.name}", daemon=True).start()
+
+    # -------------------------------
+    # Archiving
+    # -------------------------------
+    def rotated_files(self):
+        if not os.path.isdir(self.rotated_dir):
+            return []
+        return sorted(os.path.join(self.rotated_dir, n) for n in os.listdir(self.rotated_dir) if n.endswith(".csv"))
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive):
+        """Archiver (exclusive) vs readers (shared), across threads and processes."""
+        os.makedirs(self.dir, exist_ok=True)
+        with open(os.path.join(self.dir, ".archive.lock"), "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def archive_rotated(self):
+        """Split every rotated file into user/date partitions, then delete it; returns rows archived."""
+        if not self.rotated_files():
+            return 0
+        total = 0
+        with self._archiving, self._locked(exclusive=True):
+            for path in self.rotated_files():
+                try:
+                    total += self._archive_file(path)
+                    os.remove(path)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"⚠️ Couldn't archive {path}, keeping it for the next rotation: {e}")
+        self.stats["archived_rows"] += total
+        return total
+
+    def _archive_file(self, path):
+        # Part names derive from the rotated file and chunk number, so a retry overwrites, never duplicates
+        stem = os.path.splitext(os.path.basename(path))[0]
+        rows = 0
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader, None)  # header
+            chunk_no = 0
+            while True:
+                partitions = {}
+                for row in reader:
+                    row = (row + [""] * len(self.header))[:len(self.header)]
+                    day = _day(row[self._ts_col]) if self._ts_col is not None else "unknown"
+                    partitions.setdefault((_partition_key(row[self._user_col]), day), []).append(row)
+                    rows += 1
+                    if rows % ARCHIVE_CHUNK_ROWS == 0:
+                        break
+                if not partitions:
+                    return rows
+                for (user, day), part_rows in partitions.items():
+                    self._write_partition(user, day, f"part-{stem}-{chunk_no:04d}", part_rows)
+                chunk_no += 1
+
+    def _write_partition(self, user, day, name, rows):
+        directory = os.path.join(self.dir, f"user={user}", f"date={day}")
+        os.makedirs(directory, exist_ok=True)
+        if parquet_available():
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            target = os.path.join(directory, name + ".parquet")
+            table = pa.table({column: [row[i] for row in rows] for i, column in enumerate(self.header)})
+            tmp = f"{target}.{os.getpid()}.tmp"
+            pq.write_table(table, tmp, compression="zstd")
+        else:
+            target = os.path.join(directory, name + ".csv.gz")
+            tmp = f"{target}.{os.getpid()}.tmp"
+            with gzip.open(tmp, "wt", newline="", encoding="utf-8") as out:
+                csv.writer(out).writerows(rows)
+        os.replace(tmp, target)
+
+    # -------------------------------
+    # Reads (one user's partitions only)
+    # -------------------------------
+    def _partition_files(self, user, newest_first=False):
+        user_dir = os.path.join(self.dir, f"user={_partition_key(user)}")
+        if not os.path.isdir(user_dir):
+            return []
+        files = []
+        for day in sorted(os.listdir(user_dir), reverse=newest_first):
+            day_dir = os.path.join(user_dir, day)
+            names = sorted((n for n in os.listdir(day_dir) if n.endswith((".parquet", ".csv.gz"))),
+                           reverse=newest_first)
+            files += [os.path.join(day_dir, n) for n in names]
+        return files
+
+    def _read_partition(self, path):
+        """Rows of one partition file as lists in header order, oldest first."""
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=ARCHIVE_CHUNK_ROWS):
+                columns = [batch.column(batch.schema.get_field_index(c)).to_pylist() for c in self.header]
+                yield from (list(values) for values in zip(*columns))
+        else:
+            with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+                yield from csv.reader(f)
+
+    def _rotated_rows(self, user, paths):
+        """The user's rows from rotated files not archived yet, oldest first."""
+        key = (user or "").strip().lower()
+        for path in paths:
+            with open(path, newline="", encoding="utf-8") as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                for row in reader:
+                    if len(row) > self._user_col and row[self._user_col].strip().lower() == key:
+                        yield row
+
+    @contextlib.contextmanager
+    def pinned(self):
+        """Shared lock for a long read: archive runs wait, appends and rotations don't."""
+        with self._locked(exclusive=False):
+            yield
+
+    def iter_user_rows(self, user, rotated=None):
+        """Every archived row for `user` (partitions, then rotated files), oldest first.
+
+        Inside `pinned()`, pass the `rotated` files listed when the caller took
+        its snapshot; a file rotated after that is not read twice.
+        """
+        if rotated is not None:
+            for path in self._partition_files(user):
+                yield from self._read_partition(path)
+            yield from self._rotated_rows(user, rotated)
+            return
+        if not os.path.isdir(self.dir):
+            return
+        # Shared lock: an archive run can't move rows between the two reads
+        with self._locked(exclusive=False):
+            for path in self._partition_files(user):
+                yield from self._read_partition(path)
+            yield from self._rotated_rows(user, self.rotated_files())
+
+    def recent(self, user, limit=3):
+        """The user's newest `limit` archived rows as dicts, newest first.
+
+        Called on every rerun for users with few live rows, so the answer is
+        cached per user until the next rotation: a hit costs one stat().
+        """
+        generation = self.generation()
+        if generation is None:
+            return []
+        key = _partition_key(user)
+        with self._recent_lock:
+            cached = self._recent.get(key)
+            if cached is not None and cached[0] == generation and cached[1] >= limit:
+                self._recent.move_to_end(key)
+                return [dict(row) for row in cached[2][:limit]]
+        rows = self._read_recent(user, limit)
+        with self._recent_lock:
+            self._recent[key] = (generation, limit, rows)
+            self._recent.move_to_end(key)
+            while len(self._recent) > RECENT_CACHE_USERS:
+                self._recent.popitem(last=False)
+        return [dict(row) for row in rows]
+
+    def _read_recent(self, user, limit):
+        with self._locked(exclusive=False):
+            rows = list(self._rotated_rows(user, self.rotated_files()))[::-1][:limit]
+            for path in self._partition_files(user, newest_first=True):
+                if len(rows) >= limit:
+                    break
+                rows += list(self._read_partition(path))[::-1][:limit - len(rows)]
+        return [dict(zip(self.header, row)) for row in rows]
+
+
+def write_csv_chunks(out, rows, header, quoting=csv.QUOTE_MINIMAL, chunk_rows=5000):
+    """Write `header` (if any) and `rows` to the text file `out` in chunks; returns the number of rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=quoting)
+    if header is not None:
+        writer.writerow(header)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % chunk_rows == 0:
+            out.write(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+    out.write(buffer.getvalue())
+    return count
@@ -0,0 +1,383 @@
+# shared/log_writer.py – buffered background writer for the app logs
+#
+#   sessions = get_csv_log("sessions.csv", ["timestamp", "user", "prompt"], quoting=csv.QUOTE_ALL)
+#   sessions.append([timestamp, user, prompt])    # returns immediately
+#   sessions.recent(user, limit=3)                # includes rows not yet on disk
+#
+# Request threads only append records to an in-memory queue. One daemon thread
+# per log drains it in batches (once BATCH_SIZE records are waiting or
+# FLUSH_INTERVAL seconds after the first one arrived, whichever comes first).
+# CSV batches are written under an exclusive advisory lock (fcntl.flock), so
+# rows from concurrent sessions and processes never interleave. Queues are
+# flushed at interpreter exit. Queue depth, its high watermark, written rows
+# and write errors are exported on /metrics; a growing depth means the disk is
+# not keeping up (the queue is unbounded, so requests never wait for it).
+#
+# The live CSV is rotated into a per-user, per-day archive (log_archive.py)
+# once it passes LOG_ROTATE_MB / LOG_ROTATE_HOURS; `recent()` and
+# `export_user()` read that user's archive partitions plus the live file.
+import atexit
+import contextlib
+import csv
+import io
+import os
+import threading
+import time
+from collections import deque
+from itertools import chain
+
+from shared.history import get_history
+from shared.log_archive import LogArchive, write_csv_chunks
+from shared.telemetry import register_gauge
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, rows are still written in whole batches
+    fcntl = None
+
+BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "100"))
+FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "0.5"))
+# Seconds to wait before retrying a batch that failed to write
+RETRY_DELAY = 1.0
+# Seconds allowed for the final flush at exit
+SHUTDOWN_TIMEOUT = 5.0
+
+
+class LogWriter:
+    """Queue + background thread that hands records to `sink(batch)` in batches."""
+
+    def __init__(self, name, sink, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.name = name
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._cond = threading.Condition()
+        # Held while a batch is written, so readers never see a record both on disk and pending
+        self._io_lock = threading.Lock()
+        self._queue = deque()
+        self._inflight = []
+        self._flush_requested = False
+        self._closed = False
+        self.queued = 0
+        self.stats = {"written": 0, "batches": 0, "errors": 0, "high_watermark": 0, "last_batch_s": 0.0}
+        self._thread = threading.Thread(target=self._run, name=f"log-writer-{name}", daemon=True)
+        self._thread.start()
+
+    # -------------------------------
+    # Request Side (never touches the disk)
+    # -------------------------------
+    def write(self, record):
+        with self._cond:
+            if self._closed:
+                print(f"⚠️ Log '{self.name}' is closed, dropping record")
+                return
+            self._queue.append(record)
+            self.queued += 1
+            depth = len(self._queue) + len(self._inflight)
+            self.stats["high_watermark"] = max(self.stats["high_watermark"], depth)
+            if len(self._queue) == 1 or len(self._queue) >= self.batch_size:
+                self._cond.notify()
+
+    def depth(self):
+        with self._cond:
+            return len(self._queue) + len(self._inflight)
+
+    def pending(self):
+        """Records accepted but not written yet, oldest first."""
+        with self._cond:
+            return self._inflight + list(self._queue)
+
+    def read_with_pending(self, read):
+        """Return `(read(), pending())` as one consistent view of the log."""
+        with self._io_lock:
+            return read(), self.pending()
+
+    def flush(self, timeout=None):
+        """Block until every record written so far is on disk; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = self.queued
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self.stats["written"] < target and self._thread.is_alive():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return self.stats["written"] >= target
+
+    def close(self, timeout=SHUTDOWN_TIMEOUT):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    # -------------------------------
+    # Writer Thread
+    # -------------------------------
+    def _next_batch(self):
+        """Wait for a full batch, the flush interval, a flush request or close; None when finished."""
+        with self._cond:
+            deadline = None
+            while True:
+                if self._queue and (len(self._queue) >= self.batch_size or self._flush_requested or self._closed):
+                    break
+                if not self._queue:
+                    if self._closed:
+                        return None
+                    self._flush_requested = False
+                    deadline = None
+                    self._cond.wait()
+                    continue
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            self._inflight = list(self._queue)
+            self._queue.clear()
+            return self._inflight
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            start = time.perf_counter()
+            with self._io_lock:
+                try:
+                    self.sink(batch)
+                    error = None
+                except Exception as e:
+                    error = e
+                with self._cond:
+                    self._inflight = []
+                    if error is None:
+                        self.stats["written"] += len(batch)
+                        self.stats["batches"] += 1
+                        self.stats["last_batch_s"] = round(time.perf_counter() - start, 4)
+                    elif self._closed:
+                        self.stats["written"] += len(batch)  # unblock flush(); the rows are lost
+                    else:
+                        self._queue.extendleft(reversed(batch))
+                    self._cond.notify_all()
+
+            if error is not None:
+                self.stats["errors"] += 1
+                if self._closed:
+                    print(f"❌ Dropped {len(batch)} records for log '{self.name}' at shutdown: {error}")
+                else:
+                    print(f"⚠️ Couldn't write log '{self.name}', retrying in {RETRY_DELAY:g}s: {error}")
+                    time.sleep(RETRY_DELAY)
+
+
+# -------------------------------
+# CSV Logs
+# -------------------------------
+def _lock(f, exclusive=True):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class CsvLog:
+    """Append-only CSV log written by a `LogWriter`, with "recent rows for a user" reads."""
+
+    def __init__(self, path, header, quoting=csv.QUOTE_MINIMAL, user_field="user"):
+        self.path = path
+        self.header = list(header)
+        self.quoting = quoting
+        self.user_field = user_field
+        self._user_col = self.header.index(user_field)
+        self.archive = LogArchive(path, self.header, user_field)
+        self.archive.archive_in_background()  # leftovers from a process that stopped mid-archive
+        self.writer = LogWriter(os.path.basename(path), self._write_batch)
+
+    @staticmethod
+    def _key(user):
+        return (user or "").strip().lower()
+
+    def _encode(self, row):
+        buffer = io.StringIO()
+        csv.writer(buffer, quoting=self.quoting).writerow(row)
+        return buffer.getvalue().encode("utf-8")
+
+    @contextlib.contextmanager
+    def _locked_file(self, mode, exclusive=True, **open_kwargs):
+        """Open and lock the live file, reopening if it was rotated while we waited for the lock."""
+        while True:
+            try:
+                f = open(self.path, mode, **open_kwargs)
+            except FileNotFoundError:
+                yield None  # read modes only; nothing written yet since the last rotation
+                return
+            with f:
+                _lock(f, exclusive)
+                try:
+                    try:
+                        current = os.fstat(f.fileno()).st_ino == os.stat(self.path).st_ino
+                    except FileNotFoundError:
+                        current = False
+                    if current:
+                        yield f
+                        return
+                finally:
+                    _unlock(f)
+
+    def _write_batch(self, rows):
+        encoded = [self._encode(row) for row in rows]
+        rotated = False
+        while True:
+            with self._locked_file("a+b") as f:
+                offset = f.seek(0, os.SEEK_END)
+                if offset and self.archive.due(f, offset):
+                    # Renamed under the lock: other writers reopen the new file (see _locked_file)
+                    self.archive.rotate()
+                    rotated = True
+                    continue
+                if offset == 0:
+                    f.write(self._encode(self.header))
+                    offset = f.tell()
+                f.write(b"".join(encoded))
+                f.flush()
+            break
+        if rotated:
+            self.archive.archive_in_background()
+
+        # Keep the recent-rows index current without rescanning what we just wrote
+        history = get_history(self.path, self.user_field)
+        for row, data in zip(rows, encoded):
+            history.note_append(row[self._user_col], offset, offset + len(data))
+            offset += len(data)
+
+    def append(self, row):
+        """Queue one row (values are written as text); returns immediately."""
+        self.writer.write(["" if value is None else str(value) for value in row])
+
+    def recent(self, user, limit=3):
+        """The user's newest `limit` rows as dicts, newest first, including rows still queued."""
+        key = self._key(user)
+        on_disk, pending = self.writer.read_with_pending(
+            lambda: get_history(self.path, self.user_field).recent(user, limit))
+        queued = [dict(zip(self.header, row)) for row in reversed(pending) if self._key(row[self._user_col]) == key]
+        rows = queued + on_disk
+        if len(rows) < limit:
+            rows += self.archive.recent(user, limit - len(rows))
+        return rows[:limit]
+
+    def export_user(self, user, out):
+        """Write the user's rows (archive, live file, queue) as CSV to the text file `out`, oldest first.
+
+        Only that user's archive partitions are opened, and rows are written in
+        chunks, so memory stays flat however long the history is. The writer
+        lock is held just long enough to fix where the export ends, so appends
+        carry on while it streams. Returns the row count.
+        """
+        key = self._key(user)
+
+        def snapshot():
+            # Shared lock on the live file: no process can rotate it until its end is known
+            with self._locked_file("rb", exclusive=False) as f:
+                rotated = self.archive.rotated_files()
+                if f is None:
+                    return rotated, None, 0
+                return rotated, os.fdopen(os.dup(f.fileno()), "rb"), f.seek(0, os.SEEK_END)
+
+        # Archive runs wait until the export is done, so the listed rotated files stay put
+        with self.archive.pinned():
+            (rotated, live, size), pending = self.writer.read_with_pending(snapshot)
+            try:
+                rows = chain(self.archive.iter_user_rows(user, rotated=rotated),
+                             self._live_rows(live, size, key),
+                             (row for row in pending if self._key(row[self._user_col]) == key))
+                return write_csv_chunks(out, rows, self.header, self.quoting)
+            finally:
+                if live is not None:
+                    live.close()
+
+    def _live_rows(self, f, size, key):
+        """The user's rows among the first `size` bytes of the open live file `f`."""
+        if f is None:
+            return
+
+        def lines():
+            # Still the same inode if the file was rotated since: rows past `size` are left out
+            f.seek(0)
+            while f.tell() < size:
+                line = f.readline(size - f.tell())
+                if not line:
+                    return
+                yield line.decode("utf-8", errors="replace")
+
+        reader = csv.reader(lines())
+        next(reader, None)
+        for row in reader:
+            if len(row) > self._user_col and self._key(row[self._user_col]) == key:
+                yield row
+
+
+# -------------------------------
+# Registry, Shutdown + Metrics
+# -------------------------------
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def _register(key, factory):
+    with _writers_lock:
+        if not _writers:
+            register_gauge(_render_metrics)
+            atexit.register(close_all)
+        log = _writers.get(key)
+        if log is None:
+            log = _writers[key] = factory()
+        return log
+
+
+def get_csv_log(path, header, quoting=csv.QUOTE_MINIMAL, user_field="user"):
+    """Process-wide background-written log for the CSV at `path`."""
+    return _register(("csv", os.path.abspath(path)), lambda: CsvLog(path, header, quoting, user_field))
+
+
+def get_log_writer(name, sink):
+    """Process-wide `LogWriter` called `name`; `sink(batch)` persists a list of records."""
+    return _register(("writer", name), lambda: LogWriter(name, sink))
+
+
+def _writer_of(log):
+    return log.writer if isinstance(log, CsvLog) else log
+
+
+def close_all(timeout=SHUTDOWN_TIMEOUT):
+    """Flush and stop every writer (registered with atexit)."""
+    with _writers_lock:
+        writers = [_writer_of(log) for log in _writers.values()]
+    for writer in writers:
+        writer.close(timeout)
+
+
+def _render_metrics():
+    with _writers_lock:
+        writers = [_writer_of(log) for log in _writers.values()]
+    lines = ["# HELP genai_log_writer_queue_depth Log records accepted but not yet written",
+             "# TYPE genai_log_writer_queue_depth gauge"]
+    lines += [f'genai_log_writer_queue_depth{{log="{w.name}"}} {w.depth()}' for w in writers]
+    lines += ["# HELP genai_log_writer_queue_high_watermark Deepest the log queue has been",
+              "# TYPE genai_log_writer_queue_high_watermark gauge"]
+    lines += [f'genai_log_writer_queue_high_watermark{{log="{w.name}"}} {w.stats["high_watermark"]}'
+              for w in writers]
+    lines += ["# HELP genai_log_writer_written_total Log records written",
+              "# TYPE genai_log_writer_written_total counter"]
+    lines += [f'genai_log_writer_written_total{{log="{w.name}"}} {w.stats["written"]}' for w in writers]
+    lines += ["# HELP genai_log_writer_errors_total Failed batch writes (retried)",
+              "# TYPE genai_log_writer_errors_total counter"]
+    lines += [f'genai_log_writer_errors_total{{log="{w.name}"}} {w.stats["errors"]}' for w in writers]
+    lines += ["# HELP genai_log_writer_last_batch_seconds Time taken by the last batch write",
+              "# TYPE genai_log_writer_last_batch_seconds gauge"]
+    lines += [f'genai_log_writer_last_batch_seconds{{log="{w.name}"}} {w.stats["last_batch_s"]}' for w in writers]
+    return lines
@@ -0,0 +1,306 @@
+# shared/resilience.py – deadlines, retries, hedging and circuit breaking for model calls
+#
+# `call_model` / `stream_model` in scheduler.py run every model call in the
+# suite through these pieces:
+#   - a per-stage deadline (STAGE_TIMEOUTS): a stuck call raises
+#     DeadlineExceeded instead of hanging the session
+#   - transient failures (timeouts, connection errors, 5xx) are retried with
+#     capped exponential backoff and full jitter while the deadline allows
+#   - hedging (HEDGE_REQUESTS=1) for idempotent text stages: a call still
+#     running after that stage's recent p95 gets a duplicate, first answer wins
+#   - one circuit breaker per model: after BREAKER_FAILURES consecutive
+#     failures calls fail fast with ProviderUnavailable for BREAKER_COOLDOWN
+#     seconds, then a single probe decides whether to close it again. Callers
+#     serve cached or degraded output instead of an error page.
+# Retries and hedges are counted on the current telemetry span, so every
+# request trace carries them.
+import concurrent.futures
+import contextvars
+import inspect
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+from shared.telemetry import get_registry, register_gauge
+
+# Seconds a whole stage (all attempts, excluding rate-limit queueing) may take.
+# Override with STAGE_TIMEOUTS='{"critique": 20}'
+DEFAULT_TIMEOUTS = {"image": 120, "caption": 30, "rewrite": 60, "critique": 45, "edit": 60, "fused": 90}
+DEFAULT_TIMEOUT = float(os.getenv("MODEL_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", "2"))
+BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.5"))
+BACKOFF_CAP = float(os.getenv("RETRY_BACKOFF_CAP", "8"))
+
+HEDGE_ENABLED = os.getenv("HEDGE_REQUESTS", "off").lower() in ("1", "on", "true", "yes")
+# Text stages whose duplicate requests are harmless (never images)
+HEDGE_STAGES = ("caption", "rewrite", "critique", "edit", "fused", "llm")
+HEDGE_QUANTILE = 0.95
+# Calls observed for a stage before its p95 is trusted as the hedge delay
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.5
+
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+
+# Non-streaming attempts run here so they can be abandoned at the deadline or raced by a
+# hedge. Streams get their own pump thread (see iter_with_deadline) and never hold a worker.
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=int(os.getenv("MODEL_CALL_WORKERS", "32")),
+                                                  thread_name_prefix="model-call")
+
+
+class DeadlineExceeded(TimeoutError):
+    """A model call did not finish within its stage deadline."""
+
+
+class ProviderUnavailable(RuntimeError):
+    """The model's circuit breaker is open; the call was not sent."""
+
+
+def load_timeouts():
+    timeouts = dict(DEFAULT_TIMEOUTS)
+    overrides = os.getenv("STAGE_TIMEOUTS")
+    if overrides:
+        try:
+            timeouts.update({stage: float(seconds) for stage, seconds in json.loads(overrides).items()})
+        except (ValueError, AttributeError) as e:
+            print(f"⚠️ Ignoring invalid STAGE_TIMEOUTS: {e}")
+    return timeouts
+
+
+_timeouts = load_timeouts()
+
+
+def timeout_for(stage_name):
+    return _timeouts.get(stage_name, DEFAULT_TIMEOUT)
+
+
+def hedge_delay(span):
+    """Seconds to wait before hedging the current call, or None if it should not be hedged."""
+    if not HEDGE_ENABLED or span is None or span.stage not in HEDGE_STAGES:
+        return None
+    p95 = get_registry().stage_percentile(span.app, span.stage, HEDGE_QUANTILE, min_samples=HEDGE_MIN_SAMPLES)
+    return None if p95 is None else max(HEDGE_MIN_DELAY, p95)
+
+
+def backoff(attempt):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def is_transient(error):
+    """Worth retrying: timeouts, dropped connections and provider-side (5xx) errors."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status >= 500 or status == 408
+    return type(error).__name__ in ("APITimeoutError", "APIConnectionError", "InternalServerError",
+                                    "ServiceUnavailableError", "ConnectError", "ReadTimeout", "RemoteProtocolError")
+
+
+def provider_unhealthy(error):
+    """True when a failed call should fall back to cached or degraded output."""
+    return isinstance(error, ProviderUnavailable) or is_transient(error)
+
+
+# -------------------------------
+# Circuit Breaker
+# -------------------------------
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, model, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.model = model
+        self.threshold = failures
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_until = 0.0
+        self.trips = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Raise ProviderUnavailable unless a call may be sent now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == self.OPEN and now >= self.opened_until:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True  # one probe call decides
+                return
+            raise ProviderUnavailable(f"{self.model} is temporarily unavailable "
+                                      f"(retrying in {max(0.0, self.opened_until - now):.0f}s)")
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_until = time.monotonic() + self.cooldown
+                self._probing = False
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(model):
+    with _breakers_lock:
+        if not _breakers:
+            register_gauge(_render_metrics)
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker(model)
+        return breaker
+
+
+def breaker_snapshot():
+    with _breakers_lock:
+        return {model: {"state": b.state, "failures": b.failures, "trips": b.trips} for model, b in _breakers.items()}
+
+
+def _render_metrics():
+    snapshot = breaker_snapshot()
+    states = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+    lines = ["# HELP genai_circuit_state Circuit breaker per model (0 closed, 1 half-open, 2 open)",
+             "# TYPE genai_circuit_state gauge"]
+    lines += [f'genai_circuit_state{{model="{m}"}} {states[s["state"]]}' for m, s in snapshot.items()]
+    lines += ["# HELP genai_circuit_trips_total Times a model's circuit breaker opened",
+              "# TYPE genai_circuit_trips_total counter"]
+    lines += [f'genai_circuit_trips_total{{model="{m}"}} {s["trips"]}' for m, s in snapshot.items()]
+    return lines
+
+
+# -------------------------------
+# Deadlines + Hedging
+# -------------------------------
+def _submit(fn, *args, **kwargs):
+    """Queue `fn` on the attempt pool; the returned future's `started` event is set once a worker runs it."""
+    # Each attempt gets its own copy of the caller's context (telemetry span, scheduler caller)
+    context = contextvars.copy_context()
+    started = threading.Event()
+
+    def run():
+        started.set()
+        return context.run(fn, *args, **kwargs)
+
+    future = _executor.submit(run)
+    future.started = started
+    return future
+
+
+def run_with_deadline(fn, args, kwargs, timeout, hedge_after=None, hedge=None):
+    """Return `fn(*args, **kwargs)`, raising DeadlineExceeded after `timeout` seconds.
+
+    The clock starts when a worker picks the call up, so waiting for a free
+    worker under load is not mistaken for a slow provider. That wait has its
+    own budget of `timeout` seconds: when abandoned attempts on a stalled
+    provider fill the pool, new calls fail with DeadlineExceeded (and trip the
+    breaker) instead of queueing without limit. With `hedge_after`, a
+    duplicate is started if the call is still running by then and `hedge()`
+    returns True; the first successful result wins.
+    """
+    futures = [_submit(fn, *args, **kwargs)]
+    if not futures[0].started.wait(timeout) and futures[0].cancel():
+        raise DeadlineExceeded(f"no model-call worker was free within {timeout:g}s")
+    deadline = time.monotonic() + timeout
+    try:
+        if hedge_after is not None and hedge_after < timeout:
+            done, _ = concurrent.futures.wait(futures, timeout=hedge_after)
+            if not done and hedge():
+                futures.append(_submit(fn, *args, **kwargs))
+
+        error = None
+        while futures:
+            remaining = deadline - time.monotonic()
+            done, _ = concurrent.futures.wait(futures, timeout=max(0.0, remaining),
+                                              return_when=concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded(f"model call did not finish within {timeout:g}s")
+            for future in done:
+                futures.remove(future)
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+    finally:
+        for future in futures:
+            future.cancel()  # a hedge still waiting for a worker never starts
+
+
+def _close(source):
+    close = getattr(source, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception:
+            pass
+
+
+def iter_with_deadline(make_iter, first_timeout, idle_timeout):
+    """Yield from `make_iter()` (run on its own pump thread); DeadlineExceeded if the first
+    item takes longer than `first_timeout` or the stream stalls for `idle_timeout`.
+
+    When the consumer stops early (deadline, error or an abandoned generator)
+    the source is closed, so its HTTP response is released right away instead
+    of streaming on until the socket timeout.
+    """
+    items = queue.Queue()
+    stop = threading.Event()
+    sources = []
+
+    def pump():
+        source = None
+        try:
+            source = make_iter()
+            sources.append(source)
+            for item in source:
+                if stop.is_set():
+                    return
+                items.put((True, item))
+            items.put((False, None))
+        except BaseException as e:
+            items.put((None, e))
+        finally:
+            _close(source)
+
+    # A dedicated thread: a stream holds its pump for as long as it runs, which
+    # would starve the bounded attempt pool under load
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(pump,), name="model-stream", daemon=True).start()
+    timeout = first_timeout
+    try:
+        while True:
+            try:
+                kind, item = items.get(timeout=max(0.0, timeout))
+            except queue.Empty:
+                raise DeadlineExceeded(f"model stream stalled for {timeout:g}s") from None
+            if kind is None:
+                raise item
+            if kind is False:
+                return
+            timeout = idle_timeout
+            yield item
+    finally:
+        stop.set()
+        # Response-backed streams (e.g. the OpenAI SDK's) can be closed from here, which
+        # unblocks a pump waiting on the socket. A generator can only be closed by the
+        # pump itself, which does so before its next item.
+        for source in sources:
+            if not inspect.isgenerator(source):
+                _close(source)
@@ -0,0 +1,414 @@
+# shared/scheduler.py – process-wide, rate-limit-aware gate for every model call
+#
+#   with schedule_as(user, priority="interactive"):     # set once per request
+#       response = call_model("gpt-4", llm.invoke, prompt, est_tokens=900)
+#
+# Each model has a requests-per-minute and a tokens-per-minute token bucket.
+# Callers wait in a queue ordered by priority class (interactive before batch)
+# and round-robin across users within a class, so one heavy user or a batch
+# job cannot starve everyone else. A 429 halves that model's send rate and
+# pauses it for the Retry-After period; successes raise it back additively
+# (AIMD), which keeps throughput close to the quota without error storms.
+# Deadlines, transient-error retries, hedging and circuit breaking come from
+# resilience.py.
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from shared.resilience import (
+    MAX_RETRIES, DeadlineExceeded, ProviderUnavailable, backoff, get_breaker, hedge_delay, is_transient,
+    iter_with_deadline, run_with_deadline, timeout_for,
+)
+from shared.telemetry import current_span, estimate_tokens, register_gauge, usage_tokens
+
+# model -> (requests per minute, tokens per minute); None means unlimited.
+# Override with MODEL_RATE_LIMITS='{"gpt-4": {"rpm": 500, "tpm": 30000}}'
+DEFAULT_LIMITS = {
+    "gpt-4": (500, 10000),
+    "gpt-4o": (500, 30000),
+    "gpt-4o-mini": (500, 200000),
+    "gpt-3.5-turbo": (3500, 200000),
+    "dall-e-3": (5, None),
+    "dall-e-2": (50, None),
+}
+PRIORITIES = ("interactive", "batch")
+# Seconds of quota that may be spent in one burst
+BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "10"))
+MAX_RATE_LIMIT_RETRIES = int(os.getenv("MAX_RATE_LIMIT_RETRIES", "3"))
+# Reserved for the completion when a call does not set max_tokens; corrected from actual usage
+EXPECTED_COMPLETION_TOKENS = int(os.getenv("EXPECTED_COMPLETION_TOKENS", "400"))
+
+_caller = contextvars.ContextVar("scheduler_caller", default=("anonymous", "interactive"))
+
+
+def load_limits():
+    limits = dict(DEFAULT_LIMITS)
+    overrides = os.getenv("MODEL_RATE_LIMITS")
+    if overrides:
+        try:
+            for model, values in json.loads(overrides).items():
+                limits[model] = (values.get("rpm"), values.get("tpm"))
+        except (ValueError, AttributeError) as e:
+            print(f"⚠️ Ignoring invalid MODEL_RATE_LIMITS: {e}")
+    return limits
+
+
+def estimate_request_tokens(prompt, max_tokens=None):
+    """Tokens to reserve against the TPM bucket before a chat call is sent."""
+    return estimate_tokens(prompt) + (max_tokens or EXPECTED_COMPLETION_TOKENS)
+
+
+@contextlib.contextmanager
+def schedule_as(user, priority="interactive"):
+    """Attribute every model call made inside this block to `user` at `priority`."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{priority}', expected one of {PRIORITIES}")
+    token = _caller.set(((user or "anonymous").strip().lower(), priority))
+    try:
+        yield
+    finally:
+        _caller.reset(token)
+
+
+# -------------------------------
+# Token Buckets + AIMD
+# -------------------------------
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now, scale):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate * scale)
+        self.updated = now
+
+    def wait_time(self, amount, scale):
+        """Seconds until `amount` is available (requests larger than the burst wait for a full bucket)."""
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / (self.rate * scale)
+
+
+class ModelLimiter:
+    """RPM + TPM buckets for one model, with a send-rate multiplier driven by 429s."""
+
+    MIN_SCALE = 0.1
+    INCREASE = 0.02
+
+    def __init__(self, rpm=None, tpm=None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.scale = 1.0
+        self.paused_until = 0.0
+        self.rate_limited = 0
+
+    def wait_time(self, est_tokens, now):
+        wait = max(0.0, self.paused_until - now)
+        for bucket, amount in ((self.requests, 1), (self.tokens, est_tokens)):
+            if bucket is not None:
+                bucket.refill(now, self.scale)
+                wait = max(wait, bucket.wait_time(amount, self.scale))
+        return wait
+
+    def take(self, est_tokens):
+        if self.requests is not None:
+            self.requests.level -= 1
+        if self.tokens is not None:
+            self.tokens.level -= min(est_tokens, self.tokens.capacity)
+
+    def settle(self, est_tokens, actual_tokens):
+        # Correct the token bucket once the real usage is known (may go negative → later callers wait)
+        if self.tokens is not None and actual_tokens is not None:
+            self.tokens.level -= actual_tokens - min(est_tokens, self.tokens.capacity)
+
+    def on_success(self):
+        self.scale = min(1.0, self.scale + self.INCREASE)
+
+    def on_rate_limited(self, retry_after, now):
+        self.rate_limited += 1
+        self.scale = max(self.MIN_SCALE, self.scale / 2)
+        self.paused_until = max(self.paused_until, now + retry_after)
+
+
+# -------------------------------
+# Fair Queue
+# -------------------------------
+class FairQueue:
+    """Waiting calls by priority class, round-robin across users within a class."""
+
+    def __init__(self):
+        self._classes = {p: OrderedDict() for p in PRIORITIES}
+
+    def push(self, ticket):
+        users = self._classes[ticket.priority]
+        users.setdefault(ticket.user, deque()).append(ticket)
+
+    def head(self):
+        for users in self._classes.values():
+            if users:
+                return next(iter(users.values()))[0]
+        return None
+
+    def pop_head(self):
+        for users in self._classes.values():
+            if users:
+                user, tickets = next(iter(users.items()))
+                ticket = tickets.popleft()
+                del users[user]
+                if tickets:
+                    users[user] = tickets  # back of the rotation
+                return ticket
+        return None
+
+    def depth(self):
+        return {p: sum(len(t) for t in users.values()) for p, users in self._classes.items()}
+
+
+class _Ticket:
+    __slots__ = ("user", "priority", "est_tokens")
+
+    def __init__(self, user, priority, est_tokens):
+        self.user = user
+        self.priority = priority
+        self.est_tokens = est_tokens
+
+
+class Scheduler:
+    def __init__(self, limits=None):
+        self.limits = load_limits() if limits is None else limits
+        self._cond = threading.Condition()
+        self._limiters = {}
+        self._queues = {}
+        self.stats = {"granted": 0, "waited_s": 0.0, "rate_limited": 0}
+
+    def _limiter(self, model):
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            rpm, tpm = self._limits_for(model)
+            limiter = self._limiters[model] = ModelLimiter(rpm, tpm)
+            self._queues[model] = FairQueue()
+        return limiter
+
+    def _limits_for(self, model):
+        # Longest matching prefix, so "gpt-4o-mini-2024-07-18" uses the gpt-4o-mini limits
+        for name in sorted(self.limits, key=len, reverse=True):
+            if (model or "").startswith(name):
+                return self.limits[name]
+        return None, None
+
+    def acquire(self, model, est_tokens=0):
+        """Block until this caller may send a request to `model`; return seconds waited."""
+        user, priority = _caller.get()
+        ticket = _Ticket(user, priority, est_tokens)
+        start = time.monotonic()
+        with self._cond:
+            limiter = self._limiter(model)
+            queue = self._queues[model]
+            queue.push(ticket)
+            while True:
+                if queue.head() is ticket:
+                    wait = limiter.wait_time(est_tokens, time.monotonic())
+                    if wait <= 0:
+                        queue.pop_head()
+                        limiter.take(est_tokens)
+                        self.stats["granted"] += 1
+                        self._cond.notify_all()
+                        break
+                    self._cond.wait(timeout=wait)
+                else:
+                    self._cond.wait()
+            waited = time.monotonic() - start
+            self.stats["waited_s"] += waited
+        return waited
+
+    def try_acquire(self, model, est_tokens=0):
+        """Take capacity only if it is free right now and nobody is waiting (used for hedges)."""
+        with self._cond:
+            limiter = self._limiter(model)
+            if self._queues[model].head() is not None or limiter.wait_time(est_tokens, time.monotonic()) > 0:
+                return False
+            limiter.take(est_tokens)
+            self.stats["granted"] += 1
+            return True
+
+    def on_success(self, model, est_tokens=0, actual_tokens=None):
+        with self._cond:
+            limiter = self._limiter(model)
+            limiter.settle(est_tokens, actual_tokens)
+            limiter.on_success()
+
+    def on_rate_limited(self, model, retry_after=None):
+        with self._cond:
+            self._limiter(model).on_rate_limited(retry_after or 1.0, time.monotonic())
+            self.stats["rate_limited"] += 1
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            return {model: {"queued": self._queues[model].depth(), "scale": round(limiter.scale, 3),
+                            "rate_limited": limiter.rate_limited,
+                            "paused_s": round(max(0.0, limiter.paused_until - time.monotonic()), 2)}
+                    for model, limiter in self._limiters.items()}
+
+    def render_prometheus(self):
+        lines = ["# HELP genai_scheduler_queue_depth Model calls waiting for rate-limit capacity",
+                 "# TYPE genai_scheduler_queue_depth gauge"]
+        snapshot = self.snapshot()
+        for model, state in snapshot.items():
+            for priority, depth in state["queued"].items():
+                lines.append(f'genai_scheduler_queue_depth{{model="{model}",priority="{priority}"}} {depth}')
+        lines += ["# HELP genai_scheduler_rate_scale Current fraction of the configured rate limit in use",
+                  "# TYPE genai_scheduler_rate_scale gauge"]
+        lines += [f'genai_scheduler_rate_scale{{model="{m}"}} {s["scale"]}' for m, s in snapshot.items()]
+        lines += ["# HELP genai_scheduler_rate_limited_total 429 responses seen",
+                  "# TYPE genai_scheduler_rate_limited_total counter"]
+        lines += [f'genai_scheduler_rate_limited_total{{model="{m}"}} {s["rate_limited"]}'
+                  for m, s in snapshot.items()]
+        return lines
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide scheduler shared by every session, batch worker and app module."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+            register_gauge(_scheduler.render_prometheus)
+        return _scheduler
+
+
+# -------------------------------
+# Call Helpers
+# -------------------------------
+def is_rate_limited(error):
+    return getattr(error, "status_code", None) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def retry_after(error):
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Attempts:
+    """Retry bookkeeping shared by `call_model` and `stream_model` for one stage."""
+
+    def __init__(self, model, span):
+        self.model = model
+        self.span = span
+        self.breaker = get_breaker(model)
+        self.budget = timeout_for(span.stage if span is not None else None)
+        self.deadline = time.monotonic() + self.budget
+        self.rate_limited = 0
+        self.transient = 0
+
+    def admit(self, scheduler, est_tokens):
+        self.breaker.check()
+        waited = scheduler.acquire(self.model, est_tokens)
+        self.deadline += waited  # queueing for rate-limit capacity does not count against the deadline
+        if self.span is not None:
+            self.span.queue_s += waited
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+    def should_retry(self, scheduler, error):
+        """Record a failed attempt; True if it should be retried (after any backoff)."""
+        if is_rate_limited(error):
+            self.breaker.record_success()  # the provider answered
+            if self.rate_limited == MAX_RATE_LIMIT_RETRIES:
+                return False
+            scheduler.on_rate_limited(self.model, retry_after(error) or 2 ** self.rate_limited)
+            self.rate_limited += 1
+        elif is_transient(error):
+            self.breaker.record_failure()
+            delay = backoff(self.transient)
+            if self.transient == MAX_RETRIES or isinstance(error, DeadlineExceeded) or delay >= self.remaining():
+                return False
+            self.transient += 1
+            time.sleep(delay)
+        else:
+            self.breaker.record_success()  # e.g. a 400: the provider is healthy, the request is not
+            return False
+        if self.span is not None:
+            self.span.retries += 1
+        return True
+
+
+def call_model(model, fn, /, *args, est_tokens=0, **kwargs):
+    """Run `fn(*args, **kwargs)` once the scheduler admits it.
+
+    429s back off and requeue. Transient failures are retried with jittered
+    backoff within the stage deadline, slow text calls may be hedged, and an
+    open circuit fails fast with ProviderUnavailable (see resilience.py).
+    """
+    scheduler = get_scheduler()
+    span = current_span()
+    attempts = _Attempts(model, span)
+
+    def hedge():
+        # A duplicate is a real request: an open (or probing) circuit gets none
+        try:
+            attempts.breaker.check()
+        except ProviderUnavailable:
+            return False
+        if not scheduler.try_acquire(model, est_tokens):
+            return False
+        if span is not None:
+            span.hedges += 1
+        return True
+
+    while True:
+        attempts.admit(scheduler, est_tokens)
+        try:
+            result = run_with_deadline(fn, args, kwargs, max(0.0, attempts.remaining()), hedge_delay(span), hedge)
+        except Exception as e:
+            if not attempts.should_retry(scheduler, e):
+                raise
+            continue
+        attempts.breaker.record_success()
+        usage = usage_tokens(result)
+        scheduler.on_success(model, est_tokens, sum(usage) if usage else None)
+        return result
+
+
+def stream_model(model, fn, /, *args, est_tokens=0, **kwargs):
+    """Streaming variant of `call_model`: failures before the first chunk are retried.
+
+    The stage deadline bounds the wait for the first chunk; after that the
+    stream may not stall for longer than the stage deadline between chunks.
+    The TPM bucket is settled against the usage the final chunk reports.
+    """
+    scheduler = get_scheduler()
+    span = current_span()
+    attempts = _Attempts(model, span)
+    while True:
+        attempts.admit(scheduler, est_tokens)
+        started, usage = False, None
+        try:
+            for chunk in iter_with_deadline(lambda: fn(*args, **kwargs), max(0.0, attempts.remaining()),
+                                            attempts.budget):
+                if not started:
+                    started = True
+                    attempts.breaker.record_success()
+                usage = usage_tokens(chunk) or usage
+                yield chunk
+        except Exception as e:
+            if started or not attempts.should_retry(scheduler, e):
+                raise
+            continue
+        scheduler.on_success(model, est_tokens, sum(usage) if usage else None)
+        return
@@ -0,0 +1,418 @@
+# shared/telemetry.py – per-stage latency, token and cost instrumentation
+#
+#   with request_trace("mvp3") as trace:          # one per user request / review
+#       with stage("rewrite", model="gpt-4") as span:
+#           response = llm.invoke(prompt)
+#           span.record_usage(response)
+#
+# Finished spans feed rolling p50/p95/p99 summaries per (app, stage). Set
+# METRICS_FILE to write them to a JSON file every METRICS_INTERVAL seconds and
+# METRICS_PORT to serve them as Prometheus text at http://host:port/metrics.
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# USD per 1K prompt / completion tokens, and per generated image
+TOKEN_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+IMAGE_PRICES = {"dall-e-3": 0.04, "dall-e-2": 0.02}
+
+WINDOW = int(os.getenv("METRICS_WINDOW", "1000"))
+METRICS_FILE = os.getenv("METRICS_FILE")
+METRICS_PORT = os.getenv("METRICS_PORT")
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "10"))
+
+_trace_var = contextvars.ContextVar("telemetry_trace", default=None)
+_span_var = contextvars.ContextVar("telemetry_span", default=None)
+
+
+def estimate_cost(model, prompt_tokens=0, completion_tokens=0, images=0):
+    model = (model or "").lower()
+    if images:
+        return images * IMAGE_PRICES.get(model, 0.0)
+    # Longest matching prefix, so "gpt-4o-mini-2024-07-18" prices as gpt-4o-mini
+    for name in sorted(TOKEN_PRICES, key=len, reverse=True):
+        if model.startswith(name):
+            prompt_price, completion_price = TOKEN_PRICES[name]
+            return prompt_tokens / 1000 * prompt_price + completion_tokens / 1000 * completion_price
+    return 0.0
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) for streamed output without usage data."""
+    return max(1, len(text or "") // 4)
+
+
+def usage_tokens(response):
+    """`(prompt_tokens, completion_tokens)` reported by an OpenAI response or LangChain message, or None."""
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        return usage.prompt_tokens or 0, usage.completion_tokens or 0
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage")
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+    return None
+
+
+# -------------------------------
+# Spans and Traces
+# -------------------------------
+class Span:
+    """One model call (or cache lookup) inside a request."""
+
+    def __init__(self, stage, model=None, app=None):
+        self.stage = stage
+        self.model = model
+        self.app = app
+        self.started = time.time()
+        self.wall_s = 0.0
+        self.queue_s = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tokens_estimated = False
+        self.images = 0
+        self.retries = 0
+        self.hedges = 0
+        self.cache_hit = False
+        self.error = None
+
+    @property
+    def cost_usd(self):
+        if self.cache_hit:
+            return 0.0
+        return estimate_cost(self.model, self.prompt_tokens, self.completion_tokens, self.images)
+
+    def record_usage(self, response):
+        """Copy token usage from an OpenAI response or a LangChain message; False if none."""
+        usage = usage_tokens(response)
+        if usage is None:
+            return False
+        self.prompt_tokens += usage[0]
+        self.completion_tokens += usage[1]
+        return True
+
+    def estimate_usage(self, prompt, completion):
+        """Fallback for streamed output where the API did not report usage."""
+        self.prompt_tokens += estimate_tokens(prompt)
+        self.completion_tokens += estimate_tokens(completion)
+        self.tokens_estimated = True
+
+    def to_dict(self):
+        return {
+            "stage": self.stage,
+            "model": self.model,
+            "wall_s": round(self.wall_s, 4),
+            "queue_s": round(self.queue_s, 4),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tokens_estimated": self.tokens_estimated,
+            "cost_usd": round(self.cost_usd, 6),
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "cache_hit": self.cache_hit,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """All spans recorded for one request (one Streamlit action or one batch review)."""
+
+    def __init__(self, app, request_id=None, queue_s=0.0):
+        self.app = app
+        self.request_id = request_id or uuid.uuid4().hex[:12]
+        self.queue_s = queue_s
+        self.started = time.time()
+        self.wall_s = 0.0
+        self.spans = []
+
+    def to_dict(self):
+        return {
+            "request_id": self.request_id,
+            "app": self.app,
+            "started": self.started,
+            "wall_s": round(self.wall_s, 4),
+            "queue_s": round(self.queue_s, 4),
+            "cost_usd": round(sum(s.cost_usd for s in self.spans), 6),
+            "retries": sum(s.retries for s in self.spans),
+            "hedges": sum(s.hedges for s in self.spans),
+            "spans": [s.to_dict() for s in self.spans],
+        }
+
+
+def current_span():
+    return _span_var.get()
+
+
+def current_trace():
+    return _trace_var.get()
+
+
+@contextlib.contextmanager
+def request_trace(app, request_id=None, queue_s=0.0, current=True):
+    """Group every stage run inside this block into one per-request trace.
+
+    Generators pass `current=False` and install the trace with `streamed()` /
+    `activate()` instead, so it never leaks into the caller between yields.
+    """
+    trace = Trace(app, request_id, queue_s)
+    token = _trace_var.set(trace) if current else None
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.wall_s = time.perf_counter() - start
+        if token is not None:
+            _trace_var.reset(token)
+        if trace.spans:  # e.g. a rerun that reused earlier results made no model calls
+            get_registry().observe_trace(trace)
+
+
+@contextlib.contextmanager
+def stage(name, model=None, current=True):
+    """Time one model call; the yielded span collects usage, cache and retry details.
+
+    `current=False` times the span without making it current (see `streamed()`).
+    """
+    trace = _trace_var.get()
+    span = Span(name, model, trace.app if trace else None)
+    token = _span_var.set(span) if current else None
+    start = time.perf_counter()
+    try:
+        yield span
+    except Exception as e:
+        span.error = type(e).__name__
+        raise
+    finally:
+        span.wall_s = time.perf_counter() - start
+        if token is not None:
+            _span_var.reset(token)
+        if trace is not None:
+            trace.spans.append(span)
+        get_registry().observe_span(span)
+
+
+@contextlib.contextmanager
+def activate(span=None, trace=None):
+    """Make `span` and/or `trace` current for the duration of the block."""
+    trace_token = _trace_var.set(trace) if trace is not None else None
+    span_token = _span_var.set(span) if span is not None else None
+    try:
+        yield
+    finally:
+        if span_token is not None:
+            _span_var.reset(span_token)
+        if trace_token is not None:
+            _trace_var.reset(trace_token)
+
+
+def streamed(items, span=None, trace=None):
+    """Iterate `items` with `span`/`trace` current only while each item is produced.
+
+    A generator that keeps a stage open across `yield` leaks it into whatever
+    the caller runs between items, and can't reset it if closed elsewhere:
+
+        with stage("rewrite", current=False) as span:
+            yield from streamed(llm.stream(prompt), span=span)
+    """
+    iterator = iter(items)
+    try:
+        while True:
+            with activate(span, trace):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            with activate(span, trace):
+                close()
+
+
+# -------------------------------
+# Rolling Summaries + Exporters
+# -------------------------------
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class MetricsRegistry:
+    def __init__(self, window=WINDOW, keep_traces=50):
+        self.window = window
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._queue = {}
+        self._service = {}
+        self._totals = {}
+        self.traces = deque(maxlen=keep_traces)
+        self._exporters_started = False
+
+    def observe_span(self, span):
+        key = (span.app or "default", span.stage)
+        with self._lock:
+            self._latency.setdefault(key, deque(maxlen=self.window)).append(span.wall_s)
+            self._queue.setdefault(key, deque(maxlen=self.window)).append(span.queue_s)
+            if not span.cache_hit and not span.error:
+                self._service.setdefault(key, deque(maxlen=self.window)).append(span.wall_s - span.queue_s)
+            totals = self._totals.setdefault(key, {
+                "calls": 0, "errors": 0, "cache_hits": 0, "retries": 0, "hedges": 0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "model": span.model,
+            })
+            totals["calls"] += 1
+            totals["errors"] += 1 if span.error else 0
+            totals["cache_hits"] += 1 if span.cache_hit else 0
+            totals["retries"] += span.retries
+            totals["hedges"] += span.hedges
+            totals["prompt_tokens"] += span.prompt_tokens
+            totals["completion_tokens"] += span.completion_tokens
+            totals["cost_usd"] += span.cost_usd
+            totals["model"] = span.model or totals["model"]
+        self._start_exporters()
+
+    def observe_trace(self, trace):
+        with self._lock:
+            self.traces.append(trace.to_dict())
+
+    def summary(self):
+        """Per (app, stage) totals plus rolling-window latency percentiles."""
+        with self._lock:
+            out = []
+            for key, totals in self._totals.items():
+                latency = sorted(self._latency[key])
+                queue = sorted(self._queue[key])
+                out.append({
+                    "app": key[0],
+                    "stage": key[1],
+                    **totals,
+                    "cost_usd": round(totals["cost_usd"], 6),
+                    "p50_s": round(_percentile(latency, 0.50), 4),
+                    "p95_s": round(_percentile(latency, 0.95), 4),
+                    "p99_s": round(_percentile(latency, 0.99), 4),
+                    "queue_p95_s": round(_percentile(queue, 0.95), 4),
+                })
+            return sorted(out, key=lambda r: (r["app"], r["stage"]))
+
+    def stage_percentile(self, app, stage_name, q, min_samples=1):
+        """Percentile of a stage's model-call time (queue wait and cache hits excluded); None until `min_samples`."""
+        with self._lock:
+            values = sorted(self._service.get((app or "default", stage_name), ()))
+        return _percentile(values, q) if len(values) >= min_samples else None
+
+    def write_metrics_file(self, path):
+        payload = {"generated": time.time(), "stages": self.summary(), "recent_traces": list(self.traces)[-10:]}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def render_prometheus(self):
+        lines = []
+        rows = self.summary()
+        metrics = [
+            ("genai_stage_calls_total", "counter", "Model calls per stage", "calls"),
+            ("genai_stage_errors_total", "counter", "Failed model calls per stage", "errors"),
+            ("genai_stage_cache_hits_total", "counter", "Calls served from cache", "cache_hits"),
+            ("genai_stage_retries_total", "counter", "Retries per stage", "retries"),
+            ("genai_stage_hedges_total", "counter", "Hedged duplicate requests per stage", "hedges"),
+            ("genai_stage_prompt_tokens_total", "counter", "Prompt tokens", "prompt_tokens"),
+            ("genai_stage_completion_tokens_total", "counter", "Completion tokens", "completion_tokens"),
+            ("genai_stage_cost_usd_total", "counter", "Estimated cost in USD", "cost_usd"),
+        ]
+        for metric, kind, help_text, field in metrics:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            for r in rows:
+                lines.append(f'{metric}{{app="{r["app"]}",stage="{r["stage"]}"}} {r[field]}')
+        lines += ["# HELP genai_stage_latency_seconds Rolling-window wall time per stage",
+                  "# TYPE genai_stage_latency_seconds summary"]
+        for r in rows:
+            for q, field in (("0.5", "p50_s"), ("0.95", "p95_s"), ("0.99", "p99_s")):
+                lines.append(f'genai_stage_latency_seconds{{app="{r["app"]}",stage="{r["stage"]}",'
+                             f'quantile="{q}"}} {r[field]}')
+        for gauge in _gauges:
+            lines += gauge()
+        return "\n".join(lines) + "\n"
+
+    def _start_exporters(self):
+        if self._exporters_started or not (METRICS_FILE or METRICS_PORT):
+            return
+        self._exporters_started = True
+        if METRICS_PORT:
+            start_metrics_server(int(METRICS_PORT))
+        if METRICS_FILE:
+            def write_loop():
+                while True:
+                    time.sleep(METRICS_INTERVAL)
+                    try:
+                        self.write_metrics_file(METRICS_FILE)
+                    except OSError as e:
+                        print(f"⚠️ Couldn't write metrics file: {e}")
+            threading.Thread(target=write_loop, name="metrics-file-writer", daemon=True).start()
+
+
+# Extra Prometheus lines contributed by other shared modules (queue depths, pools, …)
+_gauges = []
+
+
+def register_gauge(render_lines):
+    """Register a callable returning extra Prometheus text lines for /metrics."""
+    _gauges.append(render_lines)
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry():
+    return _registry
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port):
+    """Serve Prometheus text at /metrics from a daemon thread (once per process)."""
+    global _server
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = get_registry().render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+            except OSError as e:
+                # Another Streamlit process already owns the port
+                print(f"⚠️ Metrics endpoint not started on :{port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
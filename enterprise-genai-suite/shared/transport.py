@@ -0,0 +1,194 @@
+# shared/transport.py – one pooled, keep-alive HTTP client under every model client
+#
+# `get_openai_client()` and every `get_chat_model(...)` in clients.py are built
+# on the same httpx.Client, so all sessions, agents and models in a process
+# share one connection pool (and one TLS handshake per connection) instead of
+# each SDK client keeping its own. HTTP/2 is used when the `h2` package is
+# installed: many concurrent calls then multiplex over a few connections.
+# Requests in flight, connections opened and the pool's active/idle
+# connections are exported on /metrics.
+#
+# Tuning: HTTP_MAX_CONNECTIONS (64), HTTP_MAX_KEEPALIVE (32), HTTP_KEEPALIVE_EXPIRY (90 s).
+import functools
+import importlib.util
+import os
+import threading
+import weakref
+
+from shared.telemetry import register_gauge
+
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "64"))
+MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "32"))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "90"))
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+# Default read timeout; the SDKs pass their own per request
+READ_TIMEOUT = float(os.getenv("MODEL_CLIENT_TIMEOUT", "180"))
+HTTP2 = os.getenv("HTTP2", "auto").lower()
+
+stats = {"requests": 0, "in_flight": 0, "peak_in_flight": 0, "connections_opened": 0}
+_stats_lock = threading.Lock()
+_transports = []
+SSE_DONE = b"data: [DONE]\n\n"
+# Most bytes read after [DONE] to put an HTTP/1.1 connection back in the pool
+DRAIN_LIMIT = 1024
+
+
+def http2_enabled():
+    if HTTP2 in ("0", "off", "false", "no"):
+        return False
+    return importlib.util.find_spec("h2") is not None
+
+
+def _metered_transport_class():
+    import httpx
+
+    class MeteredTransport(httpx.HTTPTransport):
+        """HTTPTransport that counts requests in flight and the connections they use.
+
+        Connections are told apart by the `network_stream` response extension
+        (one per TCP + TLS connection, shared by HTTP/2 streams), so no httpx
+        internals are read. A connection drops out of the count once its
+        socket is closed or the object is freed.
+        """
+
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self._connections = weakref.WeakKeyDictionary()  # network stream -> responses open on it
+
+        def handle_request(self, request):
+            with _stats_lock:
+                stats["requests"] += 1
+                stats["in_flight"] += 1
+                stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+            try:
+                response = super().handle_request(request)
+            except BaseException:
+                _finished()
+                raise
+            connection = response.extensions.get("network_stream")
+            if connection is not None:
+                with _stats_lock:
+                    if connection not in self._connections:
+                        self._connections[connection] = 0
+                        stats["connections_opened"] += 1
+                    self._connections[connection] += 1
+            # Streamed bodies (SSE) hold their connection until closed
+            http11 = response.extensions.get("http_version") == b"HTTP/1.1"
+            response.stream = _ClosingStream(response.stream, self._connections, connection, http11)
+            return response
+
+        def connection_counts(self):
+            """`(active, idle)`: open connections with and without a response open on them."""
+            active = idle = 0
+            with _stats_lock:
+                for connection, open_responses in list(self._connections.items()):
+                    sock = connection.get_extra_info("socket")
+                    if sock is not None and sock.fileno() == -1:
+                        del self._connections[connection]  # closed by the pool
+                    elif open_responses > 0:
+                        active += 1
+                    else:
+                        idle += 1
+            return active, idle
+
+    class _ClosingStream(httpx.SyncByteStream):
+        def __init__(self, stream, connections, connection, http11):
+            self._stream = stream
+            self._connections = connections
+            self._connection = connection
+            self._http11 = http11
+            self._closed = False
+            self._exhausted = False
+            self._tail = b""
+
+        def __iter__(self):
+            for chunk in self._stream:
+                self._tail = (self._tail + chunk)[-len(SSE_DONE):]
+                yield chunk
+            self._exhausted = True
+
+        def close(self):
+            if not self._closed:
+                self._closed = True
+                _finished()
+                if self._connection is not None:
+                    with _stats_lock:
+                        if self._connection in self._connections:
+                            self._connections[self._connection] -= 1
+                    self._connection = None
+                # The OpenAI SDK's sync Stream closes the response as soon as it sees
+                # [DONE]. On HTTP/1.1 the connection is only pooled again once the
+                # rest of the body (the chunked terminator) is read, so read that
+                # here, as the SDK's async Stream does, instead of reconnecting.
+                if self._http11 and not self._exhausted and self._tail.endswith(SSE_DONE):
+                    self._drain()
+            self._stream.close()
+
+        def _drain(self):
+            read = 0
+            try:
+                for chunk in self._stream:
+                    read += len(chunk)
+                    if read > DRAIN_LIMIT:
+                        break  # more than a terminator: let httpx close the connection
+            except Exception:
+                pass
+
+    return MeteredTransport
+
+
+def _finished():
+    with _stats_lock:
+        stats["in_flight"] -= 1
+
+
+@functools.lru_cache(maxsize=None)
+def get_http_client():
+    """Process-wide pooled `httpx.Client` shared by the OpenAI and LangChain clients."""
+    import httpx
+    transport = _metered_transport_class()(
+        http2=http2_enabled(),
+        limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE,
+                            keepalive_expiry=KEEPALIVE_EXPIRY),
+    )
+    if not _transports:
+        register_gauge(_render_metrics)
+    _transports.append(transport)
+    return httpx.Client(transport=transport, timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT))
+
+
+def pool_snapshot():
+    """Requests and connection counts for the shared pool(s)."""
+    active = idle = 0
+    for transport in _transports:
+        transport_active, transport_idle = transport.connection_counts()
+        active += transport_active
+        idle += transport_idle
+    with _stats_lock:
+        return {**stats, "active_connections": active, "idle_connections": idle,
+                "max_connections": MAX_CONNECTIONS, "http2": http2_enabled()}
+
+
+def _render_metrics():
+    snapshot = pool_snapshot()
+    return [
+        "# HELP genai_http_requests_in_flight Model API requests currently using a pooled connection",
+        "# TYPE genai_http_requests_in_flight gauge",
+        f"genai_http_requests_in_flight {snapshot['in_flight']}",
+        "# HELP genai_http_requests_in_flight_peak Most requests in flight at once",
+        "# TYPE genai_http_requests_in_flight_peak gauge",
+        f"genai_http_requests_in_flight_peak {snapshot['peak_in_flight']}",
+        "# HELP genai_http_requests_total Model API requests sent through the shared pool",
+        "# TYPE genai_http_requests_total counter",
+        f"genai_http_requests_total {snapshot['requests']}",
+        "# HELP genai_http_connections_opened_total New connections (TCP + TLS handshakes) opened by the pool",
+        "# TYPE genai_http_connections_opened_total counter",
+        f"genai_http_connections_opened_total {snapshot['connections_opened']}",
+        "# HELP genai_http_pool_connections Pooled connections by state",
+        "# TYPE genai_http_pool_connections gauge",
+        f'genai_http_pool_connections{{state="active"}} {snapshot["active_connections"]}',
+        f'genai_http_pool_connections{{state="idle"}} {snapshot["idle_connections"]}',
+        "# HELP genai_http_pool_utilization Active connections as a fraction of HTTP_MAX_CONNECTIONS",
+        "# TYPE genai_http_pool_utilization gauge",
+        f"genai_http_pool_utilization {snapshot['active_connections'] / MAX_CONNECTIONS:.4f}",
+    ]
@@ -0,0 +1,10 @@
+# Unit tests for the shared infrastructure and the mvp3 pure logic.
+#
+#   cd enterprise-genai-suite && python -m pytest -q tests
+#
+# No model calls are made: providers are replaced by small fakes in each test.
+import os
+import sys
+
+SUITE = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path[:0] = [SUITE, os.path.join(SUITE, "mvp3-mcp-review-rewriter")]
@@ -0,0 +1,40 @@
+import os
+import urllib.error
+import urllib.request
+
+import pytest
+
+from shared import downloads
+
+
+def write_rows(count):
+    def write(out):
+        for i in range(count):
+            out.write(f"2026-10-18,alice,prompt {i}\r\n")
+        return count
+    return write
+
+
+def test_link_streams_the_export_once(monkeypatch):
+    server = downloads.start_download_server(0)
+    monkeypatch.setattr(downloads, "EXPORT_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    url = downloads.offer_download(write_rows(3), "alice log.csv")
+
+    with urllib.request.urlopen(url, timeout=5) as response:
+        assert response.headers["Content-Disposition"] == "attachment; filename*=UTF-8''alice%20log.csv"
+        assert response.read().decode("utf-8").splitlines() == [f"2026-10-18,alice,prompt {i}" for i in range(3)]
+    with pytest.raises(urllib.error.HTTPError):
+        urllib.request.urlopen(url, timeout=5)
+
+
+def test_expired_links_are_refused():
+    url = downloads.offer_download(write_rows(1), "x.csv", ttl=-1)
+    assert downloads._take(url.rsplit("/", 1)[1]) is None
+
+
+def test_spool_stops_at_the_size_cap():
+    path = downloads.spool(write_rows(10), max_bytes=1000)
+    assert os.path.getsize(path) > 0
+    os.remove(path)
+    with pytest.raises(downloads.ExportTooLarge):
+        downloads.spool(write_rows(1000), max_bytes=1000)
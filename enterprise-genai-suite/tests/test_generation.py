@@ -0,0 +1,114 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pytest
+
+# Appended, not prepended: mvp1's module names must not shadow mvp3's
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "mvp1-multi-modal-content-generator"))
+
+import generation  # noqa: E402
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Stub providers: each call is recorded, and blocks until `release` is set."""
+    calls = {"image": [], "caption": [], "release": threading.Event(), "fail": set()}
+    calls["release"].set()
+
+    def get_image(prompt):
+        calls["image"].append(prompt)
+        calls["release"].wait(5)
+        if "image" in calls["fail"]:
+            raise RuntimeError("image failed")
+        return f"/assets/{len(calls['image'])}.png"
+
+    def stream_caption(prompt):
+        calls["caption"].append(prompt)
+        calls["release"].wait(5)
+        if "caption" in calls["fail"]:
+            raise RuntimeError("caption failed")
+        yield from ("Cozy ", "oak ", "kitchen")
+
+    monkeypatch.setattr(generation, "get_image", get_image)
+    monkeypatch.setattr(generation, "stream_caption", stream_caption)
+    monkeypatch.setattr(generation, "_jobs", OrderedDict())
+    monkeypatch.setattr(generation, "stats", {"generations": 0, "duplicates_avoided": 0})
+    return calls
+
+
+def finish(job):
+    return list(job.iter_events())
+
+
+def test_reruns_attach_to_the_running_job(calls):
+    calls["release"].clear()
+    job, is_new = generation.get_generation("Ann", "Cozy oak kitchen", "A", "caption please")
+    again, again_new = generation.get_generation(" ann ", "cozy  OAK kitchen.", "A", "caption please")
+    assert (is_new, again_new) == (True, False)
+    assert again is job
+    other, other_new = generation.get_generation("ann", "Cozy oak kitchen", "B", "caption please")
+    assert other_new and other is not job
+
+    calls["release"].set()
+    events = finish(job)
+    assert ("image", job.image_path) in events
+    assert "".join(p for e, p in events if e == "caption") == "Cozy oak kitchen"
+    assert finish(again) == events  # a late reader replays the same output
+    finish(other)
+    assert len(calls["image"]) == 2
+    assert generation.stats == {"generations": 2, "duplicates_avoided": 1}
+
+
+@pytest.mark.parametrize("part", ["image", "caption"])
+def test_failed_jobs_are_retried_once_finished(calls, part):
+    calls["fail"].add(part)
+    calls["release"].clear()
+    job, _ = generation.get_generation("ann", "dark den", "A", "c")
+    assert generation.get_generation("ann", "dark den", "A", "c") == (job, False)  # still running: shared
+
+    calls["release"].set()
+    assert [e for e, _ in finish(job) if e.endswith("_error")] == [f"{part}_error"]
+    assert job.done and job.failed
+
+    calls["fail"].clear()
+    retry, is_new = generation.get_generation("ann", "dark den", "A", "c")
+    assert is_new and retry is not job
+    finish(retry)
+    assert not retry.failed
+    assert generation.get_generation("ann", "dark den", "A", "c") == (retry, False)
+
+
+def test_oldest_jobs_are_evicted_past_max_jobs(calls, monkeypatch):
+    monkeypatch.setattr(generation, "MAX_JOBS", 2)
+    first, _ = generation.get_generation("ann", "one", "A", "c")
+    second, _ = generation.get_generation("ann", "two", "A", "c")
+    assert generation.get_generation("ann", "one", "A", "c") == (first, False)  # now the most recent
+    generation.get_generation("ann", "three", "A", "c")
+
+    assert list(generation._jobs) == [generation.job_key("ann", p, "A") for p in ("one", "three")]
+    again, is_new = generation.get_generation("ann", "two", "A", "c")
+    assert is_new and again is not second
+    for job in list(generation._jobs.values()) + [second]:
+        finish(job)
+
+
+def test_on_complete_runs_once_after_both_parts(calls):
+    completed = []
+    called = threading.Event()
+    calls["release"].clear()
+
+    def on_complete(job):
+        completed.append((job, job.image_path, job.caption))
+        called.set()
+
+    job, _ = generation.get_generation("ann", "sunlit patio", "A", "c", on_complete=on_complete)
+    generation.get_generation("ann", "sunlit patio", "A", "c", on_complete=on_complete)
+    calls["release"].set()
+    finish(job)
+    # The hook runs on the worker that finished last, just after readers are released
+    assert called.wait(5)
+    generation.get_generation("ann", "sunlit patio", "A", "c", on_complete=on_complete)
+    assert completed == [(job, job.image_path, "Cozy oak kitchen")]
+
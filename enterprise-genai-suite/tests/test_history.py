@@ -0,0 +1,119 @@
+import csv
+import os
+
+import pytest
+
+from shared import history
+from shared.history import HistoryIndex
+
+HEADER = ["timestamp", "user", "prompt"]
+
+
+def write_log(path, rows, mode="w"):
+    with open(path, mode, newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        if mode == "w":
+            writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+def expected(rows, user, limit):
+    return [dict(zip(HEADER, row)) for row in reversed(rows) if row[1].lower() == user][:limit]
+
+
+def log_rows(count, users=("alice", "bob", "carol")):
+    return [[f"2026-10-18 10:{i // 60:02d}:{i % 60:02d}", users[i % len(users)], f"prompt {i} " + "x" * (i % 7)]
+            for i in range(count)]
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(history, "BLOCK_SIZE", 50)  # rows are ~40 bytes: most straddle a block boundary
+
+
+def test_rows_spanning_block_boundaries(tmp_path, small_blocks):
+    path = tmp_path / "sessions.csv"
+    rows = log_rows(200)
+    write_log(path, rows)
+    scans = []
+    index = HistoryIndex(str(path))
+    original = index._scan_all
+    index._scan_all = lambda *a: scans.append(a) or original(*a)
+
+    for user in ("alice", "bob", "carol"):
+        assert index.recent(user.upper(), 5) == expected(rows, user, 5)
+    assert index.recent("alice", 50) == expected(rows, "alice", 50)  # deeper than the index: uncached scan
+    assert index.recent("nobody", 3) == []
+    assert scans == []  # the backward scan handled every boundary itself
+
+
+def test_quoted_newlines_fall_back_to_a_forward_scan(tmp_path, small_blocks):
+    path = tmp_path / "sessions.csv"
+    rows = log_rows(30)
+    rows[-2][2] = "first line\nsecond line, with \"quotes\""
+    rows[-5][2] = "ends with a newline\n"
+    write_log(path, rows)
+
+    index = HistoryIndex(str(path))
+    assert index.recent("carol", 3) == expected(rows, "carol", 3)
+    assert index.recent("alice", 3) == expected(rows, "alice", 3)
+    assert index.recent("bob", 20) == expected(rows, "bob", 20)
+
+
+def test_appended_rows_update_the_index_without_a_rescan(tmp_path, small_blocks):
+    path = tmp_path / "sessions.csv"
+    rows = log_rows(40)
+    write_log(path, rows)
+    index = HistoryIndex(str(path))
+    assert index.recent("alice", 3) == expected(rows, "alice", 3)
+
+    def no_rescan(*args):
+        raise AssertionError("primed users must not be scanned again")
+
+    index._scan_backward = index._scan_all = no_rescan
+    more = [["2026-10-18 11:00:00", "Alice", "appended by another process"],
+            ["2026-10-18 11:00:01", "bob", "multi\nline"]]
+    write_log(path, more, mode="a")
+    assert index.recent("alice", 2) == expected(rows + more, "alice", 2)
+    assert index.covered_to == os.path.getsize(path)
+
+    # A writer that reports its own append (CsvLog does) moves the index along directly
+    offset = os.path.getsize(path)
+    write_log(path, [["2026-10-18 11:00:02", "alice", "noted"]], mode="a")
+    index.note_append("alice", offset, os.path.getsize(path))
+    index._scan_forward = no_rescan
+    assert index.recent("alice", 1)[0]["prompt"] == "noted"
+
+
+def test_partially_written_row_is_picked_up_once_complete(tmp_path):
+    path = tmp_path / "sessions.csv"
+    write_log(path, log_rows(6))
+    index = HistoryIndex(str(path))
+    index.recent("alice", 1)
+    with open(path, "ab") as f:
+        f.write(b'"2026-10-18 11:00:00","alice","half')
+    assert index.recent("alice", 1)[0]["prompt"] != "half"
+    with open(path, "ab") as f:
+        f.write(b' done"\r\n')
+    assert index.recent("alice", 1)[0]["prompt"] == "half done"
+
+
+def test_rotated_or_truncated_file_resets_the_index(tmp_path):
+    path = tmp_path / "sessions.csv"
+    write_log(path, log_rows(30))
+    index = HistoryIndex(str(path))
+    assert len(index.recent("alice", 3)) == 3
+
+    # Rotation: the live file is renamed away and a new one is started
+    os.replace(path, tmp_path / "sessions.csv.1")
+    fresh = [["2026-10-18 12:00:00", "alice", "after rotation"]]
+    write_log(path, fresh)
+    assert index.recent("alice", 3) == expected(fresh, "alice", 3)
+    assert index.recent("bob", 3) == []
+
+    # Truncated in place (same inode, smaller size)
+    write_log(path, [])
+    assert index.recent("alice", 3) == []
+
+    os.remove(path)
+    assert index.recent("alice", 3) == []
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import pytest
+
+from llm_cache import CachedLLM, LLMCache, bypass_cache
+from shared import scheduler
+from shared.resilience import ProviderUnavailable
+from shared.scheduler import Scheduler
+
+
+class FakeChatModel:
+    """Answers every prompt with a LangChain-style message, or raises `error`."""
+
+    model_name = "m"
+    temperature = 0
+    max_tokens = None
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(content=f"answer to {prompt}", usage_metadata={"input_tokens": 5, "output_tokens": 3})
+
+
+@pytest.fixture(autouse=True)
+def sched(monkeypatch):
+    monkeypatch.setattr(scheduler, "_scheduler", Scheduler(limits={"m": (600, 60000)}))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMCache(path=str(tmp_path / "llm_cache.sqlite"))
+
+
+def test_invoke_returns_text_on_miss_and_hit(cache):
+    model = FakeChatModel()
+    llm = CachedLLM(model, cache=cache)
+    assert llm.invoke("hi") == "answer to hi"
+    assert llm.invoke("hi") == "answer to hi"
+    assert model.calls == 1
+    assert cache.stats["memory_hits"] == 1
+
+
+def test_invoke_returns_text_when_the_cache_is_bypassed(cache):
+    model = FakeChatModel()
+    llm = CachedLLM(model, cache=cache)
+    with bypass_cache():
+        assert llm.invoke("hi") == "answer to hi"
+    assert llm.invoke("hi", use_cache=False) == "answer to hi"
+    assert CachedLLM(model, enabled=False).invoke("hi") == "answer to hi"
+    assert model.calls == 3
+
+
+def test_invoke_serves_stale_text_while_the_provider_is_down(cache):
+    llm = CachedLLM(FakeChatModel(), cache=cache)
+    llm.invoke("hi")
+    llm.llm = FakeChatModel(error=ProviderUnavailable("circuit open"))
+    assert llm.invoke("hi", use_cache=False) == "answer to hi"
+    assert cache.stats["stale_hits"] == 1
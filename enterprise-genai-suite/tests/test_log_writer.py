@@ -0,0 +1,116 @@
+import csv
+import io
+import os
+
+import pytest
+
+from shared.history import HistoryIndex, get_history
+from shared.log_writer import CsvLog
+
+HEADER = ["timestamp", "user", "prompt"]
+
+
+@pytest.fixture
+def log(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the archive lives next to the log
+    log = CsvLog("sessions.csv", HEADER)
+    log.archive.rotate_bytes = 300
+    yield log
+    log.writer.close()
+
+
+def write(log, rows):
+    for row in rows:
+        log.append(row)
+        log.writer.flush()  # one batch per row, so rotation is checked between rows
+
+
+def rows_for(user, start, count):
+    return [[f"2026-10-18 10:{i:02d}:00", user, f"{user}-{i}"] for i in range(start, start + count)]
+
+
+def test_recent_reads_across_rotation(log):
+    write(log, rows_for("alice", 0, 12) + rows_for("bob", 0, 2))
+    log.archive.archive_rotated()
+    assert log.archive.stats["rotations"] >= 1
+
+    assert [r["prompt"] for r in log.recent("alice", 3)] == ["alice-11", "alice-10", "alice-9"]
+    assert [r["prompt"] for r in log.recent("ALICE ", 20)] == [f"alice-{i}" for i in range(11, -1, -1)]
+    assert [r["prompt"] for r in log.recent("bob", 3)] == ["bob-1", "bob-0"]
+    assert log.recent("nobody", 3) == []
+
+
+def test_queued_rows_come_first(log):
+    write(log, rows_for("alice", 0, 12))
+    log.append(["2026-10-18 11:00:00", "alice", "queued"])
+    assert log.recent("alice", 1)[0]["prompt"] == "queued"
+
+
+def test_written_rows_reach_the_index_without_a_rescan(log, monkeypatch):
+    log.archive.rotate_bytes = 1 << 20
+    write(log, rows_for("alice", 0, 3))
+    assert log.recent("alice", 1)[0]["prompt"] == "alice-2"  # primes the index
+
+    def no_scan(*args):
+        raise AssertionError("the writer reports its rows through note_append")
+
+    monkeypatch.setattr(HistoryIndex, "_scan_forward", no_scan)
+    monkeypatch.setattr(HistoryIndex, "_scan_backward", no_scan)
+    write(log, [["2026-10-18 11:00:00", "Alice", "line one\nline two, \"quoted\""]])
+    assert log.recent("alice", 2)[0]["prompt"] == 'line one\nline two, "quoted"'
+    assert get_history(log.path).covered_to == os.path.getsize(log.path)
+
+
+def test_archived_recent_rows_are_cached_until_the_next_rotation(log, monkeypatch):
+    write(log, rows_for("alice", 0, 12))
+    log.archive.archive_rotated()
+    first = log.recent("carol", 3)  # no rows anywhere: falls through to the archive
+    assert first == []
+
+    reads = []
+    original = log.archive._read_recent
+    monkeypatch.setattr(log.archive, "_read_recent", lambda *a: reads.append(a) or original(*a))
+    for _ in range(5):
+        assert log.recent("carol", 3) == []
+    assert reads == []
+
+    write(log, rows_for("carol", 0, 12))  # rotates again
+    assert [r["prompt"] for r in log.recent("carol", 12)][-1] == "carol-0"
+    assert reads
+
+
+def test_export_user_covers_archive_live_and_queue(log, tmp_path):
+    write(log, rows_for("alice", 0, 12) + rows_for("bob", 0, 3))
+    log.archive.archive_rotated()
+    log.append(["2026-10-18 12:00:00", "alice", "queued"])
+
+    out = io.StringIO(newline="")
+    count = log.export_user("alice", out)
+    rows = list(csv.reader(io.StringIO(out.getvalue(), newline="")))
+    assert rows[0] == HEADER
+    assert [r[2] for r in rows[1:]] == [f"alice-{i}" for i in range(12)] + ["queued"]
+    assert count == 13
+
+
+def test_export_user_lets_writes_and_rotations_through(log, monkeypatch):
+    write(log, rows_for("alice", 0, 12))
+    log.archive.archive_rotated()
+    write(log, rows_for("alice", 12, 2))  # live file, rotated below while the export streams
+    rotations = log.archive.stats["rotations"]
+    flushed = []
+    original = log.archive._read_partition
+
+    def read_partition(path):
+        if not flushed:
+            for row in rows_for("alice", 14, 12):
+                log.append(row)
+                flushed.append(log.writer.flush(timeout=2))
+        yield from original(path)
+
+    monkeypatch.setattr(log.archive, "_read_partition", read_partition)
+    out = io.StringIO(newline="")
+    count = log.export_user("alice", out)
+    rows = list(csv.reader(io.StringIO(out.getvalue(), newline="")))
+    assert flushed == [True] * 12
+    assert log.archive.stats["rotations"] > rotations
+    assert [r[2] for r in rows[1:]] == [f"alice-{i}" for i in range(14)]
@@ -0,0 +1,65 @@
+import pytest
+
+import pipeline
+from shared.resilience import ProviderUnavailable
+
+LOW_SCORES = "Clarity: 2/5. Vague.\nTone Fit: 2/5. Off.\nEmpathy: 2/5. Cold.\nBrand Voice Consistency: 2/5. Generic."
+
+
+class Routes:
+    name = "test"
+
+    def llm(self, stage):
+        return stage
+
+
+@pytest.fixture
+def agents(monkeypatch):
+    """Stub agents: a low-scoring critique, and an editor that fails while `editor_down` is set."""
+    state = {"editor_down": False}
+
+    def edit(draft, critique, llm=None):
+        if state["editor_down"]:
+            raise ProviderUnavailable("editor down")
+        return draft + " (edited)"
+
+    def stream_edit(draft, critique, llm=None):
+        yield "partial "
+        yield edit(draft, critique)
+
+    monkeypatch.setattr(pipeline, "rewrite_review", lambda review, prompt, llm: "draft")
+    monkeypatch.setattr(pipeline, "stream_rewrite_review", lambda review, prompt, llm: iter(["dr", "aft"]))
+    monkeypatch.setattr(pipeline, "critique_review", lambda text, llm: LOW_SCORES)
+    monkeypatch.setattr(pipeline, "stream_critique_review", lambda text, llm: iter(LOW_SCORES.split("\n")))
+    monkeypatch.setattr(pipeline, "improve_review_with_feedback", edit)
+    monkeypatch.setattr(pipeline, "stream_improved_review", stream_edit)
+    return state
+
+
+def run(streaming, max_edit_rounds):
+    args = ("The delivery was late.", "Luxury", 4.0, max_edit_rounds, "three-stage", Routes())
+    if not streaming:
+        return pipeline._run_review_pipeline(*args)
+    events = list(pipeline._stream_review_pipeline(*args))
+    assert events[-1][0] == "done"
+    return events[-1][1]
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_edit_rounds_count_successful_editor_passes(agents, streaming):
+    result = run(streaming, max_edit_rounds=2)
+    assert (result["edit_rounds"], result["llm_calls"], result["degraded"]) == (2, 5, False)
+    assert result["final"].count("(edited)") == 2
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_failed_editor_pass_is_not_counted(agents, streaming):
+    agents["editor_down"] = True
+    result = run(streaming, max_edit_rounds=2)
+    assert (result["edit_rounds"], result["llm_calls"], result["degraded"]) == (0, 2, True)
+    assert result["final"] == "draft"
+
+
+def test_edit_events_number_the_pass_being_attempted(agents):
+    events = list(pipeline._stream_review_pipeline("Late.", "Luxury", 4.0, 2, "three-stage", Routes()))
+    assert [payload for event, payload in events if event == "edit"] == [1, 2]
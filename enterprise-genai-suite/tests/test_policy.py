@@ -0,0 +1,64 @@
+import importlib.util
+import json
+import os
+
+MVP2 = os.path.join(os.path.dirname(__file__), "..", "mvp2-agentic-ai-interior-stylist")
+
+# Loaded by path: mvp2's modules share names (utils, app) with the other apps
+_spec = importlib.util.spec_from_file_location("mvp2_policy", os.path.join(MVP2, "policy.py"))
+policy = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(policy)
+
+
+def test_whole_words_and_inflections_only():
+    matcher = policy.TermMatcher(["sale", "stress", "dark"])
+    assert matcher.terms_in("Wholesale oak table") == []
+    assert matcher.terms_in("SALES this week") == ["sale"]
+    assert matcher.terms_in("A stressed, darkly lit room on sale") == ["stress", "dark", "sale"]
+    assert matcher.terms_in("darkroom stressors") == []
+
+
+def test_spaces_and_hyphens_are_interchangeable():
+    matcher = policy.TermMatcher(["low cost", "Knock-Off"])
+    for text in ("low-cost sofa", "LOW   cost sofa", "low\ncost sofa", "low - cost sofa"):
+        assert matcher.terms_in(text) == ["low cost"], text
+    assert matcher.terms_in("a knock off lamp and a KNOCK-OFFS rug") == ["Knock-Off"]
+    assert matcher.terms_in("lowcost") == []
+
+    (match,) = matcher.find("Our low-cost range")
+    assert (match.term, match.text) == ("low cost", "low-cost")
+    assert "Our low-cost range"[match.start:match.end] == "low-cost"
+
+
+def test_empty_policy_matches_nothing():
+    assert policy.TermMatcher([]).terms_in("anything at all") == []
+    assert policy.TermMatcher([]).find("anything") == []
+
+
+def test_loader_picks_up_edits_and_keeps_the_last_good_policy(tmp_path, capsys):
+    path = tmp_path / "policy.json"
+
+    def save(data, mtime):
+        path.write_text(data if isinstance(data, str) else json.dumps(data), encoding="utf-8")
+        os.utime(path, (mtime, mtime))
+
+    save({"style": {"terms": ["dark"]}}, 1000)
+    loader = policy.PolicyLoader(str(path), interval=0)
+    first = loader.get()
+    assert first["style"].terms_in("dark walls") == ["dark"]
+    assert loader.get() is first  # unchanged file: not recompiled
+
+    save({"style": {"terms": ["gothic"]}, "compliance": {"terms": ["replica"]}}, 2000)
+    reloaded = loader.get()
+    assert reloaded["style"].terms_in("dark gothic walls") == ["gothic"]
+    assert reloaded.find_all("a replica chair") == {"compliance": [("replica", 2, 9, "replica")]}
+
+    save("{not json", 3000)
+    assert loader.get() is reloaded
+    assert "keeping the previous policy" in capsys.readouterr().out
+
+    throttled = policy.PolicyLoader(str(path), interval=3600)
+    save({"style": {"terms": ["sad"]}}, 4000)
+    current = throttled.get()
+    save({"style": {"terms": ["scary"]}}, 5000)
+    assert throttled.get() is current  # mtime is not rechecked within the interval
@@ -0,0 +1,121 @@
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from shared import resilience
+from shared.resilience import CircuitBreaker, DeadlineExceeded, ProviderUnavailable, iter_with_deadline, run_with_deadline
+
+
+@pytest.fixture
+def small_pool(monkeypatch):
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    monkeypatch.setattr(resilience, "_executor", pool)
+    yield pool
+    pool.shutdown(wait=False)
+
+
+def slow(value, seconds):
+    time.sleep(seconds)
+    return value
+
+
+def test_run_with_deadline_returns_result():
+    assert run_with_deadline(slow, ("ok", 0.01), {}, timeout=1) == "ok"
+
+
+def test_run_with_deadline_raises_when_the_call_is_too_slow():
+    with pytest.raises(DeadlineExceeded):
+        run_with_deadline(slow, ("late", 0.5), {}, timeout=0.1)
+
+
+def test_waiting_for_a_worker_does_not_count_against_the_deadline(small_pool):
+    # 8 calls on 4 workers: the second wave waits ~0.2 s for a worker, then needs 0.2 s of its 0.3 s
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as callers:
+        results = list(callers.map(lambda i: run_with_deadline(slow, (i, 0.2), {}, timeout=0.3), range(8)))
+    assert results == list(range(8))
+
+
+def test_waiting_for_a_worker_is_bounded_when_the_pool_is_stuck(small_pool):
+    stuck = [small_pool.submit(time.sleep, 0.5) for _ in range(4)]  # abandoned attempts on a stalled provider
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        run_with_deadline(slow, ("never", 0.01), {}, timeout=0.1)
+    assert time.monotonic() - start < 0.4
+    concurrent.futures.wait(stuck)
+
+
+def test_hedge_wins_when_the_first_attempt_stalls():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        time.sleep(1.0 if len(calls) == 1 else 0.01)
+        return len(calls)
+
+    assert run_with_deadline(flaky, (), {}, timeout=2, hedge_after=0.05, hedge=lambda: True) == 2
+
+
+def stream(n, first_delay=0.0, delay=0.0):
+    time.sleep(first_delay)
+    for i in range(n):
+        yield i
+        time.sleep(delay)
+
+
+def test_iter_with_deadline_yields_every_item():
+    assert list(iter_with_deadline(lambda: stream(5), 1, 1)) == [0, 1, 2, 3, 4]
+
+
+def test_iter_with_deadline_raises_when_the_first_item_is_late():
+    with pytest.raises(DeadlineExceeded):
+        list(iter_with_deadline(lambda: stream(1, first_delay=0.5), 0.1, 1))
+
+
+def test_concurrent_streams_do_not_starve_the_attempt_pool(small_pool):
+    # 8 streams, 4 attempt workers: each first chunk takes 0.3 s against a 0.5 s deadline
+    def consume(_):
+        return list(iter_with_deadline(lambda: stream(3, first_delay=0.3), 0.5, 1))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as callers:
+        assert list(callers.map(consume, range(8))) == [[0, 1, 2]] * 8
+
+
+def test_abandoned_stream_closes_its_source():
+    closed = threading.Event()
+
+    class Response:
+        def __iter__(self):
+            for i in range(100):
+                yield i
+                time.sleep(0.05)
+
+        def close(self):
+            closed.set()
+
+    chunks = iter_with_deadline(Response, 1, 1)
+    assert next(chunks) == 0
+    chunks.close()
+    assert closed.wait(1)
+
+
+def test_circuit_breaker_opens_then_probes():
+    breaker = CircuitBreaker("m", failures=2, cooldown=0.05)
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    with pytest.raises(ProviderUnavailable):
+        breaker.check()
+    time.sleep(0.06)
+    breaker.check()  # the single half-open probe
+    with pytest.raises(ProviderUnavailable):
+        breaker.check()
+    breaker.record_success()
+    breaker.check()
+    assert breaker.trips == 1
+
+
+def test_backoff_is_capped_and_jittered():
+    for attempt in range(10):
+        assert 0 <= resilience.backoff(attempt) <= resilience.BACKOFF_CAP
@@ -0,0 +1,78 @@
+import concurrent.futures
+import csv
+import threading
+
+import pytest
+
+from review_store import OVERALL, ReviewStore
+
+EVALUATION = "Clarity: 5/5. Clear.\nTone Fit: 4/5. Close.\nEmpathy: 3/5. Flat.\nBrand Voice Consistency: 4/5. Fine."
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ReviewStore(str(tmp_path / "review_log.db"))
+
+
+def write_legacy_csv(path, rows):
+    # The legacy log has no llm_calls column
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["timestamp", "user", "tone", "original", "rewritten", "evaluation"])
+        writer.writerows(rows)
+
+
+def test_import_csv_parses_scores_once(store, tmp_path):
+    legacy = tmp_path / "review_log.csv"
+    write_legacy_csv(legacy, [
+        ["2025-07-04 10:00:00", "Elon", "Luxury", "bad", "less good", EVALUATION],
+        ["2025-07-05 10:00:00", "elon ", "Luxury", "late", "delayed", "no scores here"],
+    ])
+    assert store.import_csv(str(legacy)) == 2
+    assert store.import_csv(str(legacy)) == 0
+
+    first, second = store.recent("ELON", limit=5)
+    assert first["scores"] == {"Clarity": 5.0, "Tone Fit": 4.0, "Empathy": 3.0, "Brand Voice Consistency": 4.0}
+    assert first["llm_calls"] is None
+    assert second["scores"] == {}
+    (mean,) = store._conn().execute("SELECT score_mean FROM rewrites WHERE evaluation = ?", (EVALUATION,)).fetchone()
+    assert mean == 4.0
+
+
+def test_aggregates_count_each_row_once(store):
+    store.add_many([
+        {"timestamp": "2025-07-04 10:00:00", "user": "Ann", "tone": "Luxury", "original": "a", "rewritten": "b",
+         "evaluation": EVALUATION, "llm_calls": 2},
+        {"timestamp": "2025-07-04 11:00:00", "user": "Bob", "tone": "Casual", "original": "c", "rewritten": "d",
+         "evaluation": "", "scores": {"Clarity": 2.0, "Empathy": 4.0}},
+    ])
+    assert store.aggregate_new_rows() == 2
+    assert store.aggregate_new_rows() == 0
+
+    summary = store.score_summary()
+    assert summary["Clarity"] == {"count": 2, "mean": 3.5, "histogram": [0, 1, 0, 0, 1]}
+    assert summary[OVERALL]["count"] == 2
+    assert store.score_summary("user", " ann")["Tone Fit"]["mean"] == 4.0
+    assert store.score_summary(day="2025-07-04")["Empathy"]["count"] == 2
+    assert store.score_breakdown("tone") == {"Casual": {"count": 1, "mean": 3.0},
+                                             "Luxury": {"count": 1, "mean": 4.0}}
+    assert store.score_trend() == [("2025-07-04", 2, 3.5)]
+
+
+def test_concurrent_imports_load_the_csv_once(tmp_path):
+    legacy = tmp_path / "review_log.csv"
+    write_legacy_csv(legacy, [[f"2025-07-04 10:00:{i:02d}", "Elon", "Luxury", f"r{i}", "x", EVALUATION]
+                              for i in range(50)])
+    path = str(tmp_path / "shared.db")
+    stores = [ReviewStore(path) for _ in range(4)]  # one per app process starting at the same time
+    start = threading.Barrier(len(stores))
+
+    def run(store):
+        start.wait()
+        return store.import_csv(str(legacy))
+
+    with concurrent.futures.ThreadPoolExecutor(len(stores)) as pool:
+        imported = sorted(pool.map(run, stores))
+    assert imported == [0, 0, 0, 50]
+    (count,) = stores[0]._conn().execute("SELECT COUNT(*) FROM rewrites").fetchone()
+    assert count == 50
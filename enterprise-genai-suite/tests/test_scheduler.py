@@ -0,0 +1,115 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from shared import scheduler
+from shared.scheduler import FairQueue, ModelLimiter, Scheduler, TokenBucket, _Ticket, call_model, schedule_as, stream_model
+
+
+@pytest.fixture
+def sched(monkeypatch):
+    fresh = Scheduler(limits={"m": (600, 6000)})  # 10 req/s, 100 tokens/s; bursts of 100 requests, 1000 tokens
+    monkeypatch.setattr(scheduler, "_scheduler", fresh)
+    return fresh
+
+
+def test_token_bucket_waits_for_the_missing_amount():
+    bucket = TokenBucket(60)  # 1 per second
+    bucket.level = 0.5
+    assert bucket.wait_time(1, scale=1.0) == pytest.approx(0.5)
+    assert bucket.wait_time(1, scale=0.5) == pytest.approx(1.0)
+    assert bucket.wait_time(10 ** 6, scale=1.0) == pytest.approx(bucket.capacity - 0.5)  # capped at a full bucket
+
+
+def test_aimd_halves_on_429_and_recovers_additively():
+    limiter = ModelLimiter(rpm=60, tpm=None)
+    limiter.on_rate_limited(retry_after=2.0, now=100.0)
+    assert limiter.scale == 0.5
+    assert limiter.paused_until == 102.0
+    for _ in range(10):
+        limiter.on_rate_limited(retry_after=0.0, now=100.0)
+    assert limiter.scale == ModelLimiter.MIN_SCALE
+    limiter.on_success()
+    assert limiter.scale == pytest.approx(ModelLimiter.MIN_SCALE + ModelLimiter.INCREASE)
+
+
+def test_settle_corrects_the_token_estimate():
+    limiter = ModelLimiter(rpm=None, tpm=6000)
+    start = limiter.tokens.level
+    limiter.take(500)
+    limiter.settle(500, 120)
+    assert limiter.tokens.level == pytest.approx(start - 120)
+
+
+def test_fair_queue_prefers_interactive_and_rotates_users():
+    queue = FairQueue()
+    for user, priority in [("a", "batch"), ("a", "interactive"), ("a", "interactive"), ("b", "interactive")]:
+        queue.push(_Ticket(user, priority, 0))
+    order = [(t.user, t.priority) for t in iter(queue.pop_head, None)]
+    assert order == [("a", "interactive"), ("b", "interactive"), ("a", "interactive"), ("a", "batch")]
+
+
+def test_call_model_passes_a_model_keyword_through(sched):
+    def create(**kwargs):
+        return SimpleNamespace(kwargs=kwargs, usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5))
+
+    result = call_model("m", create, model="gpt-x", messages=[], est_tokens=100)
+    assert result.kwargs == {"model": "gpt-x", "messages": []}
+    assert sched.stats["granted"] == 1
+
+
+def test_call_model_backs_off_and_retries_a_429(sched):
+    class RateLimited(Exception):
+        status_code = 429
+        response = SimpleNamespace(headers={"retry-after": "0.05"})
+
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RateLimited()
+        return "ok"
+
+    with schedule_as("alice"):
+        assert call_model("m", flaky) == "ok"
+    assert sched.snapshot()["m"]["rate_limited"] == 1
+    assert sched.snapshot()["m"]["scale"] < 1.0
+
+
+def test_stream_model_settles_tokens_against_reported_usage(sched):
+    def stream(prompt):
+        yield SimpleNamespace(text="hi", usage=None)
+        yield SimpleNamespace(text="", usage=SimpleNamespace(prompt_tokens=60, completion_tokens=40))
+
+    assert [c.text for c in stream_model("m", stream, "p", est_tokens=500)] == ["hi", ""]
+    level = sched._limiter("m").tokens.level
+    # 1000 - 500 reserved, then +400 back once usage (100) is known; refill is capped at 1000
+    assert 890 <= level <= 1000
+
+
+def test_acquire_queues_when_the_bucket_is_empty(sched):
+    sched._limiter("m").requests.level = 0
+    start = time.monotonic()
+    waited = sched.acquire("m")
+    assert waited == pytest.approx(time.monotonic() - start, abs=0.01)
+    assert 0.05 <= waited <= 0.3  # one request refills in 0.1 s at 10 req/s
+
+
+def test_no_hedge_while_the_circuit_is_open(sched, monkeypatch):
+    from shared import resilience
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(scheduler, "hedge_delay", lambda span: 0.05)
+    calls = []
+
+    def stalls_then_answers():
+        calls.append(1)
+        breaker = resilience.get_breaker("m")
+        for _ in range(breaker.threshold):
+            breaker.record_failure()  # e.g. other sessions' calls failing meanwhile
+        time.sleep(0.2)
+        return "ok"
+
+    assert call_model("m", stalls_then_answers) == "ok"
+    assert len(calls) == 1
@@ -0,0 +1,40 @@
+from shared.telemetry import current_span, request_trace, stage, streamed
+
+
+def test_streamed_span_is_current_only_while_producing_items():
+    seen = []
+
+    def tokens():
+        for token in ("a", "b"):
+            seen.append(current_span())
+            yield token
+
+    def stream():
+        with stage("rewrite", current=False) as span:
+            yield from streamed(tokens(), span=span)
+
+    with request_trace("test") as trace:
+        chunks = stream()
+        assert next(chunks) == "a"
+        assert current_span() is None  # the caller runs between items without the stage
+        assert list(chunks) == ["b"]
+    assert [span.stage for span in seen] == ["rewrite", "rewrite"]
+    assert [span.stage for span in trace.spans] == ["rewrite"]
+
+
+def test_streamed_closes_its_source_with_the_span_current():
+    closed_in = []
+
+    def tokens():
+        try:
+            yield "a"
+            yield "b"
+        finally:
+            closed_in.append(current_span())
+
+    with stage("critique", current=False) as span:
+        chunks = streamed(tokens(), span=span)
+        next(chunks)
+        chunks.close()
+    assert closed_in == [span]
+    assert current_span() is None
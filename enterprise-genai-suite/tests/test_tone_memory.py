@@ -0,0 +1,60 @@
+import json
+import sqlite3
+
+from tone_memory import ToneMemoryStore
+
+
+def make_store(tmp_path, **kwargs):
+    # A long interval keeps the background writer out of the way; tests flush by hand
+    return ToneMemoryStore(str(tmp_path / "tone_memory.db"), flush_interval=3600, **kwargs)
+
+
+def test_flush_writes_only_the_changed_users(tmp_path):
+    store = make_store(tmp_path)
+    assert store.set("ann", "Luxury")
+    assert not store.set("ann", "Luxury")
+    store.set("bob", "Casual")
+    store.flush()
+    store.set("ann", "Warm & Friendly")
+    store.flush()
+
+    rows = sqlite3.connect(store.path).execute("SELECT user, tone, seq FROM tone_memory ORDER BY seq").fetchall()
+    assert rows == [("bob", "Casual", 2), ("ann", "Warm & Friendly", 3)]
+    assert store.stats == {"changes": 3, "unchanged": 1, "flushes": 2}
+
+
+def test_other_processes_see_flushed_tones(tmp_path):
+    first, second = make_store(tmp_path), make_store(tmp_path)
+    first.set("ann", "Luxury")
+    assert second.get("ann") is None
+    first.flush()
+    assert second.get("ann") == "Luxury"
+
+    second.set("ann", "Casual")  # unflushed local change wins over the other process's row
+    first.set("ann", "Helpful & Technical")
+    first.flush()
+    assert second.get("ann") == "Casual"
+
+
+def test_legacy_json_seeds_an_empty_table_once(tmp_path):
+    legacy = tmp_path / "tone_memory.json"
+    legacy.write_text(json.dumps({"elon": "Warm & Friendly", "Prasad": "Luxury"}), encoding="utf-8")
+    store = make_store(tmp_path, legacy_path=str(legacy))
+    assert store.get("Prasad") == "Luxury"
+
+    store.set("Prasad", "Casual")
+    store.flush()
+    assert make_store(tmp_path, legacy_path=str(legacy)).get("Prasad") == "Casual"
+
+
+def test_failed_flush_keeps_the_changes_dirty(tmp_path):
+    store = make_store(tmp_path)
+    store.set("ann", "Luxury")
+    store._writer.close()  # any sqlite3 error on the write path
+    store.flush()
+    assert store._dirty == {"ann": "Luxury"}
+
+    store._writer = sqlite3.connect(store.path, check_same_thread=False)
+    store.flush()
+    assert store._dirty == {}
+    assert make_store(tmp_path).get("ann") == "Luxury"